@@ -0,0 +1,165 @@
+# analysis_cache.py
+import hashlib
+import io
+import os
+import tempfile
+import threading
+import numpy as np
+import pandas as pd
+
+from config import (VENTANA_DURACION_SEG, UMBRAL_FRECUENCIA_AMPLITUD_HZ, CACHE_DIR, CACHE_MAX_BYTES,
+                    ANALISIS_POR_BLOQUES_DESDE_BYTES)
+from data_ingestion import leer_bytes, leer_encabezado, leer_imu
+from binary_recording import es_binario
+from signal_analysis import analizar_temblor_por_ventanas_resultante, analizar_temblor_csv_por_bloques, VERSION_PIPELINE
+from window_results import ResultadosVentanas
+
+def clave_cache(contenido, fs, ventana_seg, salto_seg, umbral_freq_hz=UMBRAL_FRECUENCIA_AMPLITUD_HZ):
+    """
+    Clave del resultado: hash del archivo más los parámetros del análisis y la versión del pipeline.
+    Los parámetros se normalizan antes (salto_seg=None es el salto efectivo, ventana_seg, y todos se
+    pasan a float) para que dos formas de pedir el mismo análisis compartan la clave.
+    contenido son los bytes del archivo o un hashlib.sha256 ya calculado con ellos (ver _sha256_archivo).
+    """
+    salto_seg = ventana_seg if salto_seg is None else salto_seg
+    fs, ventana_seg, salto_seg, umbral_freq_hz = (float(valor) for valor in (fs, ventana_seg, salto_seg, umbral_freq_hz))
+    h = contenido.copy() if hasattr(contenido, "hexdigest") else hashlib.sha256(contenido)
+    h.update(f"|fs={fs!r}|ventana={ventana_seg!r}|salto={salto_seg!r}|umbral={umbral_freq_hz!r}|v={VERSION_PIPELINE}".encode())
+    return h.hexdigest()
+
+def _sha256_archivo(ruta, bloque=1 << 20):
+    # Mismo hash que hashlib.sha256(leer_bytes(ruta)), sin cargar el archivo completo
+    h = hashlib.sha256()
+    with open(ruta, "rb") as f:
+        for parte in iter(lambda: f.read(bloque), b""):
+            h.update(parte)
+    return h
+
+def _tamaño(archivo):
+    if isinstance(archivo, (bytes, bytearray, memoryview)):
+        return len(archivo)
+    if isinstance(archivo, (str, os.PathLike)):
+        return os.path.getsize(archivo)
+    archivo.seek(0, os.SEEK_END)
+    tamaño = archivo.tell()
+    archivo.seek(0)
+    return tamaño
+
+def _ruta(clave, cache_dir):
+    return os.path.join(cache_dir, f"{clave}.npz")
+
+def _df_a_arrays(df, prefijo):
+    # df puede ser un DataFrame o un ResultadosVentanas
+    arrays = {f"{prefijo}_columnas": np.array(list(df.columns), dtype=str)}
+    for i, col in enumerate(df.columns):
+        arrays[f"{prefijo}_{i}"] = np.asarray(df[col])
+    return arrays
+
+def _arrays_a_df(datos, prefijo, compacto=False):
+    columnas = {col: datos[f"{prefijo}_{i}"] for i, col in enumerate(datos[f"{prefijo}_columnas"])}
+    return ResultadosVentanas(columnas) if compacto else pd.DataFrame(columnas)
+
+def leer_cache(clave, cache_dir=CACHE_DIR, compacto=False):
+    """
+    Devuelve (df_promedio, df_por_ventana) si la clave está en caché, o None.
+    Con compacto=True los devuelve como ResultadosVentanas.
+    """
+    ruta = _ruta(clave, cache_dir)
+    try:
+        with np.load(ruta, allow_pickle=False) as datos:
+            resultado = _arrays_a_df(datos, "promedio", compacto), _arrays_a_df(datos, "ventana", compacto)
+    except (FileNotFoundError, OSError, ValueError, KeyError):
+        return None
+    try:
+        os.utime(ruta) # Marca el uso para la política LRU
+    except OSError:
+        pass
+    return resultado
+
+# Tamaño estimado de cada directorio de caché según este proceso: {cache_dir: (bytes, bytes escritos
+# desde el último recorrido)}. Se mide al primer guardado y después se suma lo que se escribe, así que
+# el directorio solo se vuelve a recorrer cuando la estimación supera el límite o cuando este proceso
+# ya escribió una décima parte del límite (para enterarse de lo que guardaron otros procesos). Cada
+# recorrido deja la caché en el 90% del límite, así el siguiente tarda en llegar.
+_bytes_cache = {}
+_bytes_cache_lock = threading.Lock()
+
+def guardar_cache(clave, df_promedio, df_por_ventana, cache_dir=CACHE_DIR, max_bytes=CACHE_MAX_BYTES):
+    """
+    Guarda ambos resultados (DataFrames o ResultadosVentanas) en formato .npz y libera espacio si se
+    supera max_bytes.
+    """
+    os.makedirs(cache_dir, exist_ok=True)
+    buf = io.BytesIO()
+    np.savez(buf, **_df_a_arrays(df_promedio, "promedio"), **_df_a_arrays(df_por_ventana, "ventana"))
+    # Escritura atómica para que otra sesión nunca lea un archivo a medio escribir
+    fd, tmp = tempfile.mkstemp(dir=cache_dir, suffix=".tmp")
+    with os.fdopen(fd, "wb") as f:
+        f.write(buf.getvalue())
+    os.replace(tmp, _ruta(clave, cache_dir))
+
+    tamaño = buf.getbuffer().nbytes
+    with _bytes_cache_lock:
+        total, escritos = _bytes_cache.get(cache_dir, (None, 0))
+        if total is not None and total + tamaño <= max_bytes and escritos + tamaño <= max_bytes // 10:
+            _bytes_cache[cache_dir] = (total + tamaño, escritos + tamaño)
+            return
+        _bytes_cache[cache_dir] = (desalojar_cache(cache_dir, max_bytes - max_bytes // 10), 0)
+
+def desalojar_cache(cache_dir=CACHE_DIR, max_bytes=CACHE_MAX_BYTES):
+    """
+    Elimina las entradas usadas hace más tiempo hasta que el tamaño total quede dentro de max_bytes.
+    Devuelve el tamaño que queda.
+    """
+    try:
+        entradas = [e for e in os.scandir(cache_dir) if e.name.endswith(".npz")]
+    except FileNotFoundError:
+        return 0
+    entradas = sorted(((e.stat().st_mtime, e.stat().st_size, e.path) for e in entradas))
+    total = sum(tamaño for _, tamaño, _ in entradas)
+    for _, tamaño, ruta in entradas:
+        if total <= max_bytes:
+            break
+        try:
+            os.remove(ruta)
+            total -= tamaño
+        except OSError:
+            pass
+    return total
+
+def analizar_archivo_con_cache(archivo, fs=100, ventana_seg=VENTANA_DURACION_SEG, salto_seg=None,
+                               umbral_freq_hz=UMBRAL_FRECUENCIA_AMPLITUD_HZ, cache_dir=CACHE_DIR, df_imu=None,
+                               compacto=False):
+    """
+    Igual que analizar_temblor_por_ventanas_resultante pero a partir del archivo CSV o .imu (ruta,
+    bytes o archivo subido), reutilizando el resultado guardado si el mismo archivo ya se analizó
+    con los mismos parámetros. Si el archivo ya se leyó con data_ingestion.leer_medicion,
+    se puede pasar df_imu para no volver a parsearlo. compacto=True devuelve ResultadosVentanas.
+    Los CSV de más de ANALISIS_POR_BLOQUES_DESDE_BYTES se analizan por bloques, con memoria acotada
+    (analizar_temblor_csv_por_bloques); si además son una ruta, tampoco se cargan completos para el hash.
+    """
+    por_bloques = df_imu is None and _tamaño(archivo) > ANALISIS_POR_BLOQUES_DESDE_BYTES \
+        and not es_binario(leer_encabezado(archivo))
+    if por_bloques and isinstance(archivo, (str, os.PathLike)):
+        contenido, origen = None, archivo
+        clave = clave_cache(_sha256_archivo(archivo), fs, ventana_seg, salto_seg, umbral_freq_hz)
+    else:
+        contenido = leer_bytes(archivo)
+        origen = io.BytesIO(contenido)
+        clave = clave_cache(contenido, fs, ventana_seg, salto_seg, umbral_freq_hz)
+    resultado = leer_cache(clave, cache_dir, compacto)
+    if resultado is not None:
+        return resultado
+
+    if por_bloques:
+        df_promedio, df_por_ventana = analizar_temblor_csv_por_bloques(origen, fs=fs, ventana_seg=ventana_seg, salto_seg=salto_seg,
+                                                                       umbral_freq_hz=umbral_freq_hz)
+        if compacto:
+            df_promedio, df_por_ventana = (ResultadosVentanas.desde_dataframe(df_promedio),
+                                           ResultadosVentanas.desde_dataframe(df_por_ventana))
+    else:
+        df = df_imu if df_imu is not None else leer_imu(contenido)
+        df_promedio, df_por_ventana = analizar_temblor_por_ventanas_resultante(df, fs=fs, ventana_seg=ventana_seg, salto_seg=salto_seg,
+                                                                             umbral_freq_hz=umbral_freq_hz, compacto=compacto)
+    guardar_cache(clave, df_promedio, df_por_ventana, cache_dir)
+    return df_promedio, df_por_ventana
@@ -0,0 +1,237 @@
+# batch_analysis.py
+"""
+Análisis por lotes de una cohorte, sin la interfaz de Streamlit.
+
+Uso:
+    python batch_analysis.py carpeta_registros carpeta_resultados [--procesos N] [--prediccion]
+
+Busca los CSV (o .imu, ver binary_recording) de Reposo/Postural/Acción, los agrupa por paciente (carpeta del paciente o nombre del
+archivo sin el tipo de test), analiza cada paciente en un proceso del pool y escribe:
+  - resultados.csv: una fila por paciente con los promedios por test, el diagnóstico y la predicción.
+  - ventanas/<paciente>.csv: resultados por ventana de los tres tests.
+  - pacientes/<paciente>.json: resultado de cada paciente; si ya existe y los archivos no cambiaron,
+    el paciente se saltea, lo que permite retomar una corrida interrumpida.
+"""
+import argparse
+import json
+import os
+import re
+import time
+import unicodedata
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import numpy as np
+import pandas as pd
+
+from config import VENTANA_DURACION_SEG, VENTANA_SALTO_SEG
+from data_processing import extraer_datos_paciente_archivo, diagnosticar
+from analysis_cache import analizar_archivo_con_cache
+from binary_recording import EXTENSION
+from ml_model import preferred_model_filename
+
+TESTS = {"reposo": "Reposo", "postural": "Postural", "accion": "Acción"}
+# Prefijos de las columnas del modelo (ver ml_model.prepare_data_for_prediction)
+PREFIJOS_TEST = {"Reposo": "Reposo", "Postural": "Postural", "Acción": "Accion"}
+
+def _normalizar(texto):
+    return unicodedata.normalize("NFKD", texto).encode("ASCII", "ignore").decode("ASCII").lower()
+
+def tipo_de_test(ruta):
+    """Devuelve 'Reposo', 'Postural' o 'Acción' según el nombre del archivo, o None."""
+    nombre = _normalizar(os.path.basename(ruta))
+    for clave, test in TESTS.items():
+        if clave in nombre:
+            return test
+    return None
+
+def agrupar_por_paciente(carpeta):
+    """
+    Devuelve {paciente: {test: ruta}} para todos los CSV y .imu (ver binary_recording) de la carpeta
+    (recursivamente). El paciente se identifica por la subcarpeta y por el nombre del archivo sin el
+    tipo de test, así funcionan tanto 'paciente01/reposo.csv' como 'paciente01_reposo.csv'. Si un
+    registro está en los dos formatos (el .imu generado junto a su CSV) se usa el .imu, que se lee más rápido.
+    """
+    pacientes = {}
+    for raiz, _, nombres in os.walk(carpeta):
+        for nombre in sorted(nombres):
+            if not nombre.lower().endswith((".csv", EXTENSION)):
+                continue
+            ruta = os.path.join(raiz, nombre)
+            test = tipo_de_test(ruta)
+            if test is None:
+                continue
+            base = _normalizar(os.path.splitext(nombre)[0])
+            for clave in TESTS:
+                base = base.replace(clave, "")
+            base = base.strip(" _-.")
+            subcarpeta = os.path.relpath(raiz, carpeta)
+            partes = [p for p in (subcarpeta if subcarpeta != "." else "", base) if p]
+            paciente = "/".join(partes).replace(os.sep, "/") or "paciente"
+            archivos = pacientes.setdefault(paciente, {})
+            if test in archivos and os.path.splitext(archivos[test])[0] == os.path.splitext(ruta)[0]:
+                if nombre.lower().endswith(EXTENSION):
+                    archivos[test] = ruta
+                continue
+            if test in archivos:
+                print(f"Aviso: {paciente} tiene más de un archivo de {test}; se usa {archivos[test]}")
+                continue
+            archivos[test] = ruta
+    return pacientes
+
+def nombre_archivo_paciente(paciente):
+    return re.sub(r"[^\w.-]+", "_", paciente)
+
+def _huella_archivos(archivos, parametros):
+    """Identifica los archivos de entrada (tamaño y fecha) y los parámetros de la corrida."""
+    return {
+        "archivos": {test: [ruta, os.path.getsize(ruta), os.path.getmtime(ruta)] for test, ruta in sorted(archivos.items())},
+        "parametros": parametros,
+    }
+
+def modelo_por_defecto():
+    """
+    Modelo de predicción a usar si no se indica otro (ver preferred_model_filename). Se resuelve recién
+    cuando se pide una predicción: verificar la exportación .npz lee y hashea el .joblib.
+    """
+    return preferred_model_filename(os.path.dirname(os.path.abspath(__file__)))
+
+def analizar_paciente(paciente, archivos, carpeta_salida, fs=100, ventana_seg=VENTANA_DURACION_SEG,
+                      salto_seg=VENTANA_SALTO_SEG, prediccion=False, ruta_modelo=None):
+    """
+    Analiza los tests de un paciente, escribe sus ventanas y devuelve la fila del resumen.
+    Sin ruta_modelo, la predicción usa modelo_por_defecto().
+    """
+    inicio = time.perf_counter()
+    fila = {"Paciente": paciente}
+    try:
+        datos_paciente = {}
+        resultados = []
+        avg_tremor_metrics = {}
+        ventanas = []
+        for test in TESTS.values():
+            ruta = archivos.get(test)
+            if ruta is None:
+                continue
+            if not datos_paciente:
+                datos_paciente = extraer_datos_paciente_archivo(ruta)
+            df_promedio, df_ventanas = analizar_archivo_con_cache(ruta, fs=fs, ventana_seg=ventana_seg, salto_seg=salto_seg)
+            prefijo = PREFIJOS_TEST[test]
+            if not df_promedio.empty:
+                promedio = df_promedio.iloc[0].to_dict()
+                avg_tremor_metrics[test] = promedio
+                resultados.append({**promedio, "Test": test})
+                fila[f"Frec_{prefijo}"] = promedio["Frecuencia Dominante (Hz)"]
+                fila[f"RMS_{prefijo}"] = promedio["RMS (m/s2)"]
+                fila[f"Amp_{prefijo}"] = promedio["Amplitud Temblor (cm)"]
+            if not df_ventanas.empty:
+                df_ventanas = df_ventanas.copy()
+                df_ventanas["Test"] = test
+                ventanas.append(df_ventanas)
+
+        fila["Diagnostico"] = diagnosticar(pd.DataFrame(resultados)) if resultados else ""
+
+        if prediccion and avg_tremor_metrics:
+            # El modelo se carga una sola vez por proceso del pool (ver get_cached_tremor_model)
+            from ml_model import get_cached_tremor_model, predict_tremor_batch, prepare_data_for_prediction
+            df_for_prediction = prepare_data_for_prediction(datos_paciente, avg_tremor_metrics)
+            modelo = get_cached_tremor_model(ruta_modelo if ruta_modelo is not None else modelo_por_defecto())
+            df_predicciones, _ = predict_tremor_batch(df_for_prediction, modelo)
+            fila["Prediccion"] = df_predicciones["prediction"].iloc[0]
+            for col in df_predicciones.columns.drop("prediction"):
+                fila[f"Prob_{col[len('prob_'):]}"] = float(df_predicciones[col].iloc[0])
+
+        if ventanas:
+            carpeta_ventanas = os.path.join(carpeta_salida, "ventanas")
+            os.makedirs(carpeta_ventanas, exist_ok=True)
+            pd.concat(ventanas, ignore_index=True).to_csv(
+                os.path.join(carpeta_ventanas, f"{nombre_archivo_paciente(paciente)}.csv"), index=False)
+    except Exception as e:
+        fila["Error"] = f"{type(e).__name__}: {e}"
+
+    fila["Segundos"] = time.perf_counter() - inicio
+    # np.float64 y similares no son serializables en JSON
+    return {k: (v.item() if isinstance(v, np.generic) else v) for k, v in fila.items()}
+
+def _guardar_estado(ruta, huella, fila):
+    tmp = ruta + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump({"huella": huella, "fila": fila}, f, ensure_ascii=False)
+    os.replace(tmp, ruta)
+
+def _leer_estado(ruta, huella):
+    try:
+        with open(ruta, encoding="utf-8") as f:
+            estado = json.load(f)
+    except (FileNotFoundError, ValueError):
+        return None
+    return estado["fila"] if estado.get("huella") == huella and "Error" not in estado["fila"] else None
+
+def analizar_cohorte(carpeta_entrada, carpeta_salida, procesos=None, prediccion=False, fs=100,
+                     ventana_seg=VENTANA_DURACION_SEG, salto_seg=VENTANA_SALTO_SEG, ruta_modelo=None):
+    """Analiza todos los pacientes de carpeta_entrada en paralelo y devuelve el DataFrame consolidado."""
+    if prediccion and ruta_modelo is None:
+        # Se resuelve una vez aquí y no en cada proceso del pool
+        ruta_modelo = modelo_por_defecto()
+    pacientes = agrupar_por_paciente(carpeta_entrada)
+    carpeta_estado = os.path.join(carpeta_salida, "pacientes")
+    os.makedirs(carpeta_estado, exist_ok=True)
+    parametros = {"fs": fs, "ventana_seg": ventana_seg, "salto_seg": salto_seg, "prediccion": prediccion}
+
+    filas = {}
+    pendientes = {}
+    for paciente, archivos in pacientes.items():
+        huella = _huella_archivos(archivos, parametros)
+        ruta_estado = os.path.join(carpeta_estado, f"{nombre_archivo_paciente(paciente)}.json")
+        fila = _leer_estado(ruta_estado, huella)
+        if fila is not None:
+            filas[paciente] = fila
+        else:
+            pendientes[paciente] = (archivos, huella, ruta_estado)
+
+    total = len(pendientes)
+    print(f"{len(pacientes)} pacientes encontrados, {len(filas)} ya analizados, {total} pendientes.")
+
+    inicio = time.perf_counter()
+    megabytes = 0.0
+    with ProcessPoolExecutor(max_workers=procesos) as pool:
+        futuros = {
+            pool.submit(analizar_paciente, paciente, archivos, carpeta_salida, fs, ventana_seg, salto_seg, prediccion, ruta_modelo): paciente
+            for paciente, (archivos, _, _) in pendientes.items()
+        }
+        for hechos, futuro in enumerate(as_completed(futuros), start=1):
+            paciente = futuros[futuro]
+            archivos, huella, ruta_estado = pendientes[paciente]
+            fila = futuro.result()
+            _guardar_estado(ruta_estado, huella, fila)
+            filas[paciente] = fila
+
+            megabytes += sum(os.path.getsize(r) for r in archivos.values()) / 1e6
+            transcurrido = time.perf_counter() - inicio
+            estado = f"error: {fila['Error']}" if "Error" in fila else fila.get("Diagnostico", "")
+            print(f"[{hechos}/{total}] {paciente}: {estado} | "
+                  f"{hechos / transcurrido:.2f} pacientes/s, {megabytes / transcurrido:.1f} MB/s")
+
+    df_resultados = pd.DataFrame([filas[p] for p in sorted(filas)])
+    df_resultados.to_csv(os.path.join(carpeta_salida, "resultados.csv"), index=False)
+    return df_resultados
+
+def main():
+    parser = argparse.ArgumentParser(description="Análisis de temblor por lotes para una cohorte de pacientes.")
+    parser.add_argument("entrada", help="Carpeta con los CSV de Reposo/Postural/Acción")
+    parser.add_argument("salida", help="Carpeta donde se escriben los resultados")
+    parser.add_argument("--procesos", type=int, default=None, help="Procesos del pool (por defecto, uno por núcleo)")
+    parser.add_argument("--prediccion", action="store_true", help="Agregar la predicción del modelo")
+    parser.add_argument("--modelo", default=None,
+                        help="Archivo del modelo de predicción (por defecto, la versión más reciente)")
+    parser.add_argument("--fs", type=int, default=100, help="Frecuencia de muestreo (Hz)")
+    parser.add_argument("--ventana", type=float, default=VENTANA_DURACION_SEG, help="Duración de la ventana (s)")
+    parser.add_argument("--salto", type=float, default=VENTANA_SALTO_SEG, help="Salto entre ventanas (s)")
+    args = parser.parse_args()
+
+    inicio = time.perf_counter()
+    df_resultados = analizar_cohorte(args.entrada, args.salida, args.procesos, args.prediccion,
+                                     args.fs, args.ventana, args.salto, args.modelo)
+    print(f"{len(df_resultados)} pacientes en {time.perf_counter() - inicio:.1f} s. "
+          f"Resultados en {os.path.join(args.salida, 'resultados.csv')}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,278 @@
+# benchmark.py
+"""
+Benchmark del pipeline con registros sintéticos (ver synthetic_recordings.py).
+
+Uso:
+    python benchmark.py [--duraciones 30 300 1200 3600 7200] [--repeticiones 3] [--salida benchmark.json]
+                        [--comparar referencia.json] [--tolerancia 0.10] [--minimo-ms 5]
+                        [--presupuesto-importacion 1.5]
+
+Para cada duración (en segundos) genera un registro determinístico y mide cada etapa por separado,
+llamando directamente a las funciones (sin la memoización de signal_analysis):
+lectura del CSV, Mahony, eliminación de la gravedad, filtrado, ventanas, el análisis completo,
+diagnosticar, la predicción y generar_pdf. Se guarda el mínimo y la mediana de las repeticiones, que
+empiezan después de una llamada sin medir (así no incluyen la importación de scipy o ahrs).
+La predicción también se mide con un lote de PREDICCION_LOTE_FILAS pacientes sintéticos, con el modelo
+que usa la aplicación (prediccion_lote) y, como referencia, con el .joblib de scikit-learn
+(prediccion_lote_sklearn).
+
+El resultado es un JSON con el entorno (versiones, commit, núcleos) y una fila por duración y etapa.
+También mide cuánto tarda importar main_app en un proceso nuevo (lo que paga el primer render de la
+página) y verifica que no cargue MODULOS_DIFERIDOS; si supera --presupuesto-importacion o carga alguno
+de esos módulos, el código de salida es 1.
+
+Con --comparar se compara contra un JSON anterior y se marcan las etapas que empeoraron más de
+--tolerancia; el código de salida es 1 si alguna empeoró.
+"""
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+from datetime import datetime
+import numpy as np
+import pandas as pd
+
+DURACIONES_POR_DEFECTO = [30, 300, 1200, 3600, 7200]
+ETAPAS = ["importacion", "lectura_csv", "mahony", "gravedad", "filtrado", "ventanas", "analisis_completo",
+          "diagnosticar", "prediccion", "prediccion_lote", "prediccion_lote_sklearn", "generar_pdf"]
+PREDICCION_LOTE_FILAS = 5000
+
+# Tiempo máximo para importar main_app (con streamlit y pandas) y módulos que solo deben cargarse
+# cuando se usa el modo que los necesita
+PRESUPUESTO_IMPORTACION_SEG = 1.5
+MODULOS_DIFERIDOS = ["scipy", "ahrs", "matplotlib", "fpdf", "joblib", "sklearn"]
+
+def _medir(funcion, repeticiones, calentar=True):
+    # La primera llamada (fuera de la medición) carga los módulos diferidos y prepara lo que la etapa
+    # reutiliza; sin ella, con --repeticiones 1 la etapa incluiría la importación de scipy o ahrs
+    resultado = funcion() if calentar else None
+    tiempos = []
+    for _ in range(repeticiones):
+        inicio = time.perf_counter()
+        resultado = funcion()
+        tiempos.append(time.perf_counter() - inicio)
+    return resultado, tiempos
+
+def _entorno():
+    import scipy
+    import ahrs
+    try:
+        commit = subprocess.run(["git", "rev-parse", "HEAD"], capture_output=True, text=True,
+                                cwd=os.path.dirname(os.path.abspath(__file__)), timeout=10).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        commit = None
+    from signal_analysis import VERSION_PIPELINE
+    return {
+        "fecha": datetime.now().isoformat(timespec="seconds"),
+        "commit": commit,
+        "version_pipeline": VERSION_PIPELINE,
+        "python": sys.version.split()[0],
+        "numpy": np.__version__,
+        "pandas": pd.__version__,
+        "scipy": scipy.__version__,
+        "ahrs": getattr(ahrs, "__version__", None),
+        "plataforma": platform.platform(),
+        "nucleos": os.cpu_count(),
+    }
+
+def medir_importacion(repeticiones=3):
+    """
+    Importa main_app en un proceso nuevo por repetición, como la primera ejecución del script de Streamlit.
+    Devuelve la fila de resultados con los tiempos y los módulos de MODULOS_DIFERIDOS que quedaron cargados.
+    """
+    codigo = ("import sys, time\n"
+              "inicio = time.perf_counter()\n"
+              "import main_app\n"
+              "print(time.perf_counter() - inicio)\n"
+              f"print(','.join(m for m in {MODULOS_DIFERIDOS!r} if m in sys.modules))\n")
+    tiempos = []
+    cargados = []
+    for _ in range(repeticiones):
+        salida = subprocess.run([sys.executable, "-c", codigo], capture_output=True, text=True, check=True,
+                                cwd=os.path.dirname(os.path.abspath(__file__))).stdout.split("\n")
+        tiempos.append(float(salida[0]))
+        cargados = [m for m in salida[1].split(",") if m]
+    return {
+        "duracion_seg": 0,
+        "muestras": 0,
+        "etapa": "importacion",
+        "repeticiones": repeticiones,
+        "segundos_min": min(tiempos),
+        "segundos_mediana": statistics.median(tiempos),
+        "modulos_cargados": cargados,
+    }
+
+def medir_prediccion_lote(repeticiones=3, filas=PREDICCION_LOTE_FILAS, semilla=0):
+    """
+    Mide predict_tremor_batch con un lote de filas pacientes sintéticos (no depende de la duración del
+    registro, como la importación). Devuelve una fila con el modelo preferido y otra con el .joblib.
+    """
+    from ml_model import (get_cached_tremor_model, predict_tremor_batch, preferred_model_filename, load_tremor_model,
+                          EXPECTED_FEATURES, CATEGORICAL_FEATURES, DEFAULT_MODEL_FILENAME)
+    directorio = os.path.dirname(os.path.abspath(__file__))
+    rng = np.random.default_rng(semilla)
+    df_lote = pd.DataFrame({col: rng.uniform(0.0, 12.0, filas) for col in EXPECTED_FEATURES if col not in CATEGORICAL_FEATURES})
+    df_lote["edad"] = rng.integers(20, 90, filas)
+    for col, valores in zip(CATEGORICAL_FEATURES, [["femenino", "masculino"], ["derecha", "izquierda"], ["indice", "pulgar"]]):
+        df_lote[col] = rng.choice(valores, filas)
+    df_lote = df_lote[EXPECTED_FEATURES]
+
+    modelos = {"prediccion_lote": get_cached_tremor_model(preferred_model_filename(directorio))}
+    ruta_sklearn = os.path.join(directorio, DEFAULT_MODEL_FILENAME)
+    if os.path.exists(ruta_sklearn):
+        modelos["prediccion_lote_sklearn"] = load_tremor_model(ruta_sklearn)
+    filas_resultado = []
+    for etapa, modelo in modelos.items():
+        _, tiempos = _medir(lambda: predict_tremor_batch(df_lote, modelo), repeticiones)
+        filas_resultado.append({
+            "duracion_seg": 0,
+            "muestras": filas,
+            "etapa": etapa,
+            "repeticiones": repeticiones,
+            "segundos_min": min(tiempos),
+            "segundos_mediana": statistics.median(tiempos),
+            "muestras_por_seg": filas / min(tiempos) if min(tiempos) > 0 else None,
+            "modelo": type(modelo).__name__,
+        })
+    return filas_resultado
+
+def medir_duracion(duracion_seg, repeticiones=3, fs=100, semilla=0):
+    """Mide todas las etapas para un registro sintético de duracion_seg segundos. Devuelve una fila por etapa."""
+    # Los módulos que el pipeline importa recién al usarlos se cargan antes de medir
+    import scipy.signal # noqa: F401
+    from ahrs.filters import Mahony
+    from synthetic_recordings import generar_registro_sintetico
+    from data_ingestion import leer_medicion
+    from signal_analysis import (magnitud_aceleracion_lineal, filtrar_temblor, calcular_metricas_ventanas,
+                                 analizar_temblor_por_ventanas_resultante, limpiar_cache_etapas)
+    from data_processing import extraer_datos_paciente, diagnosticar
+    from ml_model import get_cached_tremor_model, predict_tremor_batch, prepare_data_for_prediction, preferred_model_filename
+    from pdf_generation import generar_pdf
+    from report_graphics import grafico_amplitud
+    from config import VENTANA_DURACION_SEG
+
+    df_csv = generar_registro_sintetico(duracion_seg, fs, semilla=semilla)
+    contenido = df_csv.to_csv(index=False).encode("latin1")
+    muestras = len(df_csv)
+    tiempos = {}
+
+    (df_imu, df_metadatos), tiempos["lectura_csv"] = _medir(lambda: leer_medicion(contenido), repeticiones)
+    acc = df_imu[["Acel_X", "Acel_Y", "Acel_Z"]].to_numpy()
+    gyr = np.radians(df_imu[["GiroX", "GiroY", "GiroZ"]].to_numpy())
+
+    # Mahony es la etapa más lenta: en registros largos alcanza con una repetición, sin calentamiento
+    largo = duracion_seg > 600
+    Q, tiempos["mahony"] = _medir(lambda: Mahony(gyr=gyr, acc=acc, frequency=fs).Q, 1 if largo else repeticiones,
+                                  calentar=not largo)
+    movimiento, tiempos["gravedad"] = _medir(lambda: magnitud_aceleracion_lineal(acc, Q), repeticiones)
+    filtrada, tiempos["filtrado"] = _medir(lambda: filtrar_temblor(movimiento, fs), repeticiones)
+    tamaño = int(fs * VENTANA_DURACION_SEG)
+    _, tiempos["ventanas"] = _medir(lambda: calcular_metricas_ventanas(filtrada, fs, tamaño), repeticiones)
+
+    def _analisis_completo():
+        limpiar_cache_etapas()
+        return analizar_temblor_por_ventanas_resultante(df_imu, fs=fs)
+    # Las etapas ya se calentaron por separado
+    (df_promedio, df_ventanas), tiempos["analisis_completo"] = _medir(_analisis_completo, 1, calentar=False)
+
+    # Los tres tests con el mismo registro: alcanza para medir las etapas posteriores al análisis
+    promedio = df_promedio.iloc[0].to_dict()
+    df_resultados = pd.DataFrame([{**promedio, "Test": test} for test in ["Reposo", "Postural", "Acción"]])
+    diagnostico, tiempos["diagnosticar"] = _medir(lambda: diagnosticar(df_resultados), repeticiones)
+
+    datos_paciente = extraer_datos_paciente(df_metadatos)
+    modelo = get_cached_tremor_model(preferred_model_filename(os.path.dirname(os.path.abspath(__file__))))
+    df_prediccion = prepare_data_for_prediction(datos_paciente, {test: promedio for test in ["Reposo", "Postural", "Acción"]})
+    _, tiempos["prediccion"] = _medir(lambda: predict_tremor_batch(df_prediccion, modelo), repeticiones)
+
+    tiempo_ventanas = df_ventanas["Ventana"] * VENTANA_DURACION_SEG
+    grafico = grafico_amplitud([(test, tiempo_ventanas, df_ventanas["Amplitud Temblor (cm)"])
+                                for test in ["Reposo", "Postural", "Acción"]], "Amplitud de Temblor por Ventana de Tiempo")
+    pdf, tiempos["generar_pdf"] = _medir(lambda: generar_pdf(datos_paciente, df_resultados, diagnostico=diagnostico,
+                                                             graficos=[grafico]), repeticiones)
+
+    filas = []
+    for etapa in (e for e in ETAPAS if e in tiempos):
+        filas.append({
+            "duracion_seg": duracion_seg,
+            "muestras": muestras,
+            "etapa": etapa,
+            "repeticiones": len(tiempos[etapa]),
+            "segundos_min": min(tiempos[etapa]),
+            "segundos_mediana": statistics.median(tiempos[etapa]),
+            "muestras_por_seg": muestras / min(tiempos[etapa]) if min(tiempos[etapa]) > 0 else None,
+        })
+    filas.append({"duracion_seg": duracion_seg, "muestras": muestras, "etapa": "tamaño_csv_bytes", "valor": len(contenido)})
+    filas.append({"duracion_seg": duracion_seg, "muestras": muestras, "etapa": "tamaño_pdf_bytes", "valor": len(pdf)})
+    return filas
+
+def comparar(resultados, referencia, tolerancia=0.10, minimo_seg=0.005):
+    """
+    Compara dos corridas (segundos_min por duración y etapa). Devuelve un DataFrame con la relación
+    nueva/referencia y la columna 'empeoro' para las etapas más lentas que 1 + tolerancia; las diferencias
+    menores a minimo_seg se consideran ruido de medición.
+    """
+    def _tabla(corrida):
+        df = pd.DataFrame(corrida["resultados"])
+        df = df[df["etapa"].isin(ETAPAS)]
+        return df.set_index(["duracion_seg", "etapa"])["segundos_min"]
+
+    df = pd.concat({"referencia": _tabla(referencia), "nuevo": _tabla(resultados)}, axis=1).dropna()
+    df["relacion"] = df["nuevo"] / df["referencia"]
+    df["empeoro"] = (df["relacion"] > 1 + tolerancia) & (df["nuevo"] - df["referencia"] > minimo_seg)
+    return df
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark del análisis de temblor con registros sintéticos.")
+    parser.add_argument("--duraciones", type=float, nargs="+", default=DURACIONES_POR_DEFECTO, help="Duraciones en segundos")
+    parser.add_argument("--repeticiones", type=int, default=3, help="Repeticiones por etapa (se guarda el mínimo y la mediana)")
+    parser.add_argument("--salida", default="benchmark.json", help="Archivo JSON de resultados")
+    parser.add_argument("--comparar", default=None, help="JSON de una corrida anterior para comparar")
+    parser.add_argument("--tolerancia", type=float, default=0.10, help="Empeoramiento relativo permitido al comparar")
+    parser.add_argument("--presupuesto-importacion", type=float, default=PRESUPUESTO_IMPORTACION_SEG,
+                        help="Segundos máximos para importar main_app")
+    parser.add_argument("--minimo-ms", type=float, default=5.0, help="Diferencia mínima en ms para marcar un empeoramiento")
+    args = parser.parse_args()
+
+    resultados = {"entorno": _entorno(), "resultados": []}
+    importacion = medir_importacion(args.repeticiones)
+    resultados["resultados"].append(importacion)
+    excedido = importacion["segundos_min"] > args.presupuesto_importacion or importacion["modulos_cargados"]
+    print(f"Importación de main_app: {importacion['segundos_min']:.2f} s (presupuesto {args.presupuesto_importacion:.2f} s)"
+          + (f", carga {', '.join(importacion['modulos_cargados'])}" if importacion["modulos_cargados"] else ""))
+    lote = medir_prediccion_lote(args.repeticiones)
+    resultados["resultados"].extend(lote)
+    print(f"Predicción de {PREDICCION_LOTE_FILAS} filas: "
+          + ", ".join(f"{f['modelo']} {f['segundos_min'] * 1000:.1f} ms" for f in lote))
+    for duracion in args.duraciones:
+        duracion = int(duracion) if float(duracion).is_integer() else duracion
+        inicio = time.perf_counter()
+        filas = medir_duracion(duracion, args.repeticiones)
+        resultados["resultados"].extend(filas)
+        resumen = ", ".join(f"{f['etapa']} {f['segundos_min'] * 1000:.1f} ms" for f in filas if "segundos_min" in f)
+        print(f"{duracion} s ({time.perf_counter() - inicio:.1f} s): {resumen}")
+
+    with open(args.salida, "w", encoding="utf-8") as f:
+        json.dump(resultados, f, ensure_ascii=False, indent=2)
+    print(f"Resultados en {args.salida}")
+    if excedido:
+        print("La importación de main_app excede el presupuesto o carga módulos que deberían ser diferidos.")
+
+    if args.comparar:
+        with open(args.comparar, encoding="utf-8") as f:
+            referencia = json.load(f)
+        df = comparar(resultados, referencia, args.tolerancia, args.minimo_ms / 1000)
+        with pd.option_context("display.width", 120, "display.max_rows", None):
+            print(df.round(4))
+        if df["empeoro"].any():
+            print(f"{int(df['empeoro'].sum())} etapas más lentas que la referencia (tolerancia {args.tolerancia:.0%}).")
+            sys.exit(1)
+    if excedido:
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,231 @@
+# bulk_reports.py
+"""
+Generación masiva de informes PDF a partir de los resultados de batch_analysis.
+
+Uso:
+    python bulk_reports.py carpeta_resultados salida [--tipo individual|prediccion|comparacion]
+                           [--pares pares.csv] [--procesos N]
+
+carpeta_resultados es la salida de batch_analysis (pacientes/*.json y ventanas/*.csv); no se vuelve a
+analizar ningún registro, solo se leen los encabezados de los CSV para los datos del paciente.
+salida es una carpeta (un PDF por informe) o un archivo .zip.
+  - individual: un informe por paciente, como el modo 1 de la aplicación.
+  - prediccion: un informe por paciente con predicción (batch_analysis --prediccion), como el modo 3.
+  - comparacion: un informe por fila de --pares (CSV con columnas Paciente1 y Paciente2), como el modo 2.
+
+Cada proceso del pool prepara una sola vez lo que comparten los informes (fuentes, texto fijo de la
+interpretación clínica) y devuelve los bytes de cada PDF, que se escriben desde este proceso.
+"""
+import argparse
+import glob
+import json
+import os
+import time
+import zipfile
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import pandas as pd
+
+from config import VENTANA_SALTO_SEG
+from data_processing import extraer_datos_paciente_archivo, conclusion_comparacion
+from batch_analysis import TESTS, PREFIJOS_TEST, nombre_archivo_paciente
+from report_graphics import grafico_amplitud
+
+TIPOS_INFORME = ["individual", "prediccion", "comparacion"]
+
+def leer_resultados(carpeta_resultados):
+    """Devuelve {paciente: {"fila", "archivos", "salto_seg", "ventanas"}} de una corrida de batch_analysis."""
+    pacientes = {}
+    for ruta in sorted(glob.glob(os.path.join(carpeta_resultados, "pacientes", "*.json"))):
+        with open(ruta, encoding="utf-8") as f:
+            estado = json.load(f)
+        fila = estado["fila"]
+        if "Error" in fila:
+            continue
+        paciente = fila["Paciente"]
+        ruta_ventanas = os.path.join(carpeta_resultados, "ventanas", f"{nombre_archivo_paciente(paciente)}.csv")
+        pacientes[paciente] = {
+            "fila": fila,
+            "archivos": {test: datos[0] for test, datos in estado["huella"]["archivos"].items()},
+            "salto_seg": estado["huella"]["parametros"].get("salto_seg") or VENTANA_SALTO_SEG,
+            "ventanas": pd.read_csv(ruta_ventanas) if os.path.exists(ruta_ventanas) else pd.DataFrame(),
+        }
+    return pacientes
+
+def _datos_paciente(resultado):
+    for test in TESTS.values():
+        ruta = resultado["archivos"].get(test)
+        if ruta is not None and os.path.exists(ruta):
+            return extraer_datos_paciente_archivo(ruta)
+    return {}
+
+def _tabla_resultados(fila, redondear=False):
+    filas = []
+    for test, prefijo in PREFIJOS_TEST.items():
+        if pd.isna(fila.get(f"Frec_{prefijo}", float("nan"))):
+            continue
+        valores = {
+            "Frecuencia Dominante (Hz)": fila[f"Frec_{prefijo}"],
+            "RMS (m/s2)": fila[f"RMS_{prefijo}"],
+            "Amplitud Temblor (cm)": fila[f"Amp_{prefijo}"],
+        }
+        if redondear: # Igual que la tabla del modo de comparación
+            valores = {col: round(valor, 4 if col == "RMS (m/s2)" else 2) for col, valor in valores.items()}
+        filas.append({"Test": test, **valores})
+    return pd.DataFrame(filas)
+
+def _grafico_tests(resultado, titulo):
+    df_ventanas = resultado["ventanas"]
+    if df_ventanas.empty:
+        return []
+    por_test = [(test, df) for test, df in df_ventanas.groupby("Test", sort=False)]
+    largo = min(len(df) for _, df in por_test) # Como en la aplicación, todas las curvas con el mismo largo
+    series = [(test, df["Ventana"].iloc[:largo] * resultado["salto_seg"], df["Amplitud Temblor (cm)"].iloc[:largo])
+              for test, df in por_test]
+    return [grafico_amplitud(series, titulo)]
+
+def trabajo_individual(paciente, resultado):
+    """(nombre del PDF, argumentos de generar_pdf) del informe individual de un paciente."""
+    return f"{nombre_archivo_paciente(paciente)}_individual.pdf", dict(
+        datos_paciente_dict=_datos_paciente(resultado),
+        df_resultados=_tabla_resultados(resultado["fila"]),
+        diagnostico=resultado["fila"].get("Diagnostico", ""),
+        graficos=_grafico_tests(resultado, "Amplitud de Temblor por Ventana de Tiempo"),
+    )
+
+def trabajo_prediccion(paciente, resultado):
+    """(nombre del PDF, argumentos de generar_pdf) del informe de predicción, o None si no hay predicción."""
+    fila = resultado["fila"]
+    if "Prediccion" not in fila:
+        return None
+    probabilidades = {col[len("Prob_"):]: valor * 100 for col, valor in fila.items() if col.startswith("Prob_")}
+    return f"{nombre_archivo_paciente(paciente)}_prediccion.pdf", dict(
+        datos_paciente_dict=_datos_paciente(resultado),
+        df_resultados=_tabla_resultados(fila),
+        diagnostico=fila["Prediccion"],
+        graficos=_grafico_tests(resultado, "Amplitud de Temblor por Ventana de Tiempo (Archivos de Predicción)"),
+        prediction_info={"prediction": fila["Prediccion"], "probabilities": probabilidades},
+    )
+
+def trabajo_comparacion(paciente1, resultado1, paciente2, resultado2):
+    """(nombre del PDF, argumentos de generar_pdf) del informe comparativo entre dos mediciones."""
+    df1 = _tabla_resultados(resultado1["fila"], redondear=True)
+    df2 = _tabla_resultados(resultado2["fila"], redondear=True)
+    conclusion = conclusion_comparacion(df1, df2)
+
+    parametros1, parametros2 = _datos_paciente(resultado1), _datos_paciente(resultado2)
+    datos_comunes = dict(parametros1)
+    datos_comunes.update({k: v for k, v in parametros2.items() if not datos_comunes.get(k) or str(datos_comunes.get(k)).strip() == ""})
+
+    graficos = []
+    v1, v2 = resultado1["ventanas"], resultado2["ventanas"]
+    for test in TESTS.values():
+        t1 = v1[v1["Test"] == test] if not v1.empty else v1
+        t2 = v2[v2["Test"] == test] if not v2.empty else v2
+        if not t1.empty and not t2.empty:
+            graficos.append(grafico_amplitud([
+                ("Medición 1", t1["Ventana"] * resultado1["salto_seg"], t1["Amplitud Temblor (cm)"], "#0000ff"),
+                ("Medición 2", t2["Ventana"] * resultado2["salto_seg"], t2["Amplitud Temblor (cm)"], "#ffa500"),
+            ], f"Amplitud por Ventana - {test}"))
+
+    return f"{nombre_archivo_paciente(paciente1)}_vs_{nombre_archivo_paciente(paciente2)}_comparacion.pdf", dict(
+        datos_paciente_dict=datos_comunes,
+        df_resultados=pd.concat([df1.assign(Measurement=1), df2.assign(Measurement=2)], ignore_index=True),
+        diagnostico=conclusion,
+        graficos=graficos,
+        comparison_mode=True,
+        config1_params=parametros1,
+        config2_params=parametros2,
+    )
+
+def _inicializar_proceso():
+    from pdf_generation import precargar_recursos
+    precargar_recursos()
+
+def _generar(nombre, kwargs_pdf):
+    from pdf_generation import generar_pdf
+    return nombre, generar_pdf(**kwargs_pdf)
+
+def generar_informes(trabajos, salida, procesos=None):
+    """
+    Genera los informes [(nombre, argumentos de generar_pdf)] en un pool de procesos y los escribe en
+    la carpeta salida o en el archivo .zip salida. Devuelve la cantidad de informes generados.
+    """
+    como_zip = salida.lower().endswith(".zip")
+    if como_zip:
+        os.makedirs(os.path.dirname(os.path.abspath(salida)), exist_ok=True)
+        # Los PDF ya vienen comprimidos: se guardan sin volver a comprimir
+        destino = zipfile.ZipFile(salida, "w", compression=zipfile.ZIP_STORED)
+    else:
+        os.makedirs(salida, exist_ok=True)
+        destino = None
+
+    total = len(trabajos)
+    generados = 0
+    megabytes = 0.0
+    inicio = time.perf_counter()
+    try:
+        with ProcessPoolExecutor(max_workers=procesos, initializer=_inicializar_proceso) as pool:
+            futuros = [pool.submit(_generar, nombre, kwargs_pdf) for nombre, kwargs_pdf in trabajos]
+            for futuro in as_completed(futuros):
+                try:
+                    nombre, contenido = futuro.result()
+                except Exception as e:
+                    print(f"Error al generar un informe: {type(e).__name__}: {e}")
+                    continue
+                if como_zip:
+                    destino.writestr(nombre, contenido)
+                else:
+                    with open(os.path.join(salida, nombre), "wb") as f:
+                        f.write(contenido)
+                generados += 1
+                megabytes += len(contenido) / 1e6
+                if generados % 50 == 0 or generados == total:
+                    transcurrido = time.perf_counter() - inicio
+                    print(f"[{generados}/{total}] {generados / transcurrido:.1f} informes/s, {megabytes:.1f} MB")
+    finally:
+        if destino is not None:
+            destino.close()
+    return generados
+
+def trabajos_desde_resultados(carpeta_resultados, tipo="individual", ruta_pares=None):
+    """Arma la lista de trabajos de generar_informes para una corrida de batch_analysis."""
+    resultados = leer_resultados(carpeta_resultados)
+    if tipo == "individual":
+        return [trabajo_individual(p, r) for p, r in resultados.items()]
+    if tipo == "prediccion":
+        trabajos = [trabajo_prediccion(p, r) for p, r in resultados.items()]
+        if None in trabajos:
+            print(f"{trabajos.count(None)} pacientes sin predicción (correr batch_analysis con --prediccion).")
+        return [t for t in trabajos if t is not None]
+    if tipo == "comparacion":
+        if ruta_pares is None:
+            raise ValueError("Los informes comparativos necesitan --pares.")
+        pares = pd.read_csv(ruta_pares, dtype=str)
+        trabajos = []
+        for p1, p2 in zip(pares["Paciente1"].str.strip(), pares["Paciente2"].str.strip()):
+            if p1 not in resultados or p2 not in resultados:
+                print(f"Aviso: no hay resultados para {p1 if p1 not in resultados else p2}; se omite el par.")
+                continue
+            trabajos.append(trabajo_comparacion(p1, resultados[p1], p2, resultados[p2]))
+        return trabajos
+    raise ValueError(f"Tipo de informe desconocido: {tipo}")
+
+def main():
+    parser = argparse.ArgumentParser(description="Genera informes PDF en lote a partir de los resultados de batch_analysis.")
+    parser.add_argument("resultados", help="Carpeta de salida de batch_analysis")
+    parser.add_argument("salida", help="Carpeta o archivo .zip donde se escriben los informes")
+    parser.add_argument("--tipo", choices=TIPOS_INFORME, default="individual", help="Tipo de informe")
+    parser.add_argument("--pares", default=None, help="CSV con columnas Paciente1 y Paciente2 (informes comparativos)")
+    parser.add_argument("--procesos", type=int, default=None, help="Procesos del pool (por defecto, uno por núcleo)")
+    args = parser.parse_args()
+
+    inicio = time.perf_counter()
+    trabajos = trabajos_desde_resultados(args.resultados, args.tipo, args.pares)
+    preparacion = time.perf_counter() - inicio
+    generados = generar_informes(trabajos, args.salida, args.procesos)
+    transcurrido = time.perf_counter() - inicio
+    print(f"{generados} informes en {transcurrido:.1f} s ({preparacion:.1f} s leyendo resultados), "
+          f"{generados / max(transcurrido - preparacion, 1e-9):.1f} informes/s. Informes en {args.salida}")
+
+if __name__ == "__main__":
+    main()
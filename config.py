@@ -1,4 +1,41 @@
 # config.py
+import os
 
 # Global configuration for window duration
 VENTANA_DURACION_SEG = 2
+
+# Cada cuántos segundos comienza una nueva ventana. Igual a VENTANA_DURACION_SEG = ventanas contiguas;
+# un valor menor (por ejemplo 0.25) genera ventanas solapadas y mayor resolución temporal.
+VENTANA_SALTO_SEG = VENTANA_DURACION_SEG
+
+# Caché en disco de resultados de análisis (ver analysis_cache.py). Está junto a este archivo, sin importar
+# desde qué carpeta se ejecute la aplicación o los scripts; TEMBLOR_CACHE_DIR=carpeta la cambia.
+CACHE_DIR = os.environ.get("TEMBLOR_CACHE_DIR") or os.path.join(os.path.dirname(os.path.abspath(__file__)), ".cache_analisis")
+CACHE_MAX_BYTES = 500 * 1024 * 1024
+
+# Los CSV más grandes que esto (unas 2 horas a 100 Hz) se analizan por bloques, con memoria acotada
+# (ver signal_analysis.analizar_temblor_csv_por_bloques); los resultados difieren en menos de 1e-9
+ANALISIS_POR_BLOQUES_DESDE_BYTES = 100 * 1024 * 1024
+
+# La amplitud en cm solo se calcula en ventanas con frecuencia dominante mayor a este umbral
+UMBRAL_FRECUENCIA_AMPLITUD_HZ = 1.5
+
+# Memoria máxima de los resultados intermedios (orientación, filtrado, ventanas) memorizados en cada
+# proceso; los procesos de parallel_analysis y batch_analysis tienen cada uno la suya. Una hora de
+# registro a 100 Hz ocupa unos 17 MB entre las tres etapas.
+MAX_BYTES_CACHE_ETAPAS = 128 * 1024 * 1024
+
+# Memoria máxima de los resultados que cada sesión de la aplicación conserva entre re-ejecuciones
+# (ver session_store.py); al superarla se descartan los pacientes vistos hace más tiempo
+SESION_MAX_BYTES = 100 * 1024 * 1024
+
+# Servidor local de inferencia (ver inference_server.py); solo escucha en esta máquina
+SERVIDOR_INFERENCIA_URL = "http://127.0.0.1:8765"
+
+# Instrumentación por etapas (ver pipeline_profiling.py), apagada por defecto. TEMBLOR_PERFILADO=1 la
+# enciende al iniciar, TEMBLOR_PERFILADO_MEMORIA=1 agrega el pico de memoria (más lento) y
+# TEMBLOR_PERFILADO_LOG=archivo.jsonl escribe cada registro como una línea JSON para el monitoreo.
+PERFILADO_ACTIVO = os.environ.get("TEMBLOR_PERFILADO", "") not in ("", "0")
+PERFILADO_MEMORIA = os.environ.get("TEMBLOR_PERFILADO_MEMORIA", "") not in ("", "0")
+PERFILADO_LOG = os.environ.get("TEMBLOR_PERFILADO_LOG") or None
+PERFILADO_MAX_REGISTROS = 5000
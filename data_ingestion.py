@@ -0,0 +1,126 @@
+# data_ingestion.py
+import csv
+import importlib.util
+import io
+import os
+import numpy as np
+import pandas as pd
+
+from pipeline_profiling import etapa
+
+COLUMNAS_IMU = ['Acel_X', 'Acel_Y', 'Acel_Z', 'GiroX', 'GiroY', 'GiroZ']
+
+# Valores que pd.read_csv interpreta como faltantes por defecto (STR_NA_VALUES de pandas)
+VALORES_FALTANTES = frozenset([
+    '', '#N/A', '#N/A N/A', '#NA', '-1.#IND', '-1.#QNAN', '-NaN', '-nan', '1.#IND', '1.#QNAN',
+    '<NA>', 'N/A', 'NA', 'NULL', 'NaN', 'None', 'n/a', 'nan', 'null',
+])
+
+# Solo se verifica que pyarrow esté instalado, sin importarlo: pd.read_csv lo carga en leer_imu
+MOTOR_CSV = 'pyarrow' if importlib.util.find_spec('pyarrow') is not None else 'c'
+
+def leer_bytes(archivo):
+    """Devuelve el contenido de una ruta, bytes o archivo subido (dejándolo en la posición 0)."""
+    if isinstance(archivo, (bytes, bytearray, memoryview)):
+        return bytes(archivo)
+    if isinstance(archivo, (str, os.PathLike)):
+        with open(archivo, "rb") as f:
+            return f.read()
+    archivo.seek(0)
+    contenido = archivo.read()
+    archivo.seek(0)
+    return contenido
+
+def leer_encabezado(archivo):
+    """
+    Devuelve los bytes del encabezado y de la primera fila de datos de un CSV o .imu (ruta, bytes o
+    archivo subido) sin leer el resto del archivo.
+    """
+    if isinstance(archivo, (bytes, bytearray, memoryview)):
+        return _comienzo(io.BytesIO(bytes(archivo)))
+    if isinstance(archivo, (str, os.PathLike)):
+        with open(archivo, "rb") as f:
+            return _comienzo(f)
+    archivo.seek(0)
+    encabezado = _comienzo(archivo)
+    archivo.seek(0)
+    return encabezado
+
+def _comienzo(f):
+    from binary_recording import FIRMA, es_binario, leer_comienzo
+    if es_binario(f.read(len(FIRMA))):
+        f.seek(0)
+        return leer_comienzo(f)
+    f.seek(0)
+    return f.readline() + f.readline()
+
+def _es_binario(contenido):
+    from binary_recording import es_binario
+    return es_binario(contenido)
+
+def leer_metadatos(contenido):
+    """
+    Lee solo el encabezado y la primera fila de datos y devuelve un DataFrame de una fila
+    con las columnas que no son del IMU (datos del paciente y de la configuración), como texto.
+    Los valores vacíos o de VALORES_FALTANTES quedan como NaN, igual que con pd.read_csv.
+    Si el archivo no tiene filas de datos, el DataFrame queda vacío. Con un .imu son los metadatos
+    guardados en su encabezado.
+    """
+    if _es_binario(contenido):
+        from binary_recording import metadatos_binario
+        return metadatos_binario(contenido)
+    texto = io.TextIOWrapper(io.BytesIO(contenido), encoding='latin1', newline='')
+    lector = csv.reader(texto)
+    encabezado = next(lector, [])
+    primera_fila = next(lector, None)
+    columnas = [col for col in encabezado if col not in COLUMNAS_IMU]
+    if primera_fila is None:
+        return pd.DataFrame(columns=columnas)
+    valores = dict(zip(encabezado, primera_fila))
+    fila = {col: (valores.get(col) if valores.get(col, '').strip() not in VALORES_FALTANTES else np.nan)
+            for col in columnas}
+    return pd.DataFrame([fila], columns=columnas)
+
+def leer_metadatos_archivo(archivo):
+    """Igual que leer_metadatos pero leyendo solo el comienzo del archivo (ruta, bytes o archivo subido)."""
+    return leer_metadatos(leer_encabezado(archivo))
+
+def tiene_datos(archivo):
+    """
+    True si el CSV o .imu (ruta, bytes o archivo subido) tiene al menos una fila de datos después del
+    encabezado. Lee solo el comienzo del archivo.
+    """
+    encabezado = leer_encabezado(archivo)
+    if _es_binario(encabezado):
+        from binary_recording import cantidad_muestras
+        return cantidad_muestras(encabezado) > 0
+    texto = io.TextIOWrapper(io.BytesIO(encabezado), encoding='latin1', newline='')
+    lector = csv.reader(texto)
+    next(lector, None)
+    return next(lector, None) is not None
+
+def leer_imu(contenido, dtype=np.float64):
+    """
+    Lee únicamente las seis columnas del IMU, con tipo numérico fijo. contenido puede ser un CSV o un
+    archivo .imu (ver binary_recording), que se reconoce por su firma.
+    """
+    with etapa("lectura_csv", bytes=len(contenido)) as registro:
+        if _es_binario(contenido):
+            from binary_recording import desde_bytes
+            datos, _ = desde_bytes(contenido)
+            df = pd.DataFrame(datos.astype(dtype), columns=COLUMNAS_IMU)
+            registro.anotar(formato="imu")
+        else:
+            df = pd.read_csv(io.BytesIO(contenido), encoding='latin1', usecols=COLUMNAS_IMU,
+                             dtype={col: dtype for col in COLUMNAS_IMU}, engine=MOTOR_CSV)
+        registro.anotar(muestras=len(df))
+    return df
+
+def leer_medicion(archivo, dtype=np.float64):
+    """
+    Lee un CSV o .imu de medición (ruta, bytes o archivo subido) una sola vez y devuelve (df_imu, df_metadatos):
+    df_imu con las seis columnas del IMU y df_metadatos con la primera fila de las demás columnas,
+    apto para extraer_datos_paciente.
+    """
+    contenido = leer_bytes(archivo)
+    return leer_imu(contenido, dtype), leer_metadatos(contenido)
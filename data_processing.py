@@ -1,6 +1,10 @@
 # data_processing.py
+from functools import lru_cache
 import pandas as pd
 
+from data_ingestion import leer_encabezado, leer_metadatos
+from window_results import ResultadosVentanas
+
 def extraer_datos_paciente(df):
     """
     Extrae datos personales del paciente y parámetros de configuración desde un DataFrame,
@@ -63,11 +67,27 @@ def extraer_datos_paciente(df):
 
     return datos
 
+@lru_cache(maxsize=256)
+def _datos_paciente_desde_encabezado(encabezado):
+    return extraer_datos_paciente(leer_metadatos(encabezado))
+
+def extraer_datos_paciente_archivo(archivo):
+    """
+    Igual que extraer_datos_paciente pero a partir del archivo CSV (ruta, bytes o archivo subido),
+    leyendo solo el encabezado y la primera fila. El resultado se memoriza según esos bytes,
+    así que volver a consultar el mismo archivo no lo vuelve a procesar.
+    """
+    return dict(_datos_paciente_desde_encabezado(leer_encabezado(archivo)))
+
 def diagnosticar(df):
     """
     Realiza un diagnóstico de temblor basado en los resultados de las pruebas.
     Asume que df contiene las columnas 'Test', 'Amplitud Temblor (cm)', 'Frecuencia Dominante (Hz)'.
+    df puede ser un DataFrame o un ResultadosVentanas con la etiqueta Test.
     """
+    if isinstance(df, ResultadosVentanas):
+        df = df.a_dataframe()
+
     def max_amp(test):
         fila = df[df['Test'] == test]
         return fila['Amplitud Temblor (cm)'].max() if not fila.empty else 0
@@ -84,3 +104,26 @@ def diagnosticar(df):
     else:
         return "Temblor dentro de parámetros normales"
 
+
+def conclusion_comparacion(df_medicion1, df_medicion2):
+    """
+    Conclusión del análisis comparativo según la amplitud promedio de cada medición.
+    Cada DataFrame tiene una fila por test con la columna 'Amplitud Temblor (cm)'.
+    """
+    amp_avg_config1 = df_medicion1['Amplitud Temblor (cm)'].mean() if not df_medicion1.empty else 0
+    amp_avg_config2 = df_medicion2['Amplitud Temblor (cm)'].mean() if not df_medicion2.empty else 0
+
+    if amp_avg_config1 < amp_avg_config2:
+        return (
+            f"La Medición 1 muestra una amplitud de temblor promedio ({amp_avg_config1:.2f} cm) "
+            f"más baja que la Medición 2 ({amp_avg_config2:.2f} cm), lo que sugiere una mayor reducción del temblor."
+        )
+    elif amp_avg_config2 < amp_avg_config1:
+        return (
+            f"La Medición 2 muestra una amplitud de temblor promedio ({amp_avg_config2:.2f} cm) "
+            f"más baja que la Medición 1 ({amp_avg_config1:.2f} cm), lo que sugiere una mayor reducción del temblor."
+        )
+    else:
+        return (
+            f"Ambas mediciones muestran amplitudes de temblor promedio muy similares ({amp_avg_config1:.2f} cm). "
+        )
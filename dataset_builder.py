@@ -0,0 +1,162 @@
+# dataset_builder.py
+"""
+Reconstrucción del dataset de entrenamiento a partir de los registros crudos.
+
+Uso:
+    python dataset_builder.py carpeta_registros [salida.parquet] [--etiquetas etiquetas.csv] [--procesos N]
+
+Agrupa los CSV por paciente igual que batch_analysis, analiza cada registro en un proceso del pool y
+arma una fila por paciente con prepare_data_for_prediction (edad, sexo, mano, dedo y Frec_/RMS_/Amp_
+de cada test) más las columnas Paciente y Etiqueta. La etiqueta sale de --etiquetas (CSV con columnas
+Paciente y Etiqueta) o, si no se indica, de la columna Diagnostico del propio registro.
+
+Cada registro se analiza con analysis_cache.analizar_archivo_con_cache, así que los registros que la
+aplicación o batch_analysis ya analizaron con los mismos parámetros no se vuelven a analizar. Lo que
+hace falta para armar las filas (métricas promedio y datos del paciente de cada registro) se guarda
+además en un archivo junto a la salida (<salida>.cache.json), identificado por la ruta, el tamaño,
+la fecha de modificación, los parámetros del análisis y VERSION_PIPELINE: al volver a correr solo se
+procesan los registros nuevos o modificados, sin leerlos.
+"""
+import argparse
+import json
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import pandas as pd
+
+from config import VENTANA_DURACION_SEG, VENTANA_SALTO_SEG, UMBRAL_FRECUENCIA_AMPLITUD_HZ
+from data_ingestion import MOTOR_CSV, leer_bytes
+from data_processing import extraer_datos_paciente_archivo
+from signal_analysis import VERSION_PIPELINE
+from analysis_cache import analizar_archivo_con_cache
+from ml_model import EXPECTED_FEATURES, prepare_data_for_prediction
+from batch_analysis import TESTS, agrupar_por_paciente
+
+CAMPOS_PACIENTE = ["sexo", "edad", "mano_medida", "dedo_medido", "Diagnostico"]
+# Cada cuántos registros analizados se guarda la caché (además de al terminar)
+GUARDAR_CACHE_CADA = 20
+
+def _huella_registro(ruta, parametros):
+    estado = os.stat(ruta)
+    return [estado.st_size, estado.st_mtime_ns, parametros, VERSION_PIPELINE]
+
+def metricas_registro(ruta, fs=100, ventana_seg=VENTANA_DURACION_SEG, salto_seg=VENTANA_SALTO_SEG,
+                      umbral_freq_hz=UMBRAL_FRECUENCIA_AMPLITUD_HZ):
+    """
+    Analiza un registro (con la caché de analysis_cache) y devuelve {"promedio": métricas promedio
+    (vacío si no hubo ventanas), "datos_paciente": campos de CAMPOS_PACIENTE}.
+    """
+    contenido = leer_bytes(ruta)
+    df_promedio, _ = analizar_archivo_con_cache(contenido, fs=fs, ventana_seg=ventana_seg, salto_seg=salto_seg,
+                                                umbral_freq_hz=umbral_freq_hz)
+    promedio = {} if df_promedio.empty else {col: float(valor) for col, valor in df_promedio.iloc[0].items()}
+    datos_paciente = extraer_datos_paciente_archivo(contenido)
+    return {"promedio": promedio, "datos_paciente": {campo: datos_paciente.get(campo) for campo in CAMPOS_PACIENTE}}
+
+def _leer_cache(ruta_cache):
+    try:
+        with open(ruta_cache, encoding="utf-8") as f:
+            return json.load(f)
+    except (FileNotFoundError, ValueError):
+        return {}
+
+def _guardar_cache(ruta_cache, cache):
+    tmp = ruta_cache + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(cache, f, ensure_ascii=False)
+    os.replace(tmp, ruta_cache)
+
+def _leer_etiquetas(ruta):
+    df = pd.read_csv(ruta, dtype=str, encoding="latin1")
+    return dict(zip(df["Paciente"].str.strip(), df["Etiqueta"].str.strip()))
+
+def construir_dataset(carpeta_entrada, salida, etiquetas=None, procesos=None, fs=100, ventana_seg=VENTANA_DURACION_SEG,
+                      salto_seg=VENTANA_SALTO_SEG, umbral_freq_hz=UMBRAL_FRECUENCIA_AMPLITUD_HZ):
+    """
+    Construye el dataset y lo escribe en salida (.parquet o .csv). etiquetas es {paciente: etiqueta}
+    o None para usar el Diagnostico de los registros. Devuelve el DataFrame.
+    """
+    pacientes = agrupar_por_paciente(carpeta_entrada)
+    parametros = {"fs": fs, "ventana_seg": ventana_seg, "salto_seg": salto_seg, "umbral_freq_hz": umbral_freq_hz}
+
+    ruta_cache = salida + ".cache.json"
+    cache_anterior = _leer_cache(ruta_cache)
+    cache = {}
+    pendientes = {}
+    for archivos in pacientes.values():
+        for ruta in archivos.values():
+            clave = os.path.abspath(ruta)
+            huella = _huella_registro(ruta, parametros)
+            anterior = cache_anterior.get(clave)
+            if anterior is not None and anterior["huella"] == huella:
+                cache[clave] = anterior
+            else:
+                pendientes[clave] = huella
+
+    total = len(pendientes)
+    print(f"{len(pacientes)} pacientes, {len(cache) + total} registros: {len(cache)} en caché, {total} por analizar.")
+
+    inicio = time.perf_counter()
+    try:
+        if pendientes:
+            with ProcessPoolExecutor(max_workers=procesos) as pool:
+                futuros = {pool.submit(metricas_registro, clave, **parametros): clave for clave in pendientes}
+                for hechos, futuro in enumerate(as_completed(futuros), start=1):
+                    clave = futuros[futuro]
+                    try:
+                        cache[clave] = {"huella": pendientes[clave], **futuro.result()}
+                    except Exception as e:
+                        print(f"Error en {clave}: {type(e).__name__}: {e}")
+                    if hechos % GUARDAR_CACHE_CADA == 0:
+                        _guardar_cache(ruta_cache, cache)
+                    transcurrido = time.perf_counter() - inicio
+                    print(f"[{hechos}/{total}] {os.path.relpath(clave, carpeta_entrada)} | {hechos / transcurrido:.2f} registros/s")
+    finally:
+        # Lo ya analizado queda guardado aunque la corrida se interrumpa
+        _guardar_cache(ruta_cache, cache)
+
+    filas = []
+    for paciente, archivos in sorted(pacientes.items()):
+        registros = [cache[os.path.abspath(archivos[test])] for test in TESTS.values()
+                     if test in archivos and os.path.abspath(archivos[test]) in cache]
+        if not registros:
+            continue
+        datos_paciente = {campo: valor for campo, valor in registros[0]["datos_paciente"].items() if valor is not None}
+        avg_tremor_metrics = {test: cache[os.path.abspath(ruta)]["promedio"] for test, ruta in archivos.items()
+                              if os.path.abspath(ruta) in cache and cache[os.path.abspath(ruta)]["promedio"]}
+        etiqueta = etiquetas.get(paciente) if etiquetas is not None else datos_paciente.get("Diagnostico")
+        fila = prepare_data_for_prediction(datos_paciente, avg_tremor_metrics)
+        fila.insert(0, "Etiqueta", etiqueta)
+        fila.insert(0, "Paciente", paciente)
+        filas.append(fila)
+
+    columnas = ["Paciente", "Etiqueta"] + EXPECTED_FEATURES
+    df_dataset = pd.concat(filas, ignore_index=True) if filas else pd.DataFrame(columns=columnas)
+    if salida.lower().endswith(".parquet"):
+        df_dataset.to_parquet(salida, index=False)
+    else:
+        df_dataset.to_csv(salida, index=False)
+    return df_dataset
+
+def main():
+    # Parquet (columnar) si pyarrow está instalado; si no, CSV
+    salida_por_defecto = "dataset_temblor.parquet" if MOTOR_CSV == "pyarrow" else "dataset_temblor.csv"
+    parser = argparse.ArgumentParser(description="Reconstruye el dataset de entrenamiento desde los registros crudos.")
+    parser.add_argument("entrada", help="Carpeta con los CSV de Reposo/Postural/Acción")
+    parser.add_argument("salida", nargs="?", default=salida_por_defecto, help="Archivo .parquet o .csv de salida")
+    parser.add_argument("--etiquetas", default=None, help="CSV con columnas Paciente y Etiqueta")
+    parser.add_argument("--procesos", type=int, default=None, help="Procesos del pool (por defecto, uno por núcleo)")
+    parser.add_argument("--fs", type=int, default=100, help="Frecuencia de muestreo (Hz)")
+    parser.add_argument("--ventana", type=float, default=VENTANA_DURACION_SEG, help="Duración de la ventana (s)")
+    parser.add_argument("--salto", type=float, default=VENTANA_SALTO_SEG, help="Salto entre ventanas (s)")
+    args = parser.parse_args()
+
+    etiquetas = _leer_etiquetas(args.etiquetas) if args.etiquetas else None
+    inicio = time.perf_counter()
+    df_dataset = construir_dataset(args.entrada, args.salida, etiquetas, args.procesos, args.fs, args.ventana, args.salto)
+    sin_etiqueta = int(df_dataset["Etiqueta"].isna().sum())
+    print(f"{len(df_dataset)} pacientes en {time.perf_counter() - inicio:.1f} s ({sin_etiqueta} sin etiqueta). "
+          f"Dataset en {args.salida}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,270 @@
+# inference_server.py
+"""
+Servidor HTTP local de predicción de temblor.
+
+Uso:
+    python inference_server.py [--host 127.0.0.1] [--port 8765] [--modelo archivo] [--max-lote 64] [--espera-ms 5]
+
+Carga el modelo una sola vez y agrupa las solicitudes que llegan al mismo tiempo en micro-lotes,
+de modo que cada lote se resuelve con una sola llamada a predict_proba.
+
+Endpoints:
+  POST /predict  {"patients": [...]} donde cada paciente es
+                 {"datos_paciente": {...}, "avg_tremor_metrics": {"Reposo": {...}, ...}} (métricas crudas)
+                 o {"features": {"edad": ..., "Frec_Reposo": ..., "sexo": ...}} (características ya armadas).
+                 Devuelve {"predictions": [{"prediction": ..., "probabilities": {clase: p}}], "batch_size": n}.
+  GET  /metrics  solicitudes, lotes, tamaño medio de lote, profundidad de la cola y latencias.
+  GET  /health   estado y modelo cargado.
+"""
+import argparse
+import json
+import queue
+import threading
+import time
+import urllib.request
+from collections import deque
+from concurrent.futures import Future
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import numpy as np
+import pandas as pd
+
+from config import SERVIDOR_INFERENCIA_URL
+from ml_model import (CATEGORICAL_FEATURES, EXPECTED_FEATURES, get_cached_tremor_model, predict_tremor_batch,
+                      prepare_data_for_prediction, preferred_model_filename)
+
+MAX_BODY_BYTES = 1024 * 1024
+
+
+def features_from_payload(patients):
+    """
+    Arma el DataFrame de características (columnas de EXPECTED_FEATURES) a partir de la lista de
+    pacientes recibida. Lanza ValueError si algún paciente no tiene el formato esperado.
+    """
+    if not isinstance(patients, list) or not patients:
+        raise ValueError("'patients' debe ser una lista no vacía.")
+    rows = []
+    for patient in patients:
+        if not isinstance(patient, dict):
+            raise ValueError("Cada paciente debe ser un objeto JSON.")
+        if 'features' in patient:
+            features = pd.DataFrame([patient['features']]).reindex(columns=EXPECTED_FEATURES)
+        elif 'avg_tremor_metrics' in patient:
+            features = prepare_data_for_prediction(patient.get('datos_paciente') or {}, patient['avg_tremor_metrics'])
+        else:
+            raise ValueError("Cada paciente debe tener 'features' o 'avg_tremor_metrics'.")
+        rows.append(features)
+    df = pd.concat(rows, ignore_index=True)
+
+    numeric = [col for col in EXPECTED_FEATURES if col not in CATEGORICAL_FEATURES]
+    df[numeric] = df[numeric].astype(np.float64)
+    for col in CATEGORICAL_FEATURES:
+        df[col] = [value.lower() if isinstance(value, str) else value for value in df[col].astype(object)]
+    return df
+
+
+class MicroBatcher:
+    """
+    Junta las solicitudes que llegan dentro de max_wait_ms (hasta max_batch filas) y las predice en una
+    sola llamada. submit() devuelve un Future con el DataFrame de predicciones de esa solicitud.
+    """
+
+    def __init__(self, model, max_batch=64, max_wait_ms=5.0):
+        self.model = model
+        self.max_batch = max_batch
+        self.max_wait = max_wait_ms / 1000
+        self._queue = queue.Queue()
+        self._lock = threading.Lock()
+        self._latencies_ms = deque(maxlen=1000)
+        self._stats = {'requests': 0, 'rows': 0, 'batches': 0, 'errors': 0, 'predict_seconds': 0.0}
+        self._thread = threading.Thread(target=self._run, name='micro-batcher', daemon=True)
+        self._thread.start()
+
+    def submit(self, df_for_prediction):
+        future = Future()
+        self._queue.put((df_for_prediction, future, time.perf_counter()))
+        return future
+
+    def _collect(self):
+        batch = [self._queue.get()]
+        rows = len(batch[0][0])
+        deadline = time.perf_counter() + self.max_wait
+        while rows < self.max_batch:
+            remaining = deadline - time.perf_counter()
+            if remaining <= 0:
+                break
+            try:
+                item = self._queue.get(timeout=remaining)
+            except queue.Empty:
+                break
+            batch.append(item)
+            rows += len(item[0])
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._collect()
+            start = time.perf_counter()
+            try:
+                df_predictions, _ = predict_tremor_batch(
+                    pd.concat([df for df, _, _ in batch], ignore_index=True), self.model)
+                results = []
+                offset = 0
+                for df, _, _ in batch:
+                    results.append(df_predictions.iloc[offset:offset + len(df)].reset_index(drop=True))
+                    offset += len(df)
+            except Exception:
+                # Si falla el lote, se predice cada solicitud por separado para aislar la que tiene el error
+                results = []
+                for df, _, _ in batch:
+                    try:
+                        results.append(predict_tremor_batch(df, self.model)[0].reset_index(drop=True))
+                    except Exception as e:
+                        results.append(e)
+            elapsed = time.perf_counter() - start
+
+            now = time.perf_counter()
+            with self._lock:
+                self._stats['batches'] += 1
+                self._stats['predict_seconds'] += elapsed
+                for (df, _, submitted), result in zip(batch, results):
+                    self._stats['requests'] += 1
+                    self._stats['rows'] += len(df)
+                    self._stats['errors'] += isinstance(result, Exception)
+                    self._latencies_ms.append((now - submitted) * 1000)
+            for (_, future, _), result in zip(batch, results):
+                if isinstance(result, Exception):
+                    future.set_exception(result)
+                else:
+                    future.set_result(result)
+
+    def metrics(self):
+        with self._lock:
+            stats = dict(self._stats)
+            latencies = np.array(self._latencies_ms)
+        batches = stats['batches']
+        stats.update({
+            'queue_depth': self._queue.qsize(),
+            'mean_batch_rows': stats['rows'] / batches if batches else 0.0,
+            'mean_predict_ms': stats.pop('predict_seconds') * 1000 / batches if batches else 0.0,
+            'latency_ms_p50': float(np.percentile(latencies, 50)) if latencies.size else 0.0,
+            'latency_ms_p95': float(np.percentile(latencies, 95)) if latencies.size else 0.0,
+            'latency_ms_max': float(latencies.max()) if latencies.size else 0.0,
+        })
+        return stats
+
+
+class InferenceRequestHandler(BaseHTTPRequestHandler):
+    # El servidor (InferenceServer) tiene los atributos batcher y model_filename
+    server_version = 'TremorInference/1'
+
+    def _send_json(self, status, payload):
+        body = json.dumps(payload, ensure_ascii=False).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        if self.path == '/metrics':
+            self._send_json(200, self.server.batcher.metrics())
+        elif self.path == '/health':
+            self._send_json(200, {'status': 'ok', 'model': self.server.model_filename})
+        else:
+            self._send_json(404, {'error': f"Ruta desconocida: {self.path}"})
+
+    def do_POST(self):
+        if self.path != '/predict':
+            self._send_json(404, {'error': f"Ruta desconocida: {self.path}"})
+            return
+        length = int(self.headers.get('Content-Length') or 0)
+        if length > MAX_BODY_BYTES:
+            self._send_json(413, {'error': "La solicitud es demasiado grande."})
+            return
+        try:
+            payload = json.loads(self.rfile.read(length) or b'{}')
+            df_for_prediction = features_from_payload(payload.get('patients'))
+        except (ValueError, TypeError, AttributeError) as e:
+            self._send_json(400, {'error': str(e)})
+            return
+
+        try:
+            df_predictions = self.server.batcher.submit(df_for_prediction).result()
+        except Exception as e:
+            self._send_json(500, {'error': f"{type(e).__name__}: {e}"})
+            return
+
+        probability_columns = [col for col in df_predictions.columns if col.startswith('prob_')]
+        predictions = [{
+            'prediction': str(row['prediction']),
+            'probabilities': {col[len('prob_'):]: float(row[col]) for col in probability_columns},
+        } for _, row in df_predictions.iterrows()]
+        self._send_json(200, {'predictions': predictions, 'batch_size': len(predictions)})
+
+    def log_message(self, format, *args):
+        pass # Sin una línea por solicitud; las estadísticas están en /metrics
+
+
+class InferenceServer(ThreadingHTTPServer):
+    daemon_threads = True
+    # Varias estaciones y procesos por lotes se conectan a la vez; la cola por defecto (5) se llena
+    request_queue_size = 128
+
+    def __init__(self, address, model_filename, max_batch=64, max_wait_ms=5.0):
+        super().__init__(address, InferenceRequestHandler)
+        self.model_filename = model_filename
+        self.batcher = MicroBatcher(get_cached_tremor_model(model_filename), max_batch, max_wait_ms)
+
+
+def _to_json_value(value):
+    if isinstance(value, np.generic):
+        value = value.item()
+    return None if isinstance(value, float) and np.isnan(value) else value
+
+def predict_remote(df_for_prediction, url=SERVIDOR_INFERENCIA_URL, timeout=5.0):
+    """
+    Cliente del servidor: igual que ml_model.predict_tremor_batch pero enviando las filas de
+    df_for_prediction a /predict. Lanza OSError (por ejemplo URLError) si el servidor no responde.
+    """
+    patients = [{'features': {col: _to_json_value(value) for col, value in row.items()}}
+                for row in df_for_prediction.to_dict(orient='records')]
+    request = urllib.request.Request(url.rstrip('/') + '/predict', data=json.dumps({'patients': patients}).encode('utf-8'),
+                                     headers={'Content-Type': 'application/json'}, method='POST')
+    start = time.perf_counter()
+    with urllib.request.urlopen(request, timeout=timeout) as response:
+        predictions = json.loads(response.read())['predictions']
+    elapsed = time.perf_counter() - start
+
+    df_predictions = pd.DataFrame({'prediction': [p['prediction'] for p in predictions]}, index=df_for_prediction.index)
+    for class_label in (predictions[0]['probabilities'] if predictions else {}):
+        df_predictions[f'prob_{class_label}'] = [p['probabilities'][class_label] for p in predictions]
+    rows = len(df_for_prediction)
+    metrics = {
+        'rows': rows,
+        'seconds': elapsed,
+        'latency_ms_per_row': elapsed * 1000 / rows if rows else 0.0,
+        'rows_per_second': rows / elapsed if elapsed > 0 else float('inf'),
+    }
+    return df_predictions, metrics
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Servidor local de predicción de temblor con micro-lotes.")
+    parser.add_argument("--host", default="127.0.0.1", help="Dirección en la que escucha (por defecto solo esta máquina)")
+    parser.add_argument("--port", type=int, default=8765, help="Puerto")
+    parser.add_argument("--modelo", default=preferred_model_filename(), help="Archivo del modelo de predicción")
+    parser.add_argument("--max-lote", type=int, default=64, help="Máximo de filas por micro-lote")
+    parser.add_argument("--espera-ms", type=float, default=5.0, help="Espera máxima para completar un micro-lote (ms)")
+    args = parser.parse_args()
+
+    server = InferenceServer((args.host, args.port), args.modelo, args.max_lote, args.espera_ms)
+    print(f"Servidor de inferencia en http://{args.host}:{args.port} (modelo: {args.modelo})")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+if __name__ == "__main__":
+    main()
@@ -2,24 +2,41 @@
 import streamlit as st
 import pandas as pd
 import numpy as np
-import matplotlib.pyplot as plt
 import os
 from datetime import datetime, timedelta
 import io
+import uuid
+import warnings
 from io import BytesIO
 
 # Import functions and configurations from other files
-from config import VENTANA_DURACION_SEG
-from data_processing import extraer_datos_paciente, diagnosticar
-from signal_analysis import analizar_temblor_por_ventanas_resultante
-from pdf_generation import generar_pdf 
-from ml_model import load_tremor_model, prepare_data_for_prediction
+from config import VENTANA_DURACION_SEG, VENTANA_SALTO_SEG, SERVIDOR_INFERENCIA_URL
+from data_processing import extraer_datos_paciente_archivo, diagnosticar, conclusion_comparacion
+from data_ingestion import tiene_datos
+from parallel_analysis import analizar_en_paralelo
+from report_jobs import enviar_informe
+from report_graphics import grafico_amplitud, imagen_png
+from ml_model import (get_cached_tremor_model, predict_tremor_batch, prepare_data_for_prediction, preferred_model_filename,
+                      StaleModelExportWarning)
+from inference_server import predict_remote
+from session_store import almacen_sesion, clave_resultado
+from window_results import ResultadosVentanas
+from pipeline_profiling import (etapa, activar_perfilado, perfilado_activo, midiendo_memoria, asignar_sesion,
+                                registros, limpiar_registros, resumen, exportar_jsonl)
 
 
 # Inicializar una variable en el estado de sesión para controlar el reinicio
 if "reiniciar" not in st.session_state:
     st.session_state.reiniciar = False
 
+# Identifica los registros de la instrumentación (pipeline_profiling) de esta sesión
+if "sesion_perfilado" not in st.session_state:
+    st.session_state.sesion_perfilado = uuid.uuid4().hex[:8]
+asignar_sesion(st.session_state.sesion_perfilado)
+
+# Resultados de esta sesión, que se vuelven a mostrar en cada re-ejecución del script sin recalcularse
+almacen = almacen_sesion(st.session_state)
+
 st.markdown("""
     <style>
     /* Oculta el texto 'Limit 200MB per file • CSV' */
@@ -57,10 +74,67 @@ st.markdown("""
     </style>
 """, unsafe_allow_html=True)
 
+def analizar_tests_con_progreso(archivos, fs=100):
+    """
+    Analiza en paralelo los archivos {clave: archivo} mostrando en pantalla el avance de cada test.
+    Devuelve {clave: (promedio, ventanas)} como ResultadosVentanas.
+    """
+    barra = st.progress(0.0, text="Analizando archivos...")
+
+    def _al_completar(clave, completados, total):
+        nombre = f"Medición {clave[0]} - {clave[1]}" if isinstance(clave, tuple) else clave
+        barra.progress(completados / total, text=f"{nombre} listo ({completados}/{total})")
+
+    resultados = analizar_en_paralelo(archivos, fs=fs, salto_seg=VENTANA_SALTO_SEG, al_completar=_al_completar, compacto=True)
+    barra.empty()
+    return resultados
+
+def ofrecer_informe(futuro, nombre_archivo, etiqueta, clave):
+    """
+    Muestra el botón de descarga del informe que se genera en segundo plano (ver report_jobs).
+    Se llama al final de la página, así los resultados ya están visibles mientras se espera.
+    Si el informe falló, el resultado guardado con clave se descarta del almacén de la sesión, para
+    que volver a presionar el botón repita el análisis y el informe en lugar de mostrar el mismo error.
+    """
+    try:
+        if not futuro.done():
+            with st.spinner("Generando el informe PDF..."):
+                futuro.result()
+        contenido = futuro.result()
+    except Exception as e:
+        almacen.descartar(clave)
+        st.error(f"No se pudo generar el informe PDF: {e}. Vuelve a iniciar el análisis para reintentarlo.")
+        return
+    # on_click="ignore": descargar no vuelve a ejecutar el script, así los resultados siguen en pantalla
+    st.download_button(label=etiqueta, data=contenido, file_name=nombre_archivo, mime="application/pdf", on_click="ignore")
+    st.info("El archivo se descargará en tu carpeta de descargas predeterminada o el navegador te pedirá la ubicación, dependiendo de tu configuración.")
+
+def mostrar_avisos(avisos):
+    """Muestra los avisos [(tipo, texto)] guardados con un resultado, con st.info, st.warning o st.error."""
+    for tipo, texto in avisos:
+        getattr(st, tipo)(texto)
+
+def mostrar_diagnostico_rendimiento():
+    """Panel con los tiempos por etapa registrados por pipeline_profiling en esta sesión."""
+    sesion = st.session_state.sesion_perfilado
+    registros_sesion = registros(sesion=sesion)
+    st.subheader("⏱️ Diagnóstico de rendimiento")
+    st.caption(f"Resultados guardados en la sesión: {len(almacen)} ({almacen.bytes_usados() / 2**20:.1f} MB "
+               f"de {almacen.max_bytes / 2**20:.0f} MB)")
+    if not registros_sesion:
+        st.caption("Todavía no hay etapas registradas en esta sesión.")
+        return
+    st.dataframe(resumen(registros_sesion))
+    with st.expander("Registros individuales"):
+        st.dataframe(pd.DataFrame(registros_sesion))
+    st.download_button("Descargar registros (JSON Lines)", data=exportar_jsonl(registros_sesion),
+                       file_name=f"perfilado_{sesion}.jsonl", mime="application/x-ndjson", on_click="ignore")
+    st.button("Vaciar registros", on_click=limpiar_registros, args=(sesion,))
+
 def manejar_reinicio():
     if st.session_state.get("reiniciar", False):
         st.session_state.clear()
-        st.experimental_rerun()
+        st.rerun()
 
 
 # ------------------ Modo principal --------------------
@@ -70,6 +144,13 @@ opcion = st.sidebar.radio("Selecciona una opción:", ["1️⃣ Análisis de una
 if st.sidebar.button("🔄 Nuevo análisis"):
     st.session_state.reiniciar = True
     manejar_reinicio()
+with st.sidebar.expander("⏱️ Diagnóstico de rendimiento"):
+    registrar_tiempos = st.checkbox("Registrar tiempos por etapa", value=perfilado_activo(),
+                                    help="Afecta a todas las sesiones de este servidor.")
+    registrar_memoria = st.checkbox("Incluir pico de memoria (más lento)", value=midiendo_memoria(),
+                                    disabled=not registrar_tiempos)
+    if (registrar_tiempos, registrar_tiempos and registrar_memoria) != (perfilado_activo(), midiendo_memoria()):
+        activar_perfilado(registrar_tiempos, registrar_memoria)
 
 if opcion == "1️⃣ Análisis de una medición":
     st.title("📈 Análisis de una medición")
@@ -109,101 +190,108 @@ if opcion == "1️⃣ Análisis de una medición":
         "Acción": accion_file,
     }
 
-    resultados_globales = []
-    datos_paciente_para_pdf = {}
-    ventanas_para_grafico = []
-    min_ventanas_count = float('inf')
-    
+    def calcular_analisis_individual(mediciones_tests):
+        """Analiza los tests cargados y arma todo lo que se muestra, para guardarlo en el almacén de la sesión."""
+        avisos = []
+        promedios_tests = []
+        datos_paciente_para_pdf = {}
+        ventanas_tests = []
+
+        # Solo se lee el encabezado y la primera fila: alcanza para saber si hay datos y para los datos del paciente
+        con_datos = {test: tiene_datos(file) for test, file in mediciones_tests.items()}
+
+        primer_archivo_cargado = None
+        for test, hay_datos in con_datos.items():
+            if hay_datos:
+                primer_archivo_cargado = mediciones_tests[test]
+                break
+
+        if primer_archivo_cargado is not None:
+            datos_paciente_para_pdf = extraer_datos_paciente_archivo(primer_archivo_cargado)
+
+        # Los tres tests son independientes: se analizan a la vez
+        resultados_tests = analizar_tests_con_progreso(
+            {test: file for test, file in mediciones_tests.items() if con_datos[test]}, fs=100)
+
+        for test, file in mediciones_tests.items():
+            if con_datos[test]:
+                promedio, ventanas = resultados_tests[test]
+
+                # Etiquetar con el test no copia los resultados
+                if not promedio.empty:
+                    promedios_tests.append(promedio.con_etiquetas(Test=test))
+
+                if not ventanas.empty:
+                    ventanas_tests.append(ventanas.con_etiquetas(Test=test))
+            else:
+                avisos.append(("info", f"No se cargó ningún archivo para el test de '{test}'. Se omitirá este análisis."))
+
+        graficos_single_analysis = [] # Gráficos para el PDF (los mismos que se muestran en pantalla)
+        imagen = None
+        if ventanas_tests:
+            # Todos los tests se grafican con la cantidad de ventanas del más corto
+            ventanas_grafico = ResultadosVentanas.concatenar(ventanas_tests).primeras(min(len(v) for v in ventanas_tests))
+            series = [(test, ventanas["Ventana"] * VENTANA_SALTO_SEG, ventanas["Amplitud Temblor (cm)"])
+                      for test, ventanas in ventanas_grafico.agrupar("Test").items()]
+
+            grafico = grafico_amplitud(series, "Amplitud de Temblor por Ventana de Tiempo")
+            with etapa("grafico_pantalla"):
+                imagen = imagen_png(grafico, figsize=(10, 6))
+            graficos_single_analysis.append(grafico)
+
+        df_resultados_final = None
+        diagnostico_auto = None
+        futuro_informe = None
+        if promedios_tests:
+            df_resultados_final = ResultadosVentanas.concatenar(promedios_tests)
+            diagnostico_auto = diagnosticar(df_resultados_final)
+            futuro_informe = enviar_informe(
+                datos_paciente_para_pdf,
+                df_resultados_final,
+                graficos=graficos_single_analysis,
+                diagnostico=diagnostico_auto,
+                comparison_mode=False,
+                config1_params=None,
+                config2_params=None
+            )
+
+        return {
+            "avisos": avisos,
+            "imagen": imagen,
+            "df_resultados": df_resultados_final,
+            "diagnostico": diagnostico_auto,
+            "informe": futuro_informe,
+        }
+
+    def mostrar_analisis_individual(resultado):
+        mostrar_avisos(resultado["avisos"])
+
+        if resultado["imagen"] is not None:
+            st.image(resultado["imagen"], width="stretch")
+        else:
+            st.warning("No se generaron datos de ventanas para el gráfico.")
+
+        if resultado["df_resultados"] is not None:
+            st.subheader("Resultados del Análisis de Temblor")
+            st.dataframe(resultado["df_resultados"].a_dataframe().set_index('Test'))
+            ofrecer_informe(resultado["informe"], "informe_temblor.pdf", "📄 Descargar informe PDF", clave)
+        else:
+            st.warning("No se encontraron datos suficientes para el análisis.")
+
+    clave = clave_resultado("individual", uploaded_files, fs=100, ventana_seg=VENTANA_DURACION_SEG, salto_seg=VENTANA_SALTO_SEG)
+
     if st.button("Iniciar análisis"):
-        mediciones_tests = {}
-        for test, file in uploaded_files.items():
-            if file is not None:
-                file.seek(0)
-                mediciones_tests[test] = pd.read_csv(file, encoding='latin1')
+        mediciones_tests = {test: file for test, file in uploaded_files.items() if file is not None}
 
         if not mediciones_tests:
             st.warning("Por favor, sube al menos un archivo para iniciar el análisis.")
-        else:
-            primer_df_cargado = None
-            for test, datos in mediciones_tests.items():
-                if datos is not None and not datos.empty:
-                    primer_df_cargado = datos
-                    break
-
-            if primer_df_cargado is not None:
-                datos_paciente_para_pdf = extraer_datos_paciente(primer_df_cargado)
-            
-            for test, datos in mediciones_tests.items():
-                if datos is not None and not datos.empty:
-                    df_promedio, df_ventanas = analizar_temblor_por_ventanas_resultante(datos, fs=100)
-
-                    if not df_promedio.empty:
-                        fila = df_promedio.iloc[0].to_dict()
-                        fila['Test'] = test
-                        resultados_globales.append(fila)
-
-                    if not df_ventanas.empty:
-                        df_ventanas_copy = df_ventanas.copy()
-                        df_ventanas_copy["Test"] = test
-                        ventanas_para_grafico.append(df_ventanas_copy)
-                        if len(df_ventanas_copy) < min_ventanas_count:
-                            min_ventanas_count = len(df_ventanas_copy)
-                else:
-                    st.info(f"No se cargó ningún archivo para el test de '{test}'. Se omitirá este análisis.")
-
-            img_buffers_single_analysis = [] # Lista para almacenar los buffers de imagen
-            if ventanas_para_grafico:
-                fig, ax = plt.subplots(figsize=(10, 6))
-                for df in ventanas_para_grafico:
-                    test_name = df["Test"].iloc[0]
-                    if min_ventanas_count != float('inf') and len(df) > min_ventanas_count:
-                        df_to_plot = df.iloc[:min_ventanas_count].copy()
-                    else:
-                        df_to_plot = df.copy()
-                    
-                    df_to_plot["Tiempo (segundos)"] = df_to_plot["Ventana"] * VENTANA_DURACION_SEG
-                    ax.plot(df_to_plot["Tiempo (segundos)"], df_to_plot["Amplitud Temblor (cm)"], label=f"{test_name}")
-
-                ax.set_title("Amplitud de Temblor por Ventana de Tiempo")
-                ax.set_xlabel("Tiempo (segundos)")
-                ax.set_ylabel("Amplitud (cm)")
-                ax.legend()
-                ax.grid(True)
-                st.pyplot(fig) # Muestra en Streamlit
-                
-                # Guarda la figura en un buffer de bytes para el PDF
-                buf = BytesIO()
-                fig.savefig(buf, format='png', bbox_inches='tight', dpi=300)
-                buf.seek(0)
-                img_buffers_single_analysis.append(buf)
-                plt.close(fig) # Cierra la figura después de guardarla en el buffer
-            else:
-                st.warning("No se generaron datos de ventanas para el gráfico.")
-
-
-            if resultados_globales:
-                df_resultados_final = pd.DataFrame(resultados_globales)
-                diagnostico_auto = diagnosticar(df_resultados_final)
-
-                st.subheader("Resultados del Análisis de Temblor")
-                st.dataframe(df_resultados_final.set_index('Test'))
-
-                generar_pdf(
-                    datos_paciente_para_pdf,
-                    df_resultados_final,
-                    nombre_archivo="informe_temblor.pdf",
-                    diagnostico=diagnostico_auto,
-                    img_buffers=img_buffers_single_analysis, # Pasa la lista de buffers
-                    comparison_mode=False,
-                    config1_params=None,
-                    config2_params=None
-                )
-
-                with open("informe_temblor.pdf", "rb") as f:
-                    st.download_button("📄 Descargar informe PDF", f, file_name="informe_temblor.pdf")
-                    st.info("El archivo se descargará en tu carpeta de descargas predeterminada o el navegador te pedirá la ubicación, dependiendo de tu configuración.")
-            else:
-                st.warning("No se encontraron datos suficientes para el análisis.")
+        elif clave not in almacen:
+            almacen.guardar(clave, calcular_analisis_individual(mediciones_tests))
+
+    # También en las re-ejecuciones del script: se vuelve a mostrar sin recalcular
+    resultado_individual = almacen.obtener(clave)
+    if resultado_individual is not None:
+        mostrar_analisis_individual(resultado_individual)
 
 elif opcion == "2️⃣ Comparar dos mediciones":
     st.title("📊 Comparar dos mediciones")
@@ -238,167 +326,141 @@ elif opcion == "2️⃣ Comparar dos mediciones":
         </style>
     """, unsafe_allow_html=True)
 
-    def analizar_configuracion_comparacion(archivos, fs=100):
+    def analizar_configuracion_comparacion(archivos, resultados_analisis, avisos):
         resultados = []
         ventanas_datos = {}
         for test, archivo in archivos.items():
             if archivo is not None:
-                archivo.seek(0)
-                df = pd.read_csv(archivo, encoding='latin1')
-                df_promedio, df_ventana = analizar_temblor_por_ventanas_resultante(df, fs=fs)
-                if isinstance(df_ventana, pd.DataFrame) and not df_ventana.empty:
-                    prom = df_promedio.iloc[0] if not df_promedio.empty else None
-                    if prom is not None:
-                        freq = prom['Frecuencia Dominante (Hz)']
-                        amp = prom['Amplitud Temblor (cm)']
-                        rms = prom['RMS (m/s2)']
-                        resultados.append({
-                            'Test': test,
-                            'Frecuencia Dominante (Hz)': round(freq, 2),
-                            'RMS (m/s2)': round(rms, 4),
-                            'Amplitud Temblor (cm)': round(amp, 2)
-                        })
-                    ventanas_datos[test] = df_ventana
+                promedio, ventanas = resultados_analisis[test]
+                if not ventanas.empty:
+                    if not promedio.empty:
+                        resultados.append(ResultadosVentanas({
+                            'Frecuencia Dominante (Hz)': np.round(promedio['Frecuencia Dominante (Hz)'], 2),
+                            'RMS (m/s2)': np.round(promedio['RMS (m/s2)'], 4),
+                            'Amplitud Temblor (cm)': np.round(promedio['Amplitud Temblor (cm)'], 2)
+                        }, Test=test))
+                    ventanas_datos[test] = ventanas
+            else:
+                avisos.append(("info", f"Archivo de {test} no cargado para esta configuración. Se omitirá del análisis."))
+
+        return ResultadosVentanas.concatenar(resultados), ventanas_datos
+
+    def calcular_comparacion(config1_archivos, config2_archivos):
+        """Analiza las dos mediciones y arma todo lo que se muestra, para guardarlo en el almacén de la sesión."""
+        avisos = []
+        datos_personales_comunes = {}
+        parametros_config1 = {}
+        parametros_config2 = {}
+
+        for f in config1_archivos.values():
+            if f is not None:
+                parametros_config1 = extraer_datos_paciente_archivo(f)
+                break
+
+        for f in config2_archivos.values():
+            if f is not None:
+                parametros_config2 = extraer_datos_paciente_archivo(f)
+                break
+
+        # Combinar datos personales para la sección general del PDF, priorizando config1 si aplica
+        datos_personales_comunes.update(parametros_config1)
+        datos_personales_comunes.update({k: v for k, v in parametros_config2.items() if k not in datos_personales_comunes or not datos_personales_comunes.get(k) or str(datos_personales_comunes.get(k)).strip() == ""}) # Maneja campos vacíos
+
+        # Las seis mediciones son independientes: se analizan todas a la vez
+        archivos_comparacion = {(1, test): f for test, f in config1_archivos.items()}
+        archivos_comparacion.update({(2, test): f for test, f in config2_archivos.items()})
+        resultados_comparacion = analizar_tests_con_progreso(archivos_comparacion, fs=100)
+
+        df_resultados_config1, ventanas_config1 = analizar_configuracion_comparacion(
+            config1_archivos, {test: res for (medicion, test), res in resultados_comparacion.items() if medicion == 1}, avisos)
+        df_resultados_config2, ventanas_config2 = analizar_configuracion_comparacion(
+            config2_archivos, {test: res for (medicion, test), res in resultados_comparacion.items() if medicion == 2}, avisos)
+
+        conclusion = conclusion_comparacion(df_resultados_config1, df_resultados_config2)
+
+        nombres_test = ["Reposo", "Postural", "Acción"]
+        graficos_comparison = [] # Gráficos para el PDF (los mismos que se muestran en pantalla)
+        imagenes = [] # (test, PNG o None si no hay datos para graficarlo)
+
+        for test in nombres_test:
+            ventanas1 = ventanas_config1.get(test)
+            ventanas2 = ventanas_config2.get(test)
+
+            if ventanas1 is not None and ventanas2 is not None:
+                grafico = grafico_amplitud([
+                    ("Medición 1", ventanas1["Ventana"] * VENTANA_SALTO_SEG, ventanas1["Amplitud Temblor (cm)"], "#0000ff"),
+                    ("Medición 2", ventanas2["Ventana"] * VENTANA_SALTO_SEG, ventanas2["Amplitud Temblor (cm)"], "#ffa500"),
+                ], f"Amplitud por Ventana - {test}")
+                with etapa("grafico_pantalla"):
+                    imagenes.append((test, imagen_png(grafico, figsize=(10, 5))))
+                graficos_comparison.append(grafico)
             else:
-                st.info(f"Archivo de {test} no cargado para esta configuración. Se omitirá del análisis.")
+                imagenes.append((test, None))
+
+        tablas_pdf = [tabla.con_etiquetas(Measurement=medicion)
+                      for medicion, tabla in [(1, df_resultados_config1), (2, df_resultados_config2)] if not tabla.empty]
+        futuro_informe = None
+        if tablas_pdf:
+            futuro_informe = enviar_informe(
+                datos_paciente_dict=datos_personales_comunes,
+                df_resultados=ResultadosVentanas.concatenar(tablas_pdf),
+                graficos=graficos_comparison,
+                diagnostico=conclusion,
+                comparison_mode=True,
+                config1_params=parametros_config1,
+                config2_params=parametros_config2
+            )
+
+        return {
+            "avisos": avisos,
+            "df_resultados_1": df_resultados_config1,
+            "df_resultados_2": df_resultados_config2,
+            "imagenes": imagenes,
+            "conclusion": conclusion,
+            "informe": futuro_informe,
+        }
+
+    def mostrar_comparacion(resultado):
+        mostrar_avisos(resultado["avisos"])
+
+        st.subheader("Resultados Medición 1")
+        st.dataframe(resultado["df_resultados_1"].a_dataframe())
+
+        st.subheader("Resultados Medición 2")
+        st.dataframe(resultado["df_resultados_2"].a_dataframe())
+
+        st.subheader("Comparación Gráfica de Amplitud por Ventana")
+        for test, imagen in resultado["imagenes"]:
+            if imagen is not None:
+                st.image(imagen, width="stretch")
+            else:
+                st.info(f"No hay suficientes datos de ventanas para graficar el test: {test}")
+
+        st.subheader("Conclusión del Análisis Comparativo")
+        st.write(resultado["conclusion"])
+
+        if resultado["informe"] is not None:
+            ofrecer_informe(resultado["informe"], "informe_comparativo_temblor.pdf", "Descargar Informe PDF", clave)
+        else:
+            st.warning("No hay datos suficientes para generar un informe comparativo PDF.")
 
-        return pd.DataFrame(resultados), ventanas_datos
+    archivos_medicion = {(1, test): f for test, f in config1_archivos.items()}
+    archivos_medicion.update({(2, test): f for test, f in config2_archivos.items()})
+    clave = clave_resultado("comparacion", archivos_medicion, fs=100, ventana_seg=VENTANA_DURACION_SEG, salto_seg=VENTANA_SALTO_SEG)
 
     if st.button("Comparar Mediciones"):
         any_files_uploaded_config1 = any(f is not None for f in config1_archivos.values())
         any_files_uploaded_config2 = any(f is not None for f in config2_archivos.values())
-        
+
         if not any_files_uploaded_config1 and not any_files_uploaded_config2:
             st.warning("Por favor, cargue al menos un archivo para cada medición para iniciar la comparación.")
-        else:
-            datos_personales_comunes = {}
-            parametros_config1 = {}
-            parametros_config2 = {}
-
-            primer_df_config1 = None
-            for f in config1_archivos.values():
-                if f is not None:
-                    f.seek(0)
-                    primer_df_config1 = pd.read_csv(f, encoding='latin1')
-                    parametros_config1 = extraer_datos_paciente(primer_df_config1)
-                    break
-            
-            primer_df_config2 = None
-            for f in config2_archivos.values():
-                if f is not None:
-                    f.seek(0)
-                    primer_df_config2 = pd.read_csv(f, encoding='latin1')
-                    parametros_config2 = extraer_datos_paciente(primer_df_config2)
-                    break
-            
-            # Combinar datos personales para la sección general del PDF, priorizando config1 si aplica
-            datos_personales_comunes.update(parametros_config1)
-            datos_personales_comunes.update({k: v for k, v in parametros_config2.items() if k not in datos_personales_comunes or not datos_personales_comunes.get(k) or str(datos_personales_comunes.get(k)).strip() == ""}) # Maneja campos vacíos
-
-            df_resultados_config1, ventanas_config1 = analizar_configuracion_comparacion(config1_archivos)
-            df_resultados_config2, ventanas_config2 = analizar_configuracion_comparacion(config2_archivos)
-
-            amp_avg_config1 = df_resultados_config1['Amplitud Temblor (cm)'].mean() if not df_resultados_config1.empty else 0
-            amp_avg_config2 = df_resultados_config2['Amplitud Temblor (cm)'].mean() if not df_resultados_config2.empty else 0
-
-            rms_avg_config1 = df_resultados_config1['RMS (m/s2)'].mean() if not df_resultados_config1.empty else 0
-            rms_avg_config2 = df_resultados_config2['RMS (m/s2)'].mean() if not df_resultados_config2.empty else 0
-
-            conclusion = ""
-            if amp_avg_config1 < amp_avg_config2:
-                conclusion = (
-                    f"La Medición 1 muestra una amplitud de temblor promedio ({amp_avg_config1:.2f} cm) "
-                    f"más baja que la Medición 2 ({amp_avg_config2:.2f} cm), lo que sugiere una mayor reducción del temblor."
-                )
-            elif amp_avg_config2 < amp_avg_config1:
-                conclusion = (
-                    f"La Medición 2 muestra una amplitud de temblor promedio ({amp_avg_config2:.2f} cm) "
-                    f"más baja que la Medición 1 ({amp_avg_config1:.2f} cm), lo que sugiere una mayor reducción del temblor."
-                )
-            else:
-                conclusion = (
-                    f"Ambas mediciones muestran amplitudes de temblor promedio muy similares ({amp_avg_config1:.2f} cm). "
-                )
-
-            st.subheader("Resultados Medición 1")
-            st.dataframe(df_resultados_config1)
-
-            st.subheader("Resultados Medición 2")
-            st.dataframe(df_resultados_config2)
-
-            st.subheader("Comparación Gráfica de Amplitud por Ventana")
-            nombres_test = ["Reposo", "Postural", "Acción"]
-            
-            img_buffers_comparison = [] # Lista para almacenar los buffers de imagen
-
-            for test in nombres_test:
-                df1_ventanas = ventanas_config1.get(test)
-                df2_ventanas = ventanas_config2.get(test)
-
-                if df1_ventanas is not None and not df1_ventanas.empty and \
-                   df2_ventanas is not None and not df2_ventanas.empty:
-                    
-                    fig, ax = plt.subplots(figsize=(10, 5))
-
-                    df1_ventanas_copy = df1_ventanas.copy()
-                    df2_ventanas_copy = df2_ventanas.copy()
-
-                    df1_ventanas_copy["Tiempo (segundos)"] = df1_ventanas_copy["Ventana"] * VENTANA_DURACION_SEG
-                    df2_ventanas_copy["Tiempo (segundos)"] = df2_ventanas_copy["Ventana"] * VENTANA_DURACION_SEG
-
-                    ax.plot(df1_ventanas_copy["Tiempo (segundos)"], df1_ventanas_copy["Amplitud Temblor (cm)"], label="Medición 1", color="blue")
-                    ax.plot(df2_ventanas_copy["Tiempo (segundos)"], df2_ventanas_copy["Amplitud Temblor (cm)"], label="Medición 2", color="orange")
-                    ax.set_title(f"Amplitud por Ventana - {test}")
-                    ax.set_xlabel("Tiempo (segundos)")
-                    ax.set_ylabel("Amplitud (cm)")
-                    ax.legend()
-                    ax.grid(True)
-                    st.pyplot(fig) # Muestra en Streamlit
-                    
-                    # Guarda la figura en un buffer de bytes para el PDF
-                    buf = BytesIO()
-                    fig.savefig(buf, format='png', bbox_inches='tight', dpi=300)
-                    buf.seek(0)
-                    img_buffers_comparison.append(buf)
-                    plt.close(fig) # Cierra la figura después de guardarla en el buffer
-                else:
-                    st.info(f"No hay suficientes datos de ventanas para graficar el test: {test}")
-            
-            st.subheader("Conclusión del Análisis Comparativo")
-            st.write(conclusion)
-
-            combined_df_for_pdf = pd.DataFrame()
-            if not df_resultados_config1.empty:
-                df_resultados_config1['Measurement'] = 1
-                combined_df_for_pdf = pd.concat([combined_df_for_pdf, df_resultados_config1])
-            if not df_resultados_config2.empty:
-                df_resultados_config2['Measurement'] = 2
-                combined_df_for_pdf = pd.concat([combined_df_for_pdf, df_resultados_config2])
-            
-            if not combined_df_for_pdf.empty:
-                generar_pdf(
-                    datos_paciente_dict=datos_personales_comunes,
-                    df_resultados=combined_df_for_pdf,
-                    nombre_archivo="informe_comparativo_temblor.pdf",
-                    diagnostico=conclusion,
-                    img_buffers=img_buffers_comparison, # Pasa la lista de buffers
-                    comparison_mode=True,
-                    config1_params=parametros_config1,
-                    config2_params=parametros_config2
-                )
-                
-                # Cierra los buffers después de generar el PDF si es necesario (ya se hizo al agregarlos)
-
-                with open("informe_comparativo_temblor.pdf", "rb") as f:
-                    st.download_button(
-                        label="Descargar Informe PDF",
-                        data=f.read(),
-                        file_name="informe_comparativo_temblor.pdf",
-                        mime="application/pdf"
-                    )
-                st.info("El archivo se descargará en tu carpeta de descargas predeterminada o el navegador te pedirá la ubicación, dependiendo de tu configuración.")
-            else:
-                st.warning("No hay datos suficientes para generar un informe comparativo PDF.")
+        elif clave not in almacen:
+            almacen.guardar(clave, calcular_comparacion(config1_archivos, config2_archivos))
+
+    # También en las re-ejecuciones del script: se vuelve a mostrar sin recalcular
+    resultado_comparacion = almacen.obtener(clave)
+    if resultado_comparacion is not None:
+        mostrar_comparacion(resultado_comparacion)
 
 
 elif opcion == "3️⃣ Predicción de Temblor":
@@ -426,160 +488,194 @@ elif opcion == "3️⃣ Predicción de Temblor":
         </style>
     """, unsafe_allow_html=True)
 
-    if st.button("Realizar Predicción"):
-        prediccion_files_correctas = {
-            "Reposo": prediccion_reposo_file,
-            "Postural": prediccion_postural_file,
-            "Acción": prediccion_accion_file
+    usar_servidor = st.checkbox("Usar el servidor de inferencia local", value=False)
+    url_servidor = st.text_input("URL del servidor de inferencia", value=SERVIDOR_INFERENCIA_URL) if usar_servidor else None
+
+    prediccion_files_correctas = {
+        "Reposo": prediccion_reposo_file,
+        "Postural": prediccion_postural_file,
+        "Acción": prediccion_accion_file
+    }
+    # Si la exportación .npz del modelo estaba desactualizada, se avisa en la página
+    with warnings.catch_warnings(record=True) as avisos_modelo:
+        warnings.simplefilter("always", StaleModelExportWarning)
+        model_filename = preferred_model_filename()
+    for aviso in avisos_modelo:
+        if issubclass(aviso.category, StaleModelExportWarning):
+            st.warning(str(aviso.message))
+        else:
+            warnings.warn(aviso.message, aviso.category)
+
+    def calcular_prediccion(prediccion_files_correctas):
+        """Analiza los archivos y predice; arma todo lo que se muestra, para guardarlo en el almacén de la sesión."""
+        resultado = {"avisos": [], "error": None}
+        avg_tremor_metrics = {}
+        datos_paciente = {}
+
+        for test_type, uploaded_file in prediccion_files_correctas.items():
+            if uploaded_file is not None:
+                datos_paciente = extraer_datos_paciente_archivo(uploaded_file) # Extrae todo
+                break
+
+        if not datos_paciente:
+            resultado["error"] = "No se pudo extraer información del paciente. Asegúrate de que los archivos contengan datos válidos."
+            return resultado
+
+        ventanas_tests = []
+
+        resultados_prediccion = analizar_tests_con_progreso(prediccion_files_correctas, fs=100)
+
+        for test_type, uploaded_file in prediccion_files_correctas.items():
+            if uploaded_file is not None:
+                promedio, ventanas = resultados_prediccion[test_type]
+
+                if not promedio.empty:
+                    avg_tremor_metrics[test_type] = {col: float(valor) for col, valor in promedio.fila(0).items()}
+                else:
+                    resultado["avisos"].append(("warning", f"No se pudieron calcular métricas de temblor para {test_type}. Se usarán NaN."))
+                    avg_tremor_metrics[test_type] = {
+                        'Frecuencia Dominante (Hz)': np.nan,
+                        'RMS (m/s2)': np.nan,
+                        'Amplitud Temblor (cm)': np.nan
+                    }
+
+                if not ventanas.empty:
+                    ventanas_tests.append(ventanas.con_etiquetas(Test=test_type))
+
+        if not avg_tremor_metrics:
+            resultado["error"] = "No se pudo procesar ningún archivo cargado para la predicción. Asegúrate de que los archivos contengan datos válidos."
+            return resultado
+
+        df_metrics_display = pd.DataFrame.from_dict(avg_tremor_metrics, orient='index')
+        df_metrics_display.index.name = "Test"
+        df_for_prediction = prepare_data_for_prediction(datos_paciente, avg_tremor_metrics)
+
+        prediction_result_str = "No se pudo realizar la predicción."
+        prediction_probabilities_dict = {}
+        mensajes_prediccion = [] # Avisos y errores del modelo, en el orden en que se muestran
+        metricas_prediccion = None
+
+        try:
+            df_predicciones = None
+            if usar_servidor:
+                try:
+                    df_predicciones, metricas_prediccion = predict_remote(df_for_prediction, url_servidor)
+                except OSError as e:
+                    mensajes_prediccion.append(("warning", f"No se pudo usar el servidor de inferencia ({e}). Se usa el modelo local."))
+            if df_predicciones is None:
+                modelo_cargado = get_cached_tremor_model(model_filename)
+                df_predicciones, metricas_prediccion = predict_tremor_batch(df_for_prediction, modelo_cargado)
+            prediction_result_str = df_predicciones['prediction'].iloc[0]
+
+            columnas_probabilidad = [col for col in df_predicciones.columns if col.startswith('prob_')]
+            for col in columnas_probabilidad:
+                class_label = col[len('prob_'):]
+                prediction_probabilities_dict[class_label] = df_predicciones[col].iloc[0] * 100
+
+        except FileNotFoundError as e:
+            metricas_prediccion = None
+            mensajes_prediccion.append(("error", f"Error: {e}"))
+            mensajes_prediccion.append(("error", "Asegúrate de que el archivo del modelo esté en la misma carpeta que este script."))
+        except Exception as e:
+            metricas_prediccion = None
+            mensajes_prediccion.append(("error", f"Ocurrió un error al usar el modelo: {e}"))
+            mensajes_prediccion.append(("error", "Verifica que el DataFrame `df_for_prediction` coincida con lo que espera el modelo."))
+
+        prediction_info_for_pdf = {
+            "prediction": prediction_result_str,
+            "probabilities": prediction_probabilities_dict
         }
 
-        any_file_uploaded = any(file is not None for file in prediccion_files_correctas.values())
+        graficos_prediction = [] # Gráficos para el PDF (los mismos que se muestran en pantalla)
+        imagen = None
+
+        if ventanas_tests:
+            ventanas_grafico = ResultadosVentanas.concatenar(ventanas_tests).primeras(min(len(v) for v in ventanas_tests))
+            series = [(test, ventanas["Ventana"] * VENTANA_SALTO_SEG, ventanas["Amplitud Temblor (cm)"])
+                      for test, ventanas in ventanas_grafico.agrupar("Test").items()]
+
+            grafico = grafico_amplitud(series, "Amplitud de Temblor por Ventana de Tiempo (Archivos de Predicción)")
+            with etapa("grafico_pantalla"):
+                imagen = imagen_png(grafico, figsize=(10, 6))
+            graficos_prediction.append(grafico)
+
+        futuro_informe = None
+        if not df_metrics_display.empty:
+            futuro_informe = enviar_informe(
+                datos_paciente_dict=datos_paciente,
+                df_resultados=df_metrics_display.reset_index(), # La tabla del PDF necesita la columna Test
+                graficos=graficos_prediction,
+                diagnostico=prediction_result_str,
+                comparison_mode=False,
+                config1_params=None,
+                config2_params=None,
+                prediction_info=prediction_info_for_pdf
+            )
+
+        resultado.update({
+            "df_metricas": df_metrics_display,
+            "df_prediccion": df_for_prediction,
+            "mensajes_prediccion": mensajes_prediccion,
+            "prediccion": prediction_result_str if metricas_prediccion is not None else None,
+            "probabilidades": prediction_probabilities_dict,
+            "metricas_prediccion": metricas_prediccion,
+            "imagen": imagen,
+            "informe": futuro_informe,
+        })
+        return resultado
+
+    def mostrar_prediccion(resultado):
+        mostrar_avisos(resultado["avisos"])
+        if resultado["error"] is not None:
+            st.error(resultado["error"])
+            return
+
+        st.subheader("Datos de Temblor Calculados para la Predicción:")
+        st.dataframe(resultado["df_metricas"])
+
+        st.subheader("DataFrame preparado para el Modelo de Predicción:")
+        st.dataframe(resultado["df_prediccion"])
+
+        mensajes = resultado["mensajes_prediccion"]
+        mostrar_avisos([m for m in mensajes if m[0] == "warning"])
+        if resultado["prediccion"] is not None:
+            st.subheader("Resultado de la Predicción:")
+            st.success(f"La predicción del modelo es: **{resultado['prediccion']}**")
+
+            if resultado["probabilidades"]:
+                st.write("Probabilidades por clase:")
+                for class_label, probabilidad in resultado["probabilidades"].items():
+                    st.write(f"- **{class_label}**: {probabilidad:.2f}%")
+
+            st.caption(f"Tiempo de predicción: {resultado['metricas_prediccion']['latency_ms_per_row']:.1f} ms")
+        mostrar_avisos([m for m in mensajes if m[0] == "error"])
+
+        if resultado["imagen"] is not None:
+            st.image(resultado["imagen"], width="stretch")
+        else:
+            st.warning("No hay suficientes datos de ventanas para graficar los archivos de predicción.")
 
-        if not any_file_uploaded:
-            st.warning("Por favor, sube al menos un archivo CSV para realizar la predicción.")
+        if resultado["informe"] is not None:
+            ofrecer_informe(resultado["informe"], "informe_prediccion_temblor.pdf", "Descargar Informe PDF de Predicción",
+                            clave)
         else:
-            avg_tremor_metrics = {}
-            datos_paciente = {} 
-
-            first_df_loaded = None
-            for test_type, uploaded_file in prediccion_files_correctas.items():
-                if uploaded_file is not None:
-                    uploaded_file.seek(0)
-                    first_df_loaded = pd.read_csv(uploaded_file, encoding='latin1')
-                    datos_paciente = extraer_datos_paciente(first_df_loaded) # Extrae todo
-                    break 
-
-            if not datos_paciente: 
-                st.error("No se pudo extraer información del paciente. Asegúrate de que los archivos contengan datos válidos.")
-                st.stop() 
-
-            all_ventanas_for_plot = []
-            current_min_ventanas = float('inf')
-
-            for test_type, uploaded_file in prediccion_files_correctas.items():
-                if uploaded_file is not None:
-                    uploaded_file.seek(0)
-                    df_current_test = pd.read_csv(uploaded_file, encoding='latin1')
-
-                    df_promedio, df_ventanas_temp = analizar_temblor_por_ventanas_resultante(df_current_test, fs=100)
-
-                    if not df_promedio.empty:
-                        avg_tremor_metrics[test_type] = df_promedio.iloc[0].to_dict()
-                    else:
-                        st.warning(f"No se pudieron calcular métricas de temblor para {test_type}. Se usarán NaN.")
-                        avg_tremor_metrics[test_type] = {
-                            'Frecuencia Dominante (Hz)': np.nan,
-                            'RMS (m/s2)': np.nan,
-                            'Amplitud Temblor (cm)': np.nan
-                        }
-                    
-                    if not df_ventanas_temp.empty:
-                        df_ventanas_temp_copy = df_ventanas_temp.copy()
-                        df_ventanas_temp_copy["Test"] = test_type
-                        all_ventanas_for_plot.append(df_ventanas_temp_copy)
-                        if len(df_ventanas_temp_copy) < current_min_ventanas:
-                            current_min_ventanas = len(df_ventanas_temp_copy)
-
-
-            if not avg_tremor_metrics:
-                st.error("No se pudo procesar ningún archivo cargado para la predicción. Asegúrate de que los archivos contengan datos válidos.")
-            else:
-                st.subheader("Datos de Temblor Calculados para la Predicción:")
-                df_metrics_display = pd.DataFrame.from_dict(avg_tremor_metrics, orient='index')
-                df_metrics_display.index.name = "Test"
-                st.dataframe(df_metrics_display)
+            st.warning("No hay datos suficientes para generar un informe de predicción PDF.")
 
-                df_for_prediction = prepare_data_for_prediction(datos_paciente, avg_tremor_metrics)
+    clave = clave_resultado("prediccion", prediccion_files_correctas, fs=100, ventana_seg=VENTANA_DURACION_SEG,
+                            salto_seg=VENTANA_SALTO_SEG, modelo=model_filename, servidor=url_servidor)
 
-                st.subheader("DataFrame preparado para el Modelo de Predicción:")
-                st.dataframe(df_for_prediction)
+    if st.button("Realizar Predicción"):
+        any_file_uploaded = any(file is not None for file in prediccion_files_correctas.values())
+
+        if not any_file_uploaded:
+            st.warning("Por favor, sube al menos un archivo CSV para realizar la predicción.")
+        elif clave not in almacen:
+            almacen.guardar(clave, calcular_prediccion(prediccion_files_correctas))
 
-                model_filename = 'tremor_prediction_model_V2.joblib'
-                
-                prediction_result_str = "No se pudo realizar la predicción."
-                prediction_probabilities_dict = {}
+    # También en las re-ejecuciones del script: se vuelve a mostrar sin recalcular
+    resultado_prediccion = almacen.obtener(clave)
+    if resultado_prediccion is not None:
+        mostrar_prediccion(resultado_prediccion)
 
-                try:
-                    modelo_cargado = load_tremor_model(model_filename)
-                    prediction = modelo_cargado.predict(df_for_prediction)
-                    prediction_result_str = prediction[0]
-
-                    st.subheader("Resultado de la Predicción:")
-                    st.success(f"La predicción del modelo es: **{prediction_result_str}**")
-
-                    if hasattr(modelo_cargado, 'predict_proba'):
-                        probabilities = modelo_cargado.predict_proba(df_for_prediction)
-                        st.write("Probabilidades por clase:")
-                        if hasattr(modelo_cargado, 'classes_'):
-                            for i, class_label in enumerate(modelo_cargado.classes_):
-                                st.write(f"- **{class_label}**: {probabilities[0][i]*100:.2f}%")
-                                prediction_probabilities_dict[class_label] = probabilities[0][i]*100
-                        else:
-                            st.info("El modelo no tiene el atributo 'classes_'. No se pueden mostrar las etiquetas de clase.")
-
-                except FileNotFoundError as e:
-                    st.error(f"Error: {e}")
-                    st.error("Asegúrate de que el archivo del modelo esté en la misma carpeta que este script.")
-                except Exception as e:
-                    st.error(f"Ocurrió un error al usar el modelo: {e}")
-                    st.error("Verifica que el DataFrame `df_for_prediction` coincida con lo que espera el modelo.")
-                
-                prediction_info_for_pdf = {
-                    "prediction": prediction_result_str,
-                    "probabilities": prediction_probabilities_dict
-                }
-
-
-                img_buffers_prediction = [] 
-
-                if all_ventanas_for_plot:
-                    fig, ax = plt.subplots(figsize=(10, 6))
-                    for df_plot in all_ventanas_for_plot:
-                        test_name = df_plot["Test"].iloc[0]
-                        if current_min_ventanas != float('inf') and len(df_plot) > current_min_ventanas:
-                            df_to_plot = df_plot.iloc[:current_min_ventanas].copy()
-                        else:
-                            df_to_plot = df_plot.copy()
-
-                        df_to_plot["Tiempo (segundos)"] = df_to_plot["Ventana"] * VENTANA_DURACION_SEG
-                        ax.plot(df_to_plot["Tiempo (segundos)"], df_to_plot["Amplitud Temblor (cm)"], label=f"{test_name}")
-
-                    ax.set_title("Amplitud de Temblor por Ventana de Tiempo (Archivos de Predicción)")
-                    ax.set_xlabel("Tiempo (segundos)")
-                    ax.set_ylabel("Amplitud (cm)")
-                    ax.legend()
-                    ax.grid(True)
-                    st.pyplot(fig) # Muestra en Streamlit
-                    
-                    # Guarda la figura en un buffer de bytes
-                    buf = BytesIO()
-                    fig.savefig(buf, format='png', bbox_inches='tight', dpi=300)
-                    buf.seek(0)
-                    img_buffers_prediction.append(buf)
-                    plt.close(fig) # Cierra la figura
-                else:
-                    st.warning("No hay suficientes datos de ventanas para graficar los archivos de predicción.")
-
-                if not df_metrics_display.empty: 
-                    generar_pdf(
-                        datos_paciente_dict=datos_paciente,
-                        df_resultados=df_metrics_display,
-                        nombre_archivo="informe_prediccion_temblor.pdf",
-                        diagnostico=prediction_result_str,
-                        img_buffers=img_buffers_prediction, # Pasa la lista de buffers
-                        comparison_mode=False, 
-                        config1_params=None, 
-                        config2_params=None, 
-                        prediction_info=prediction_info_for_pdf 
-                    )
-
-                    with open("informe_prediccion_temblor.pdf", "rb") as f:
-                        st.download_button(
-                            label="Descargar Informe PDF de Predicción",
-                            data=f.read(),
-                            file_name="informe_prediccion_temblor.pdf",
-                            mime="application/pdf"
-                        )
-                    st.info("El archivo se descargará en tu carpeta de descargas predeterminada o el navegador te pedirá la ubicación, dependiendo de tu configuración.")
-                else:
-                    st.warning("No hay datos suficientes para generar un informe de predicción PDF.")
+if perfilado_activo():
+    mostrar_diagnostico_rendimiento()
@@ -1,11 +1,31 @@
 # ml_model.py
-import joblib
+import os
+import tempfile
+import threading
+import time
+import warnings
 import pandas as pd
 import numpy as np
 
-def load_tremor_model(model_filename='tremor_prediction_model_V2.joblib'):
-    """Carga el modelo de predicción de temblor."""
+from pipeline_profiling import etapa
+
+DEFAULT_MODEL_FILENAME = 'tremor_prediction_model_V2.joblib'
+# Mismo modelo exportado con numpy_inference.export_tremor_model (no requiere scikit-learn)
+NUMPY_MODEL_FILENAME = 'tremor_prediction_model_V2.npz'
+# Versiones generadas por model_training.py: MODELS_DIR/tremor_model_<fecha y hora>.joblib (+ .npz y .json)
+MODELS_DIR = 'modelos'
+VERSIONED_MODEL_PREFIX = 'tremor_model_'
+
+def load_tremor_model(model_filename=DEFAULT_MODEL_FILENAME):
+    """
+    Carga el modelo de predicción de temblor. Los archivos .npz se cargan con el predictor en NumPy
+    de numpy_inference; el resto con joblib (scikit-learn).
+    """
     try:
+        if str(model_filename).endswith('.npz'):
+            from numpy_inference import NumpyTremorModel
+            return NumpyTremorModel.load(model_filename)
+        import joblib
         modelo_cargado = joblib.load(model_filename)
         return modelo_cargado
     except FileNotFoundError:
@@ -13,6 +33,147 @@ def load_tremor_model(model_filename='tremor_prediction_model_V2.joblib'):
     except Exception as e:
         raise Exception(f"Error al cargar el modelo: {e}")
 
+# Modelos ya cargados en este proceso: {ruta absoluta: (mtime_ns, tamaño, modelo)}
+_cached_models = {}
+_cached_models_lock = threading.Lock()
+
+def get_cached_tremor_model(model_filename=DEFAULT_MODEL_FILENAME):
+    """
+    Devuelve el modelo cargado una sola vez por proceso y compartido por todas las sesiones.
+    Solo se vuelve a cargar si el archivo cambió (fecha de modificación o tamaño).
+    """
+    path = os.path.abspath(model_filename)
+    try:
+        stat = os.stat(path)
+    except FileNotFoundError:
+        return load_tremor_model(model_filename) # Mismo mensaje de error que load_tremor_model
+    signature = (stat.st_mtime_ns, stat.st_size)
+    with _cached_models_lock:
+        cached = _cached_models.get(path)
+        if cached is not None and cached[:2] == signature:
+            return cached[2]
+        model = load_tremor_model(path)
+        _cached_models[path] = (*signature, model)
+        return model
+
+class StaleModelExportWarning(UserWarning):
+    """La exportación .npz de un modelo no corresponde a su .joblib (ver current_numpy_export)."""
+
+# Verificación de las exportaciones .npz: {ruta del .npz: (firmas de ambos archivos, ruta a usar, aviso)}
+_checked_exports = {}
+_checked_exports_lock = threading.Lock()
+
+def _file_signature(path):
+    try:
+        stat = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return stat.st_mtime_ns, stat.st_size
+
+def current_numpy_export(joblib_path, numpy_path):
+    """
+    Elige entre un .joblib y su exportación .npz. El .npz se usa solo si guarda el sha256 del .joblib
+    actual; si quedó desactualizado (o no tiene el sha256) se vuelve a exportar y, si no se puede,
+    se usa el .joblib. En ambos casos se emite un StaleModelExportWarning (el de usar el .joblib, cada
+    vez que se elige), para que la aplicación pueda mostrarlo. La verificación se repite solo si alguno
+    de los archivos cambia.
+    """
+    signature = (_file_signature(joblib_path), _file_signature(numpy_path))
+    if signature[1] is None:
+        return joblib_path
+    if signature[0] is None:
+        return numpy_path # Solo está la exportación
+    with _checked_exports_lock:
+        checked = _checked_exports.get(numpy_path)
+        if checked is not None and checked[0] == signature:
+            if checked[2] is not None:
+                warnings.warn(checked[2], StaleModelExportWarning, stacklevel=2)
+            return checked[1]
+        from numpy_inference import export_tremor_model, file_sha256, read_export_metadata
+        try:
+            current = read_export_metadata(numpy_path).get('source_sha256') == file_sha256(joblib_path)
+        except Exception:
+            current = False
+        chosen, message = numpy_path, None
+        if not current:
+            # Nombre temporal propio: otros procesos (el pool, la aplicación) pueden estar exportando a la vez
+            fd, temporary = tempfile.mkstemp(dir=os.path.dirname(numpy_path) or '.', suffix='.npz')
+            os.close(fd)
+            try:
+                export_tremor_model(load_tremor_model(joblib_path), temporary, source=joblib_path)
+                os.replace(temporary, numpy_path)
+                warnings.warn(f"'{numpy_path}' no correspondía a '{joblib_path}': se volvió a exportar.",
+                              StaleModelExportWarning, stacklevel=2)
+            except Exception as e:
+                if os.path.exists(temporary):
+                    os.remove(temporary)
+                chosen = joblib_path
+                message = (f"'{numpy_path}' no corresponde a '{joblib_path}' y no se pudo volver a exportar ({e}); "
+                           f"se usa el .joblib.")
+                warnings.warn(message, StaleModelExportWarning, stacklevel=2)
+            signature = (_file_signature(joblib_path), _file_signature(numpy_path))
+        _checked_exports[numpy_path] = (signature, chosen, message)
+        return chosen
+
+def latest_model_filename(models_dir=MODELS_DIR):
+    """
+    Devuelve la versión más reciente de models_dir (archivos de model_training.py), prefiriendo su
+    exportación .npz si está al día (ver current_numpy_export), o None si no hay ninguna.
+    """
+    try:
+        names = os.listdir(models_dir)
+    except FileNotFoundError:
+        return None
+    versions = sorted(name for name in names if name.startswith(VERSIONED_MODEL_PREFIX) and name.endswith('.joblib'))
+    if not versions:
+        return None
+    latest = os.path.join(models_dir, versions[-1])
+    return current_numpy_export(latest, latest[:-len('.joblib')] + '.npz')
+
+def preferred_model_filename(directory=''):
+    """
+    Devuelve el modelo a usar en directory: la última versión entrenada en MODELS_DIR si existe y,
+    si no, el modelo exportado a NumPy (si está al día) o el .joblib original.
+    """
+    latest = latest_model_filename(os.path.join(directory, MODELS_DIR))
+    if latest is not None:
+        return latest
+    return current_numpy_export(os.path.join(directory, DEFAULT_MODEL_FILENAME), os.path.join(directory, NUMPY_MODEL_FILENAME))
+
+def predict_tremor_batch(df_for_prediction, model=None):
+    """
+    Predice muchas filas (por ejemplo varios pacientes de prepare_data_for_prediction concatenados)
+    en una sola llamada. Devuelve (df_predicciones, metricas): df_predicciones tiene la columna
+    'prediction' y una columna 'prob_<clase>' por clase si el modelo tiene predict_proba; metricas
+    informa la cantidad de filas, la duración, la latencia por fila y las filas por segundo.
+    """
+    model = get_cached_tremor_model() if model is None else model
+    start = time.perf_counter()
+    with etapa("prediccion", len(df_for_prediction), modelo=type(model).__name__):
+        df_predictions = pd.DataFrame({'prediction': model.predict(df_for_prediction)}, index=df_for_prediction.index)
+        if hasattr(model, 'predict_proba') and hasattr(model, 'classes_'):
+            probabilities = model.predict_proba(df_for_prediction)
+            for i, class_label in enumerate(model.classes_):
+                df_predictions[f'prob_{class_label}'] = probabilities[:, i]
+    elapsed = time.perf_counter() - start
+
+    rows = len(df_for_prediction)
+    metrics = {
+        'rows': rows,
+        'seconds': elapsed,
+        'latency_ms_per_row': elapsed * 1000 / rows if rows else 0.0,
+        'rows_per_second': rows / elapsed if elapsed > 0 else float('inf'),
+    }
+    return df_predictions, metrics
+
+CATEGORICAL_FEATURES = ['sexo', 'mano_medida', 'dedo_medido']
+EXPECTED_FEATURES = [
+    'edad',
+    'Frec_Reposo', 'RMS_Reposo', 'Amp_Reposo',
+    'Frec_Postural', 'RMS_Postural', 'Amp_Postural',
+    'Frec_Accion', 'RMS_Accion', 'Amp_Accion',
+] + CATEGORICAL_FEATURES
+
 def prepare_data_for_prediction(datos_paciente, avg_tremor_metrics):
     """
     Prepara un DataFrame con las características necesarias para la predicción
@@ -44,15 +205,17 @@ def prepare_data_for_prediction(datos_paciente, avg_tremor_metrics):
         data_for_model[f'RMS_{model_feature_prefix}'] = metrics.get('RMS (m/s2)', np.nan)
         data_for_model[f'Amp_{model_feature_prefix}'] = metrics.get('Amplitud Temblor (cm)', np.nan)
 
-    expected_features_for_model = [
-        'edad',
-        'Frec_Reposo', 'RMS_Reposo', 'Amp_Reposo',
-        'Frec_Postural', 'RMS_Postural', 'Amp_Postural',
-        'Frec_Accion', 'RMS_Accion', 'Amp_Accion',
-        'sexo', 'mano_medida', 'dedo_medido'
-    ]
-    
     # Create DataFrame, ensuring all expected columns are present, even if NaN
-    df_for_prediction = pd.DataFrame([data_for_model]).reindex(columns=expected_features_for_model)
+    df_for_prediction = pd.DataFrame([data_for_model]).reindex(columns=EXPECTED_FEATURES)
 
     return df_for_prediction
+
+def prepare_data_for_prediction_batch(patients):
+    """
+    Versión por lotes de prepare_data_for_prediction: recibe una lista de
+    (datos_paciente, avg_tremor_metrics) y devuelve un DataFrame con una fila por paciente.
+    """
+    if not patients:
+        return prepare_data_for_prediction({}, {}).iloc[0:0]
+    return pd.concat([prepare_data_for_prediction(datos_paciente, avg_tremor_metrics)
+                      for datos_paciente, avg_tremor_metrics in patients], ignore_index=True)
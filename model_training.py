@@ -0,0 +1,176 @@
+# model_training.py
+"""
+Reentrenamiento del modelo de predicción de temblor.
+
+Uso:
+    python model_training.py dataset.parquet [--procesos N] [--folds 5] [--modelos carpeta]
+
+Lee el dataset de dataset_builder.py (columnas Etiqueta y EXPECTED_FEATURES de ml_model), compara
+los estimadores de CANDIDATES con validación cruzada estratificada (las combinaciones de parámetros y
+folds se reparten entre todos los núcleos) y reentrena el mejor con todos los datos.
+
+Cada corrida escribe una versión nueva en la carpeta de modelos:
+  - tremor_model_<fecha y hora>.joblib: el Pipeline, que load_tremor_model carga directamente.
+  - tremor_model_<fecha y hora>.npz: la exportación para numpy_inference (si el estimador lo admite).
+  - tremor_model_<fecha y hora>.json: dataset, resultados de cada candidato, tiempos y versiones.
+preferred_model_filename (ml_model) elige automáticamente la versión más reciente.
+"""
+import argparse
+import hashlib
+import json
+import os
+import time
+from datetime import datetime
+import numpy as np
+import pandas as pd
+import sklearn
+from sklearn.compose import ColumnTransformer
+from sklearn.ensemble import ExtraTreesClassifier, HistGradientBoostingClassifier, RandomForestClassifier
+from sklearn.model_selection import GridSearchCV, StratifiedKFold
+from sklearn.pipeline import Pipeline
+from sklearn.preprocessing import OneHotEncoder, StandardScaler
+import joblib
+
+from ml_model import CATEGORICAL_FEATURES, EXPECTED_FEATURES, MODELS_DIR, VERSIONED_MODEL_PREFIX
+from numpy_inference import export_tremor_model
+
+RANDOM_STATE = 42
+
+# Estimadores candidatos y sus grillas de parámetros. Todos aceptan valores faltantes (NaN), que
+# aparecen cuando falta alguno de los tests del paciente.
+CANDIDATES = {
+    'random_forest': (RandomForestClassifier(random_state=RANDOM_STATE), {
+        'classifier__n_estimators': [100, 300],
+        'classifier__max_depth': [4, 8, None],
+    }),
+    'extra_trees': (ExtraTreesClassifier(random_state=RANDOM_STATE), {
+        'classifier__n_estimators': [100, 300],
+        'classifier__max_depth': [4, 8, None],
+    }),
+    'hist_gradient_boosting': (HistGradientBoostingClassifier(random_state=RANDOM_STATE), {
+        'classifier__learning_rate': [0.05, 0.1],
+        'classifier__max_depth': [3, None],
+    }),
+}
+
+def build_pipeline(estimator):
+    """Mismo preprocesamiento que tremor_prediction_model_V2: escalado de numéricas y one-hot de categóricas."""
+    numeric_features = [col for col in EXPECTED_FEATURES if col not in CATEGORICAL_FEATURES]
+    preprocessor = ColumnTransformer(transformers=[
+        ('num', StandardScaler(), numeric_features),
+        ('cat', OneHotEncoder(handle_unknown='ignore'), CATEGORICAL_FEATURES),
+    ])
+    return Pipeline(steps=[('preprocessor', preprocessor), ('classifier', estimator)])
+
+def load_training_data(dataset_path):
+    """Devuelve (X, y, huella del archivo) descartando los pacientes sin etiqueta."""
+    if dataset_path.lower().endswith('.parquet'):
+        df = pd.read_parquet(dataset_path)
+    else:
+        df = pd.read_csv(dataset_path)
+    df = df[df['Etiqueta'].notna()]
+    with open(dataset_path, 'rb') as f:
+        fingerprint = hashlib.sha256(f.read()).hexdigest()
+    return df[EXPECTED_FEATURES], df['Etiqueta'].astype(str), fingerprint
+
+def _inference_timings(model, X):
+    start = time.perf_counter()
+    model.predict_proba(X)
+    batch_seconds = time.perf_counter() - start
+    single_row = X.iloc[:1]
+    repeats = 20
+    start = time.perf_counter()
+    for _ in range(repeats):
+        model.predict_proba(single_row)
+    return {
+        'batch_ms_per_row': batch_seconds * 1000 / len(X),
+        'single_row_ms': (time.perf_counter() - start) * 1000 / repeats,
+    }
+
+def select_model(X, y, n_jobs=-1, folds=5):
+    """
+    Evalúa cada candidato con GridSearchCV y devuelve (nombre del mejor candidato, su Pipeline
+    reentrenado con todos los datos, resumen por candidato).
+    """
+    folds = min(folds, int(y.value_counts().min()))
+    if folds < 2:
+        raise ValueError("Cada clase necesita al menos dos pacientes para la validación cruzada.")
+    cv = StratifiedKFold(n_splits=folds, shuffle=True, random_state=RANDOM_STATE)
+
+    summary = {}
+    best_name, best_search = None, None
+    for name, (estimator, param_grid) in CANDIDATES.items():
+        search = GridSearchCV(build_pipeline(estimator), param_grid, scoring='accuracy', cv=cv, n_jobs=n_jobs,
+                              refit=True, error_score='raise')
+        start = time.perf_counter()
+        search.fit(X, y)
+        elapsed = time.perf_counter() - start
+        best = search.best_index_
+        results = search.cv_results_
+        summary[name] = {
+            'cv_accuracy': float(results['mean_test_score'][best]),
+            'cv_accuracy_std': float(results['std_test_score'][best]),
+            'best_params': dict(search.best_params_),
+            'mean_fit_seconds': float(results['mean_fit_time'][best]),
+            'mean_score_seconds': float(results['mean_score_time'][best]),
+            'search_seconds': elapsed,
+            **_inference_timings(search.best_estimator_, X),
+        }
+        print(f"{name}: exactitud {summary[name]['cv_accuracy']:.3f} ± {summary[name]['cv_accuracy_std']:.3f} "
+              f"({summary[name]['best_params']}), búsqueda {elapsed:.1f} s, "
+              f"{summary[name]['single_row_ms']:.2f} ms por predicción")
+        if best_search is None or search.best_score_ > best_search.best_score_:
+            best_name, best_search = name, search
+
+    return best_name, best_search.best_estimator_, summary
+
+def save_model_version(model, metadata, models_dir=MODELS_DIR):
+    """Guarda el modelo como una versión nueva en models_dir y devuelve la ruta del .joblib."""
+    os.makedirs(models_dir, exist_ok=True)
+    version = datetime.now().strftime('%Y%m%dT%H%M%S')
+    base = os.path.join(models_dir, f'{VERSIONED_MODEL_PREFIX}{version}')
+    metadata = {'version': version, **metadata}
+
+    joblib.dump(model, base + '.joblib.tmp')
+    try:
+        # La exportación guarda el sha256 del .joblib (el temporal tiene el mismo contenido)
+        export_tremor_model(model, base + '.npz', source=base + '.joblib.tmp')
+        metadata['numpy_export'] = os.path.basename(base + '.npz')
+    except ValueError as e:
+        metadata['numpy_export'] = None
+        print(f"No se exporta a NumPy: {e}")
+    with open(base + '.json', 'w', encoding='utf-8') as f:
+        json.dump(metadata, f, ensure_ascii=False, indent=2, default=str)
+    # El .joblib se renombra al final: es el que marca la versión como disponible
+    os.replace(base + '.joblib.tmp', base + '.joblib')
+    return base + '.joblib'
+
+def train(dataset_path, n_jobs=-1, folds=5, models_dir=MODELS_DIR):
+    X, y, fingerprint = load_training_data(dataset_path)
+    print(f"{len(X)} pacientes, clases: {y.value_counts().to_dict()}")
+    best_name, model, summary = select_model(X, y, n_jobs=n_jobs, folds=folds)
+    metadata = {
+        'estimator': best_name,
+        'classes': [str(c) for c in model.classes_],
+        'features': EXPECTED_FEATURES,
+        'dataset': {'path': os.path.abspath(dataset_path), 'sha256': fingerprint, 'rows': len(X),
+                    'class_counts': {str(k): int(v) for k, v in y.value_counts().items()}},
+        'candidates': summary,
+        'sklearn_version': sklearn.__version__,
+        'numpy_version': np.__version__,
+    }
+    path = save_model_version(model, metadata, models_dir)
+    print(f"Mejor modelo: {best_name} (exactitud {summary[best_name]['cv_accuracy']:.3f}). Guardado en {path}")
+    return path
+
+def main():
+    parser = argparse.ArgumentParser(description="Reentrena el modelo de predicción de temblor.")
+    parser.add_argument("dataset", help="Dataset de dataset_builder.py (.parquet o .csv)")
+    parser.add_argument("--procesos", type=int, default=-1, help="Procesos para la validación cruzada (-1 = todos los núcleos)")
+    parser.add_argument("--folds", type=int, default=5, help="Cantidad de folds de la validación cruzada")
+    parser.add_argument("--modelos", default=MODELS_DIR, help="Carpeta donde se guardan las versiones")
+    args = parser.parse_args()
+    train(args.dataset, args.procesos, args.folds, args.modelos)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,301 @@
+# numpy_inference.py
+import hashlib
+import json
+import numpy as np
+
+# Formato de exportación (.npz, sin pickle): los árboles del bosque concatenados en arreglos planos,
+# la media y escala del StandardScaler y las categorías del OneHotEncoder, más un JSON con los
+# nombres de columnas y clases. Cargarlo no requiere scikit-learn ni joblib.
+VERSION_FORMATO = 1
+
+# Bosques cuyos árboles tienen a lo sumo estas hojas se evalúan por caminos (ver _leaf_paths), que en
+# NumPy es más rápido que recorrerlos; los árboles más grandes se recorren nivel por nivel
+PATH_MAX_LEAVES = 16
+# Tamaño máximo (en elementos) de la matriz de caminos de cada bloque de filas: bloques chicos quedan en la caché
+PREDICT_BLOCK_ELEMENTS = 2_000_000
+
+def export_tremor_model(model, path, source=None):
+    """
+    Exporta el Pipeline entrenado (ColumnTransformer con StandardScaler y OneHotEncoder +
+    RandomForestClassifier o ExtraTreesClassifier) a un archivo .npz que NumpyTremorModel puede cargar.
+    Si se indica source (el .joblib del que sale el modelo), se guarda su sha256 en los metadatos para
+    poder detectar después que la exportación quedó desactualizada.
+    Lanza ValueError si el modelo usa algo que el predictor no reproduce.
+    """
+    preprocessor = model.named_steps['preprocessor']
+    classifier = model.named_steps['classifier']
+
+    transformers = {name: (transformer, list(columns)) for name, transformer, columns in preprocessor.transformers_
+                    if name != 'remainder'}
+    if set(transformers) != {'num', 'cat'} or preprocessor.remainder != 'drop':
+        raise ValueError("Solo se admite un ColumnTransformer con los pasos 'num' y 'cat' y remainder='drop'.")
+    scaler, numeric_columns = transformers['num']
+    encoder, categorical_columns = transformers['cat']
+    if encoder.drop_idx_ is not None or encoder.handle_unknown != 'ignore' or getattr(encoder, '_infrequent_enabled', False):
+        raise ValueError("Solo se admite OneHotEncoder(handle_unknown='ignore') sin drop ni categorías infrecuentes.")
+    if type(classifier).__name__ not in ('RandomForestClassifier', 'ExtraTreesClassifier') or classifier.n_outputs_ != 1:
+        raise ValueError("Solo se admite RandomForestClassifier o ExtraTreesClassifier con una salida.")
+    # El orden de las columnas transformadas sigue el orden de los pasos del ColumnTransformer
+    order = [name for name, _, _ in preprocessor.transformers_ if name != 'remainder']
+
+    trees = [estimator.tree_ for estimator in classifier.estimators_]
+    offsets = np.cumsum([0] + [tree.node_count for tree in trees])
+    # Los índices de hijos pasan a ser globales; las hojas apuntan a sí mismas
+    children_left, children_right = [], []
+    for offset, tree in zip(offsets[:-1], trees):
+        nodes = np.arange(tree.node_count) + offset
+        is_leaf = tree.children_left == -1
+        children_left.append(np.where(is_leaf, nodes, tree.children_left + offset))
+        children_right.append(np.where(is_leaf, nodes, tree.children_right + offset))
+
+    arrays = {
+        'scaler_mean': np.asarray(scaler.mean_ if scaler.with_mean else np.zeros(len(numeric_columns)), dtype=np.float64),
+        'scaler_scale': np.asarray(scaler.scale_ if scaler.with_std else np.ones(len(numeric_columns)), dtype=np.float64),
+        'tree_roots': offsets[:-1].astype(np.int64),
+        'children_left': np.concatenate(children_left).astype(np.int64),
+        'children_right': np.concatenate(children_right).astype(np.int64),
+        'feature': np.concatenate([np.maximum(tree.feature, 0) for tree in trees]).astype(np.int64),
+        'threshold': np.concatenate([tree.threshold for tree in trees]).astype(np.float64),
+        'missing_go_to_left': np.concatenate([getattr(tree, 'missing_go_to_left', np.zeros(tree.node_count, dtype=np.uint8))
+                                              for tree in trees]).astype(bool),
+        'value': np.concatenate([_leaf_probabilities(tree) for tree in trees]).astype(np.float64),
+        'max_depth': np.array(max(tree.max_depth for tree in trees)),
+    }
+    metadata = {
+        'version': VERSION_FORMATO,
+        'order': order,
+        'numeric_columns': numeric_columns,
+        'categorical_columns': categorical_columns,
+        'categories': [[str(c) for c in categories] for categories in encoder.categories_],
+        'classes': [str(c) for c in classifier.classes_],
+    }
+    if source is not None:
+        metadata['source_sha256'] = file_sha256(source)
+    arrays['metadata'] = np.array(json.dumps(metadata, ensure_ascii=False))
+    np.savez(path, **arrays)
+    return path
+
+def file_sha256(path):
+    """sha256 (hexadecimal) del contenido de un archivo."""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def read_export_metadata(path):
+    """Metadatos de un .npz exportado, sin cargar los árboles."""
+    with np.load(path, allow_pickle=False) as data:
+        return json.loads(str(data['metadata']))
+
+def _leaf_probabilities(tree):
+    """
+    Probabilidades de cada nodo tal como las devuelve predict_proba del árbol: desde scikit-learn 1.4
+    tree.value ya guarda fracciones (y no se vuelven a normalizar); antes guardaba cantidades.
+    """
+    import sklearn
+    value = tree.value[:, 0, :]
+    if tuple(int(part) for part in sklearn.__version__.split('.')[:2]) >= (1, 4):
+        return value
+    normalizer = value.sum(axis=1, keepdims=True)
+    normalizer[normalizer == 0.0] = 1.0
+    return value / normalizer
+
+
+class NumpyTremorModel:
+    """
+    Predictor en NumPy puro para el modelo exportado con export_tremor_model.
+    Reproduce predict y predict_proba del Pipeline de scikit-learn con los mismos resultados.
+    Cómo se evalúan los árboles se decide al cargarlo, según su tamaño (ver PATH_MAX_LEAVES).
+    """
+
+    def __init__(self, arrays, metadata):
+        self._arrays = arrays
+        self._metadata = metadata
+        self.classes_ = np.array(metadata['classes'], dtype=object)
+        self.feature_names_in_ = metadata['numeric_columns'] + metadata['categorical_columns']
+        leaves_per_tree = np.diff(np.append(arrays['tree_roots'], len(arrays['feature'])) + 1) // 2
+        if leaves_per_tree.max() <= PATH_MAX_LEAVES:
+            self._leaf_paths, self._trees = _leaf_paths(arrays), None
+        else:
+            self._leaf_paths, self._trees = None, _tree_arrays(arrays)
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path, allow_pickle=False) as data:
+            arrays = {key: data[key] for key in data.files if key != 'metadata'}
+            metadata = json.loads(str(data['metadata']))
+        if metadata.get('version') != VERSION_FORMATO:
+            raise ValueError(f"Versión de formato no soportada: {metadata.get('version')}")
+        return cls(arrays, metadata)
+
+    def transform(self, df):
+        """Equivalente al ColumnTransformer: columnas numéricas estandarizadas y categóricas en one-hot."""
+        parts = {}
+        numeric = df[self._metadata['numeric_columns']].to_numpy(dtype=np.float64)
+        parts['num'] = (numeric - self._arrays['scaler_mean']) / self._arrays['scaler_scale']
+
+        encoded = []
+        for column, categories in zip(self._metadata['categorical_columns'], self._metadata['categories']):
+            # Las categorías desconocidas (o faltantes) quedan en cero, como handle_unknown='ignore'
+            encoded.append(np.stack([(df[column] == category).to_numpy(dtype=bool, na_value=False)
+                                     for category in categories], axis=1).astype(np.float64))
+        parts['cat'] = np.hstack(encoded) if encoded else np.empty((len(df), 0))
+
+        return np.hstack([parts[name] for name in self._metadata['order']])
+
+    def predict_proba(self, df):
+        """
+        Igual que predict_proba del Pipeline. Los árboles chicos (como los del modelo incluido) se
+        evalúan por caminos y con lotes grandes son más rápidos que scikit-learn; los grandes (por
+        ejemplo max_depth=None) se recorren árbol por árbol, y con miles de filas scikit-learn, que
+        recorre cada fila en código compilado, termina siendo más rápido.
+        """
+        # Los árboles de scikit-learn comparan en float32 (contra umbrales float64)
+        X = self.transform(df).astype(np.float32)
+        if self._leaf_paths is not None:
+            proba = _predict_proba_paths(X, self._leaf_paths)
+        else:
+            proba = _predict_proba_trees(X, self._trees, self._arrays['value'])
+        proba /= len(self._arrays['tree_roots'])
+        return proba
+
+    def predict(self, df):
+        return self.classes_.take(np.argmax(self.predict_proba(df), axis=1))
+
+def _tree_arrays(a):
+    """Arreglos de cada árbol con índices locales, para recorrerlo nivel por nivel."""
+    left, right = a['children_left'], a['children_right']
+    nodes = np.arange(len(left))
+    is_split = left != nodes
+    # Los nodos de scikit-learn están en preorden: el nivel de los hijos se completa recorriendo los niveles
+    depth = np.zeros(len(left), dtype=np.int64)
+    for level in range(int(a['max_depth'])):
+        parents = nodes[is_split & (depth == level)]
+        depth[left[parents]] = depth[right[parents]] = level + 1
+
+    trees = []
+    ends = np.append(a['tree_roots'][1:], len(left))
+    for root, end in zip(a['tree_roots'], ends):
+        # child[2 * nodo + va_a_la_izquierda]; las hojas apuntan a sí mismas
+        child = np.stack([right[root:end], left[root:end]], axis=1).ravel() - root
+        missing_go_to_left = a['missing_go_to_left'][root:end]
+        trees.append({
+            'offset': root,
+            'depth': int(depth[root:end].max()),
+            'feature': a['feature'][root:end].astype(np.intp),
+            'threshold': a['threshold'][root:end],
+            'child': child.astype(np.intp),
+            'missing_go_to_left': missing_go_to_left if missing_go_to_left.any() else None,
+        })
+    return trees
+
+def _predict_proba_trees(X, trees, value):
+    """Recorre un árbol a la vez con todas las filas: un paso por nivel con los arreglos del árbol."""
+    n_rows, n_columns = X.shape
+    flat = np.ascontiguousarray(X).ravel()
+    row_start = np.arange(n_rows) * n_columns
+    proba = np.zeros((n_rows, value.shape[1]))
+    for tree in trees:
+        node = np.zeros(n_rows, dtype=np.intp)
+        for _ in range(tree['depth']):
+            x = flat[row_start + tree['feature'][node]]
+            go_left = x <= tree['threshold'][node]
+            if tree['missing_go_to_left'] is not None:
+                missing = np.isnan(x)
+                go_left[missing] = tree['missing_go_to_left'][node[missing]]
+            node = tree['child'][2 * node + go_left]
+        # Se acumula árbol por árbol, en el mismo orden que scikit-learn, para obtener los mismos redondeos
+        proba += value[tree['offset'] + node]
+    return proba
+
+def _leaf_paths(a):
+    """
+    Reorganiza un bosque de árboles chicos para _predict_proba_paths: las hojas de cada árbol ocupan
+    slots_per_tree posiciones consecutivas (las sobrantes nunca se alcanzan) y path[nivel, posición] es
+    la fila de la matriz de decisiones que debe ser verdadera en ese nivel del camino hacia la hoja.
+    """
+    left, right = a['children_left'], a['children_right']
+    nodes = np.arange(len(left))
+    splits = np.flatnonzero(left != nodes)
+    leaves = np.flatnonzero(left == nodes) # Ordenadas por nodo: agrupadas por árbol
+    n_splits, n_trees = len(splits), len(a['tree_roots'])
+    split_row = np.full(len(left), -1)
+    split_row[splits] = np.arange(n_splits)
+    parent = np.full(len(left), -1)
+    parent[left[splits]] = parent[right[splits]] = splits
+    is_left = np.zeros(len(left), dtype=bool)
+    is_left[left[splits]] = True
+
+    tree = np.searchsorted(a['tree_roots'], leaves, side='right') - 1
+    leaves_per_tree = np.bincount(tree, minlength=n_trees)
+    slots_per_tree = int(leaves_per_tree.max())
+    position = (tree * slots_per_tree + np.arange(len(leaves))
+                - np.repeat(np.cumsum(leaves_per_tree) - leaves_per_tree, leaves_per_tree))
+
+    # Filas de la matriz de decisiones: división i a la izquierda (i), a la derecha (n_splits + i), una
+    # siempre verdadera para completar los caminos cortos y una siempre falsa para las posiciones sobrantes
+    always, never = 2 * n_splits, 2 * n_splits + 1
+    depth = max(int(a['max_depth']), 1)
+    path = np.full((depth, n_trees * slots_per_tree), always)
+    path[0] = never
+    leaf_value = np.zeros((a['value'].shape[1], n_trees * slots_per_tree))
+    for leaf, pos in zip(leaves, position):
+        node, level = leaf, 0
+        path[0, pos] = always
+        while parent[node] >= 0:
+            path[level, pos] = split_row[parent[node]] + (0 if is_left[node] else n_splits)
+            node, level = parent[node], level + 1
+        leaf_value[:, pos] = a['value'][leaf]
+
+    slot_type = np.uint8 if slots_per_tree <= np.iinfo(np.uint8).max else np.intp
+    return {
+        'feature': a['feature'][splits],
+        'threshold': a['threshold'][splits][:, None],
+        'missing_go_to_left': a['missing_go_to_left'][splits][:, None],
+        'path': path,
+        'slots_per_tree': slots_per_tree,
+        'slot_number': np.arange(slots_per_tree, dtype=slot_type)[None, :, None],
+        'slot_offset': (np.arange(n_trees) * slots_per_tree)[:, None],
+        'value': leaf_value,
+        'block_rows': max(64, min(4096, PREDICT_BLOCK_ELEMENTS // path.size)),
+    }
+
+def _predict_proba_paths(X, p):
+    """
+    Evalúa todas las divisiones del bosque para un bloque de filas y encuentra la hoja de cada árbol
+    con operaciones sobre filas completas de la matriz de decisiones, sin recorrer nodo por nodo.
+    """
+    X_t = np.ascontiguousarray(X.T)
+    n_rows, n_trees, n_slots = X_t.shape[1], len(p['slot_offset']), p['slots_per_tree']
+    proba = np.empty((n_rows, len(p['value'])))
+    n_splits = len(p['feature'])
+
+    for start in range(0, n_rows, p['block_rows']):
+        x = X_t[p['feature'], start:start + p['block_rows']]
+        block = x.shape[1]
+        decisions = np.empty((2 * n_splits + 2, block), dtype=bool)
+        decisions[:n_splits] = np.where(np.isnan(x), p['missing_go_to_left'], x <= p['threshold'])
+        np.logical_not(decisions[:n_splits], out=decisions[n_splits:-2])
+        decisions[-2], decisions[-1] = True, False
+
+        # Una hoja se alcanza si todas las divisiones de su camino van hacia ella: exactamente una por árbol
+        reached = decisions[p['path'][0]]
+        for level in p['path'][1:]:
+            reached &= decisions[level]
+        slot = (reached.reshape(n_trees, n_slots, block) * p['slot_number']).sum(axis=1, dtype=p['slot_number'].dtype)
+        leaf = p['slot_offset'] + slot
+
+        # Suma sobre el primer eje: se acumula árbol por árbol, en el mismo orden que scikit-learn,
+        # para obtener los mismos redondeos
+        for c, class_value in enumerate(p['value']):
+            proba[start:start + block, c] = class_value[leaf].sum(axis=0)
+    return proba
+
+if __name__ == "__main__":
+    # Uso: python numpy_inference.py [modelo.joblib] [salida.npz]
+    import sys
+    import joblib
+    origen = sys.argv[1] if len(sys.argv) > 1 else 'tremor_prediction_model_V2.joblib'
+    destino = sys.argv[2] if len(sys.argv) > 2 else origen.rsplit('.', 1)[0] + '.npz'
+    print(export_tremor_model(joblib.load(origen), destino, source=origen))
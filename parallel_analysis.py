@@ -0,0 +1,151 @@
+# parallel_analysis.py
+import hashlib
+import multiprocessing
+import os
+import sys
+import threading
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from concurrent.futures.process import BrokenProcessPool
+
+from config import VENTANA_DURACION_SEG, UMBRAL_FRECUENCIA_AMPLITUD_HZ
+from data_ingestion import leer_bytes
+from analysis_cache import analizar_archivo_con_cache, clave_cache, leer_cache
+from pipeline_profiling import perfilado_activo, estado_perfilado, ejecutar_perfilado, agregar_registros
+
+# Seis procesos alcanzan para la comparación (dos mediciones x tres tests)
+MAX_PROCESOS = min(6, os.cpu_count() or 1)
+
+_carriles = []
+# Archivos enviados a cada carril que todavía no terminaron (de todas las sesiones)
+_pendientes_carril = []
+_carriles_lock = threading.Lock()
+
+def obtener_carriles():
+    """
+    Procesos compartidos por todas las sesiones, cada uno en su propio ProcessPoolExecutor de un solo
+    proceso (un "carril"). Se crean la primera vez que se usan y quedan activos entre ejecuciones del
+    script de Streamlit. Se usa 'spawn' porque el servidor de Streamlit tiene varios hilos y hacer fork
+    de un proceso así no es seguro.
+    Con 'spawn' cada proceso nuevo vuelve a importar el módulo __main__ del padre, que bajo Streamlit es
+    main_app.py: cada proceso cargaría streamlit y el modelo y ejecutaría toda la interfaz. Por eso los
+    procesos se inician todos aquí, mientras __main__ es este módulo, que solo importa el análisis.
+    """
+    with _carriles_lock:
+        if not _carriles:
+            contexto = multiprocessing.get_context("spawn")
+            _carriles.extend(ProcessPoolExecutor(max_workers=1, mp_context=contexto) for _ in range(MAX_PROCESOS))
+            _pendientes_carril[:] = [0] * MAX_PROCESOS
+            principal = sys.modules["__main__"]
+            sys.modules["__main__"] = sys.modules[__name__]
+            try:
+                # Cada carril inicia su único proceso con la primera tarea; después no crea otros
+                for carril in _carriles:
+                    carril.submit(os.getpid)
+            finally:
+                sys.modules["__main__"] = principal
+        return list(_carriles)
+
+def _asignar_carriles(contenidos):
+    """
+    Elige el carril de cada contenido ({clave: contenido} -> {clave: índice}). Cada archivo tiene un
+    carril preferido según el hash de su contenido, donde quedan memorizadas sus etapas; se usa si está
+    libre y, si no, cualquier carril libre, o el menos cargado si están todos ocupados. Los carriles
+    elegidos quedan contados como ocupados hasta que se llama a _liberar_carril con su ejecutor.
+    """
+    with _carriles_lock:
+        preferidos = {clave: int.from_bytes(hashlib.sha1(contenido).digest()[:8], "big") % len(_carriles)
+                      for clave, contenido in contenidos.items()}
+        asignados = {}
+        # Primero los archivos cuyo carril preferido está libre, después el resto
+        for clave, carril in preferidos.items():
+            if _pendientes_carril[carril] == 0:
+                asignados[clave] = carril
+                _pendientes_carril[carril] += 1
+        for clave in preferidos.keys() - asignados.keys():
+            carril = min(range(len(_carriles)), key=lambda i: _pendientes_carril[i])
+            asignados[clave] = carril
+            _pendientes_carril[carril] += 1
+        return {clave: asignados[clave] for clave in contenidos}
+
+def _liberar_carril(ejecutor):
+    with _carriles_lock:
+        # Si los carriles se recrearon mientras tanto, el ejecutor ya no está
+        for i, carril in enumerate(_carriles):
+            if carril is ejecutor:
+                _pendientes_carril[i] -= 1
+
+def _reiniciar_carriles():
+    with _carriles_lock:
+        for carril in _carriles:
+            carril.shutdown(wait=False, cancel_futures=True)
+        _carriles.clear()
+        _pendientes_carril.clear()
+
+def analizar_en_paralelo(archivos, fs=100, ventana_seg=VENTANA_DURACION_SEG, salto_seg=None,
+                         umbral_freq_hz=UMBRAL_FRECUENCIA_AMPLITUD_HZ, al_completar=None, compacto=False):
+    """
+    Analiza varios archivos a la vez. archivos es un diccionario {clave: archivo} (los None se omiten);
+    devuelve {clave: (df_promedio, df_por_ventana)} en el mismo orden que archivos.
+    al_completar(clave, completados, total) se llama desde este hilo cada vez que termina un archivo,
+    por lo que puede actualizar la interfaz de Streamlit.
+    Los resultados que ya están en la caché en disco se devuelven sin pasar por los procesos.
+    Cada archivo va, si está libre, al proceso que le corresponde por el hash de su contenido: así, al
+    repetir el análisis cambiando ventana_seg, salto_seg o umbral_freq_hz, ese proceso encuentra
+    memorizados la orientación y el filtrado (ver signal_analysis) y solo recalcula las ventanas. Si
+    ese proceso está ocupado se usa otro libre, para no esperar (ver _asignar_carriles).
+    Con compacto=True los resultados son ResultadosVentanas (ver window_results), que además vuelven
+    de los procesos como unos pocos arreglos en lugar de DataFrames.
+    """
+    parametros = dict(fs=fs, ventana_seg=ventana_seg, salto_seg=salto_seg, umbral_freq_hz=umbral_freq_hz,
+                      compacto=compacto)
+    contenidos = {clave: leer_bytes(archivo) for clave, archivo in archivos.items() if archivo is not None}
+    total = len(contenidos)
+    resultados = {}
+
+    def _completado(clave, resultado):
+        resultados[clave] = resultado
+        if al_completar is not None:
+            al_completar(clave, len(resultados), total)
+
+    pendientes = {}
+    for clave, contenido in contenidos.items():
+        resultado = leer_cache(clave_cache(contenido, fs, ventana_seg, salto_seg, umbral_freq_hz), compacto=compacto)
+        if resultado is not None:
+            _completado(clave, resultado)
+        else:
+            pendientes[clave] = contenido
+
+    if len(pendientes) == 1:
+        # Un solo archivo: no vale la pena enviarlo a otro proceso
+        clave, contenido = next(iter(pendientes.items()))
+        _completado(clave, analizar_archivo_con_cache(contenido, **parametros))
+    elif pendientes:
+        try:
+            carriles = obtener_carriles()
+            asignados = _asignar_carriles(pendientes)
+            perfilado = perfilado_activo()
+            # Los registros de la instrumentación vuelven junto con el resultado de cada proceso
+            estado = estado_perfilado() if perfilado else None
+            futuros = {}
+            for clave, contenido in pendientes.items():
+                carril = carriles[asignados[clave]]
+                if perfilado:
+                    futuro = carril.submit(ejecutar_perfilado, analizar_archivo_con_cache, estado, contenido, **parametros)
+                else:
+                    futuro = carril.submit(analizar_archivo_con_cache, contenido, **parametros)
+                futuro.add_done_callback(lambda _, carril=carril: _liberar_carril(carril))
+                futuros[futuro] = clave
+            for futuro in as_completed(futuros):
+                resultado = futuro.result()
+                if perfilado:
+                    resultado, registros = resultado
+                    agregar_registros(registros)
+                _completado(futuros[futuro], resultado)
+        except BrokenProcessPool:
+            # Si un proceso murió, se recrean los procesos y se termina el trabajo en este proceso
+            _reiniciar_carriles()
+            for clave, contenido in pendientes.items():
+                if clave not in resultados:
+                    _completado(clave, analizar_archivo_con_cache(contenido, **parametros))
+
+    return {clave: resultados[clave] for clave in contenidos}
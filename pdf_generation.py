@@ -1,11 +1,14 @@
 # pdf_generation.py
-from fpdf import FPDF
 from datetime import datetime, timedelta
 import unicodedata
 import os
 import io
 from io import BytesIO
 
+from report_graphics import dibujar_grafico_pdf
+from pipeline_profiling import etapa, perfilar
+from window_results import ResultadosVentanas
+
 def limpiar_texto_para_pdf(texto):
     """Normaliza y limpia texto para asegurar compatibilidad con PDF."""
     if texto is None:
@@ -13,22 +16,70 @@ def limpiar_texto_para_pdf(texto):
     # Asegúrate de que el texto sea una cadena antes de normalizar
     return unicodedata.normalize("NFKD", str(texto)).encode("ASCII", "ignore").decode("ASCII")
 
-class PDF(FPDF):
-    def header(self):
-        pass
+# Texto fijo de la interpretación clínica del informe individual; se limpia una sola vez por proceso
+TEXTO_INTERPRETACION = """
+        Este informe analiza tres tipos de temblores: en reposo, postural y de acción.
+
+        Los valores de referencia considerados son:
+          Para las frecuencias (Hz):
+        - Temblor Parkinsoniano: 3-6 Hz en reposo.
+        - Temblor Esencial: 8-10 Hz en acción o postura.
+
+          Para las amplitudes:
+        - Mayores a 0.5 cm pueden ser clínicamente relevantes.
+
+          Para el RMS (m/s2):
+        - Normal/sano: menor a 0.5 m/s2.
+        - PK leve: entre 0.5 y 1.5 m/s2.
+        - TE o PK severo: mayor a 2 m/s2.
+
+        Nota clínica: Los valores de referencia presentados a continuación se basan en literatura científica.
+
+        Diagnóstico Automático: {diagnostico}
+        """
+_TEXTO_INTERPRETACION_LIMPIO = limpiar_texto_para_pdf(TEXTO_INTERPRETACION)
+
+_clase_pdf = None
 
-    def footer(self):
-        self.set_y(-15)
-        self.set_font('Arial', 'I', 8)
-        self.cell(0, 10, f'Página {self.page_no()}/{{nb}}', 0, 0, 'C')
+def clase_pdf():
+    """
+    Clase del documento (FPDF con número de página al pie). fpdf se importa recién con el primer
+    informe, así abrir la aplicación no lo carga.
+    """
+    global _clase_pdf
+    if _clase_pdf is None:
+        from fpdf import FPDF
 
-def generar_pdf(datos_paciente_dict, df_resultados, nombre_archivo="informe_temblor.pdf",
+        class PDF(FPDF):
+            def header(self):
+                pass
+
+            def footer(self):
+                self.set_y(-15)
+                self.set_font('Arial', 'I', 8)
+                self.cell(0, 10, f'Página {self.page_no()}/{{nb}}', 0, 0, 'C')
+
+        _clase_pdf = PDF
+    return _clase_pdf
+
+@perfilar("generar_pdf")
+def generar_pdf(datos_paciente_dict, df_resultados, nombre_archivo=None,
                 diagnostico="", img_buffers=None, comparison_mode=False, # Cambiado figs a img_buffers
-                config1_params=None, config2_params=None, prediction_info=None):
+                config1_params=None, config2_params=None, prediction_info=None, graficos=None):
+    """
+    Genera el informe en memoria y devuelve el contenido del PDF (bytes).
+    Si se indica nombre_archivo, además lo escribe en disco.
+    graficos son gráficos de report_graphics.grafico_amplitud, que se dibujan como líneas vectoriales
+    (más livianos y rápidos que img_buffers, que se mantiene para imágenes ya renderizadas).
+    df_resultados puede ser un DataFrame o un ResultadosVentanas con la etiqueta Test (y Measurement
+    en el modo comparativo).
+    """
+    if isinstance(df_resultados, ResultadosVentanas):
+        df_resultados = df_resultados.a_dataframe()
 
     fecha_hora = (datetime.now() - timedelta(hours=3)).strftime("%d/%m/%Y %H:%M")
     
-    pdf = PDF()
+    pdf = clase_pdf()()
     pdf.alias_nb_pages() 
     pdf.add_page()
     pdf.set_auto_page_break(auto=True, margin=15)
@@ -204,27 +255,7 @@ def generar_pdf(datos_paciente_dict, df_resultados, nombre_archivo="informe_temb
     else:
         pdf.cell(0, 10, "Interpretación clínica:", ln=True)
         pdf.set_font("Arial", size=10)
-        texto_original = f"""
-        Este informe analiza tres tipos de temblores: en reposo, postural y de acción.
-
-        Los valores de referencia considerados son:
-          Para las frecuencias (Hz):
-        - Temblor Parkinsoniano: 3-6 Hz en reposo.
-        - Temblor Esencial: 8-10 Hz en acción o postura.
-
-          Para las amplitudes:
-        - Mayores a 0.5 cm pueden ser clínicamente relevantes.
-
-          Para el RMS (m/s2):
-        - Normal/sano: menor a 0.5 m/s2.
-        - PK leve: entre 0.5 y 1.5 m/s2.
-        - TE o PK severo: mayor a 2 m/s2.
-
-        Nota clínica: Los valores de referencia presentados a continuación se basan en literatura científica.
-
-        Diagnóstico Automático: {diagnostico}
-        """
-        pdf.multi_cell(0, 6, limpiar_texto_para_pdf(texto_original))
+        pdf.multi_cell(0, 6, _TEXTO_INTERPRETACION_LIMPIO.format(diagnostico=limpiar_texto_para_pdf(diagnostico)))
 
     # Handle image buffers
     if img_buffers: # Ahora acepta buffers de imagen, no figuras
@@ -249,4 +280,30 @@ def generar_pdf(datos_paciente_dict, df_resultados, nombre_archivo="informe_temb
                     pdf.set_font("Arial", 'I', 10)
                     pdf.cell(0, 10, f"Error al cargar gráfico {i+1}", ln=True, align='C')
 
-    pdf.output(nombre_archivo)
+    puntos = sum(len(serie['x']) for grafico in graficos or [] for serie in grafico['series'])
+    with etapa("pdf_graficos", puntos, graficos=len(graficos or [])):
+        for grafico in graficos or []:
+            required_height = 100 + 10
+            if pdf.get_y() + required_height > pdf.h - pdf.b_margin - 5:
+                pdf.add_page()
+            else:
+                pdf.ln(5)
+            dibujar_grafico_pdf(pdf, grafico, x=15, w=180, h=100)
+
+    with etapa("pdf_salida"):
+        contenido = pdf.output(dest='S')
+    # fpdf 1.7 devuelve str (latin-1); fpdf2 devuelve bytearray
+    contenido = contenido.encode('latin-1') if isinstance(contenido, str) else bytes(contenido)
+    if nombre_archivo is not None:
+        with open(nombre_archivo, 'wb') as f:
+            f.write(contenido)
+    return contenido
+
+
+def precargar_recursos():
+    """
+    Prepara en este proceso lo que todos los informes comparten (métricas de las fuentes de FPDF,
+    texto fijo), generando un informe vacío. Lo usan los procesos de bulk_reports al iniciar.
+    """
+    import pandas as pd
+    generar_pdf({}, pd.DataFrame(), diagnostico="")
@@ -0,0 +1,240 @@
+# pipeline_profiling.py
+"""
+Instrumentación por etapas del análisis: tiempo, cantidad de muestras y pico de memoria.
+
+Está apagada por defecto (config.PERFILADO_ACTIVO): en ese caso etapa() devuelve siempre el mismo
+objeto vacío y perfilar() solo agrega una comparación, así que el costo es despreciable.
+
+    with etapa("filtrado", muestras=len(señal)):
+        ...
+
+    @perfilar("generar_pdf")
+    def generar_pdf(...): ...
+
+El pico de memoria se mide con tracemalloc, que hace bastante más lento el código con muchas
+asignaciones pequeñas (Mahony en Python puro): por eso se activa aparte (memoria=True). Es el pico de
+todo el proceso mientras dura la etapa, por encima de la memoria en uso al comenzar; con varias
+etapas a la vez en distintos hilos los valores se mezclan.
+
+Cada registro es un diccionario plano (ver _Etapa.__exit__); registros() los devuelve,
+exportar_jsonl() los convierte en líneas JSON y, si config.PERFILADO_LOG indica un archivo,
+se agregan allí a medida que se generan, para el sistema de monitoreo.
+"""
+import contextvars
+import functools
+import json
+import os
+import threading
+import time
+import tracemalloc
+from collections import deque
+from datetime import datetime
+
+from config import PERFILADO_ACTIVO, PERFILADO_MEMORIA, PERFILADO_LOG, PERFILADO_MAX_REGISTROS
+
+_activo = PERFILADO_ACTIVO
+_memoria = False
+_registros = deque(maxlen=PERFILADO_MAX_REGISTROS)
+_lock = threading.Lock()
+_pila = threading.local() # Etapas abiertas en cada hilo, para anidar los registros
+# Sesión de Streamlit (u otro identificador) a la que se atribuyen los registros de este contexto
+_sesion = contextvars.ContextVar("sesion_perfilado", default=None)
+# Lista donde se juntan los registros en lugar de guardarlos en este proceso (ver ejecutar_perfilado)
+_destino = contextvars.ContextVar("destino_perfilado", default=None)
+
+
+class _EtapaInactiva:
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def anotar(self, **datos):
+        pass
+
+_ETAPA_INACTIVA = _EtapaInactiva()
+
+
+class _Etapa:
+    def __init__(self, nombre, muestras, datos):
+        self.nombre = nombre
+        self.muestras = muestras
+        self.datos = datos
+        self.pico = 0
+
+    def anotar(self, **datos):
+        """Agrega datos al registro (por ejemplo muestras=, que a veces se conocen recién al final)."""
+        if 'muestras' in datos:
+            self.muestras = datos.pop('muestras')
+        self.datos.update(datos)
+
+    def __enter__(self):
+        pila = getattr(_pila, 'etapas', None)
+        if pila is None:
+            pila = _pila.etapas = []
+        self.padre = pila[-1].nombre if pila else None
+        self.medir_memoria = _memoria and tracemalloc.is_tracing()
+        if self.medir_memoria:
+            actual, pico = tracemalloc.get_traced_memory()
+            if pila:
+                # reset_peak borra el pico acumulado por la etapa que contiene a esta
+                pila[-1].pico = max(pila[-1].pico, pico)
+            tracemalloc.reset_peak()
+            self.memoria_inicial = actual
+        pila.append(self)
+        self.fecha = time.time()
+        self.inicio = time.perf_counter()
+        return self
+
+    def __exit__(self, tipo_error, error, traza):
+        segundos = time.perf_counter() - self.inicio
+        pila = _pila.etapas
+        pila.pop()
+        pico_mb = None
+        if self.medir_memoria:
+            self.pico = max(self.pico, tracemalloc.get_traced_memory()[1])
+            pico_mb = max(self.pico - self.memoria_inicial, 0) / 1e6
+            if pila:
+                pila[-1].pico = max(pila[-1].pico, self.pico)
+        registro = {
+            'fecha': datetime.fromtimestamp(self.fecha).isoformat(timespec='milliseconds'),
+            'etapa': self.nombre,
+            'padre': self.padre,
+            'segundos': segundos,
+            'muestras': self.muestras,
+            'muestras_por_seg': self.muestras / segundos if self.muestras and segundos > 0 else None,
+            'pico_memoria_mb': pico_mb,
+            'error': tipo_error.__name__ if tipo_error is not None else None,
+            'sesion': _sesion.get(),
+            'proceso': os.getpid(),
+            'hilo': threading.current_thread().name,
+            **self.datos,
+        }
+        destino = _destino.get()
+        if destino is not None:
+            destino.append(registro)
+        else:
+            agregar_registros([registro])
+        return False
+
+
+def etapa(nombre, muestras=None, **datos):
+    """Context manager que registra una etapa (no hace nada si la instrumentación está apagada)."""
+    if not _activo:
+        return _ETAPA_INACTIVA
+    return _Etapa(nombre, muestras, datos)
+
+def perfilar(nombre):
+    """Decorador: registra cada llamada a la función como la etapa nombre."""
+    def decorador(funcion):
+        @functools.wraps(funcion)
+        def envoltura(*args, **kwargs):
+            if not _activo:
+                return funcion(*args, **kwargs)
+            with _Etapa(nombre, None, {}):
+                return funcion(*args, **kwargs)
+        return envoltura
+    return decorador
+
+def activar_perfilado(activo=True, memoria=PERFILADO_MEMORIA):
+    """Enciende o apaga la instrumentación en este proceso (afecta a todas las sesiones)."""
+    global _activo, _memoria
+    _activo = bool(activo)
+    _memoria = bool(activo and memoria)
+    if _memoria and not tracemalloc.is_tracing():
+        tracemalloc.start()
+    elif not _memoria and tracemalloc.is_tracing():
+        tracemalloc.stop()
+
+def perfilado_activo():
+    return _activo
+
+def midiendo_memoria():
+    return _memoria
+
+def asignar_sesion(sesion):
+    """Atribuye a sesion los registros que se generen desde este contexto (hilo o tarea)."""
+    _sesion.set(sesion)
+
+def sesion_actual():
+    return _sesion.get()
+
+def agregar_registros(nuevos):
+    """Agrega registros (por ejemplo los devueltos por otro proceso) y los escribe en PERFILADO_LOG."""
+    if not nuevos:
+        return
+    with _lock:
+        _registros.extend(nuevos)
+        if PERFILADO_LOG:
+            try:
+                with open(PERFILADO_LOG, 'a', encoding='utf-8') as f:
+                    f.write(exportar_jsonl(nuevos))
+            except OSError as e:
+                print(f"No se pudo escribir el registro de perfilado en {PERFILADO_LOG}: {e}")
+
+def registros(sesion=None, desde=None):
+    """Copia de los registros en memoria, opcionalmente solo de una sesión o posteriores a la fecha desde (ISO)."""
+    with _lock:
+        copia = list(_registros)
+    if sesion is not None:
+        copia = [r for r in copia if r['sesion'] == sesion]
+    if desde is not None:
+        copia = [r for r in copia if r['fecha'] >= desde]
+    return copia
+
+def limpiar_registros(sesion=None):
+    """Borra los registros en memoria (todos o los de una sesión)."""
+    with _lock:
+        conservar = [r for r in _registros if sesion is not None and r['sesion'] != sesion]
+        _registros.clear()
+        _registros.extend(conservar)
+
+def exportar_jsonl(lista):
+    """Registros como texto JSON Lines (un objeto por línea)."""
+    return "".join(json.dumps(r, ensure_ascii=False, default=str) + "\n" for r in lista)
+
+def resumen(lista):
+    """DataFrame con una fila por etapa: llamadas, tiempo total/medio/máximo, muestras y pico de memoria."""
+    import pandas as pd
+    df = pd.DataFrame(lista)
+    if df.empty:
+        return df
+    if 'en_cache' not in df:
+        df['en_cache'] = False
+    df['en_cache'] = df['en_cache'].fillna(False).astype(bool)
+    return df.groupby('etapa', sort=False).agg(
+        llamadas=('segundos', 'size'),
+        en_cache=('en_cache', 'sum'),
+        segundos_total=('segundos', 'sum'),
+        segundos_medio=('segundos', 'mean'),
+        segundos_max=('segundos', 'max'),
+        muestras_max=('muestras', 'max'),
+        pico_memoria_mb=('pico_memoria_mb', 'max'),
+    ).sort_values('segundos_total', ascending=False)
+
+
+def ejecutar_perfilado(funcion, estado, *args, **kwargs):
+    """
+    Ejecuta funcion en otro proceso (por ejemplo del pool de parallel_analysis) con la instrumentación
+    de estado (ver estado_perfilado) y devuelve (resultado, registros generados) para que el proceso
+    principal los agregue con agregar_registros.
+    """
+    activo, memoria, sesion = estado
+    if (activo, memoria) != (_activo, _memoria):
+        activar_perfilado(activo, memoria)
+    asignar_sesion(sesion)
+    nuevos = []
+    token = _destino.set(nuevos)
+    try:
+        resultado = funcion(*args, **kwargs)
+    finally:
+        _destino.reset(token)
+    return resultado, nuevos
+
+def estado_perfilado():
+    """(activo, memoria, sesión) de este contexto, para reproducirlo en otro proceso."""
+    return _activo, _memoria, _sesion.get()
+
+if PERFILADO_ACTIVO:
+    activar_perfilado(True, PERFILADO_MEMORIA)
@@ -0,0 +1,165 @@
+# report_graphics.py
+import io
+import numpy as np
+
+# Ciclo de colores por defecto de matplotlib, para que la pantalla y el PDF coincidan
+COLORES = ['#1f77b4', '#ff7f0e', '#2ca02c', '#d62728', '#9467bd']
+# Puntos por serie en el PDF: más que suficiente para 180 mm de ancho
+MAX_PUNTOS_SERIE = 600
+
+def grafico_amplitud(series, titulo, xlabel="Tiempo (segundos)", ylabel="Amplitud (cm)"):
+    """
+    Describe un gráfico de líneas independiente de la forma de dibujarlo.
+    series es una lista de (nombre, x, y) o (nombre, x, y, color). El mismo gráfico se muestra en
+    pantalla con figura_matplotlib y se dibuja en el PDF con dibujar_grafico_pdf.
+    """
+    series_grafico = []
+    for i, serie in enumerate(series):
+        nombre, x, y = serie[:3]
+        color = serie[3] if len(serie) > 3 else COLORES[i % len(COLORES)]
+        series_grafico.append({
+            'nombre': str(nombre),
+            'x': np.asarray(x, dtype=np.float64),
+            'y': np.asarray(y, dtype=np.float64),
+            'color': color,
+        })
+    return {'titulo': titulo, 'xlabel': xlabel, 'ylabel': ylabel, 'series': series_grafico}
+
+def figura_matplotlib(grafico, figsize=(10, 6)):
+    """
+    Figura de matplotlib del gráfico, para st.pyplot. Se crea sin pyplot: no queda registrada en el
+    estado global (no hace falta cerrarla) y abrir la aplicación no carga pyplot ni su backend.
+    """
+    from matplotlib.figure import Figure
+    fig = Figure(figsize=figsize)
+    ax = fig.subplots()
+    for serie in grafico['series']:
+        ax.plot(serie['x'], serie['y'], label=serie['nombre'], color=serie['color'])
+    ax.set_title(grafico['titulo'])
+    ax.set_xlabel(grafico['xlabel'])
+    ax.set_ylabel(grafico['ylabel'])
+    ax.legend()
+    ax.grid(True)
+    return fig
+
+def imagen_png(grafico, figsize=(10, 6), dpi=200):
+    """
+    PNG del gráfico con las mismas opciones que usa st.pyplot (200 dpi, bordes recortados), para
+    guardarlo una vez y volver a mostrarlo con st.image sin dibujarlo de nuevo.
+    """
+    buf = io.BytesIO()
+    figura_matplotlib(grafico, figsize).savefig(buf, format='png', bbox_inches='tight', dpi=dpi)
+    return buf.getvalue()
+
+def _color_rgb(color):
+    color = color.lstrip('#')
+    return tuple(int(color[i:i + 2], 16) for i in (0, 2, 4))
+
+def _reducir_puntos(x, y, max_puntos=MAX_PUNTOS_SERIE):
+    """Conserva el mínimo y el máximo de cada tramo, así los picos de amplitud no se pierden."""
+    n = len(x)
+    if n <= max_puntos:
+        return x, y
+    tramos = max_puntos // 2
+    largo = -(-n // tramos)
+    relleno = np.concatenate([y, np.full(tramos * largo - n, np.nan)]).reshape(tramos, largo)
+    inicio = np.arange(tramos) * largo
+    i_min = inicio + np.argmin(np.where(np.isnan(relleno), np.inf, relleno), axis=1)
+    i_max = inicio + np.argmax(np.where(np.isnan(relleno), -np.inf, relleno), axis=1)
+    indices = np.unique(np.concatenate([i_min, i_max]))
+    indices = indices[indices < n]
+    return x[indices], y[indices]
+
+def _marcas(vmin, vmax, cantidad=6):
+    """Valores redondos para las marcas de un eje entre vmin y vmax."""
+    if vmax <= vmin:
+        return np.array([vmin])
+    paso = (vmax - vmin) / cantidad
+    magnitud = 10 ** np.floor(np.log10(paso))
+    paso = min((m * magnitud for m in (1, 2, 2.5, 5, 10) if m * magnitud >= paso), default=10 * magnitud)
+    marcas = np.arange(np.ceil(vmin / paso) * paso, vmax + paso * 1e-9, paso)
+    return marcas[(marcas >= vmin - paso * 1e-9) & (marcas <= vmax + paso * 1e-9)]
+
+def _rango(valores):
+    vmin, vmax = float(np.min(valores)), float(np.max(valores))
+    if vmax == vmin:
+        vmin, vmax = vmin - 0.5, vmax + 0.5
+    margen = (vmax - vmin) * 0.05
+    return vmin - margen, vmax + margen
+
+def _formato(valor):
+    # Redondeo para no mostrar restos de punto flotante como "-0" o "0.30000000000000004"
+    return f"{round(float(valor), 10) + 0.0:g}"
+
+def dibujar_grafico_pdf(pdf, grafico, x=15, y=None, w=180, h=100):
+    """
+    Dibuja el gráfico con las primitivas de FPDF (líneas y texto vectoriales) en el rectángulo
+    (x, y, w, h) en mm. Deja el cursor debajo del gráfico.
+    """
+    y = pdf.get_y() if y is None else y
+    series = [(serie, *_reducir_puntos(serie['x'], serie['y'])) for serie in grafico['series']]
+    xs = np.concatenate([sx[np.isfinite(sx)] for _, sx, _ in series]) if series else np.array([])
+    ys = np.concatenate([sy[np.isfinite(sy)] for _, _, sy in series]) if series else np.array([])
+
+    # Área de los ejes dentro del rectángulo: lugar para el título, las marcas y las etiquetas
+    ax_x, ax_y = x + 14, y + 12
+    ax_w, ax_h = w - 18, h - 24
+
+    pdf.set_text_color(0)
+    pdf.set_font("Arial", 'B', 11)
+    pdf.text(x + (w - pdf.get_string_width(grafico['titulo'])) / 2, y + 5, grafico['titulo'])
+    pdf.set_font("Arial", size=8)
+    pdf.text(ax_x, ax_y - 2, grafico['ylabel'])
+    pdf.text(ax_x + (ax_w - pdf.get_string_width(grafico['xlabel'])) / 2, ax_y + ax_h + 10, grafico['xlabel'])
+
+    if xs.size and ys.size:
+        x_min, x_max = _rango(xs)
+        y_min, y_max = _rango(ys)
+
+        def a_pdf(vx, vy):
+            return (ax_x + (vx - x_min) / (x_max - x_min) * ax_w,
+                    ax_y + ax_h - (vy - y_min) / (y_max - y_min) * ax_h)
+
+        # Grilla y marcas
+        pdf.set_font("Arial", size=7)
+        pdf.set_line_width(0.1)
+        pdf.set_draw_color(220, 220, 220)
+        for marca in _marcas(x_min, x_max):
+            px, _ = a_pdf(marca, y_min)
+            pdf.line(px, ax_y, px, ax_y + ax_h)
+            etiqueta = _formato(marca)
+            pdf.text(px - pdf.get_string_width(etiqueta) / 2, ax_y + ax_h + 4, etiqueta)
+        for marca in _marcas(y_min, y_max):
+            _, py = a_pdf(x_min, marca)
+            pdf.line(ax_x, py, ax_x + ax_w, py)
+            etiqueta = _formato(marca)
+            pdf.text(ax_x - 1 - pdf.get_string_width(etiqueta), py + 1, etiqueta)
+
+        # Series: los tramos con NaN quedan cortados, como en matplotlib
+        pdf.set_line_width(0.3)
+        for serie, sx, sy in series:
+            pdf.set_draw_color(*_color_rgb(serie['color']))
+            px, py = a_pdf(sx, sy)
+            validos = np.isfinite(px) & np.isfinite(py)
+            for i in np.flatnonzero(validos[:-1] & validos[1:]):
+                pdf.line(px[i], py[i], px[i + 1], py[i + 1])
+
+        # Leyenda arriba a la derecha
+        pdf.set_font("Arial", size=7)
+        ancho = max(pdf.get_string_width(serie['nombre']) for serie, _, _ in series) + 10
+        ley_x, ley_y = ax_x + ax_w - ancho - 2, ax_y + 2
+        pdf.set_draw_color(200, 200, 200)
+        pdf.set_fill_color(255, 255, 255)
+        pdf.set_line_width(0.1)
+        pdf.rect(ley_x, ley_y, ancho, 4 * len(series) + 1, 'DF')
+        pdf.set_line_width(0.3)
+        for i, (serie, _, _) in enumerate(series):
+            fila_y = ley_y + 2.5 + 4 * i
+            pdf.set_draw_color(*_color_rgb(serie['color']))
+            pdf.line(ley_x + 1.5, fila_y, ley_x + 6, fila_y)
+            pdf.text(ley_x + 7.5, fila_y + 1, serie['nombre'])
+
+    pdf.set_draw_color(0)
+    pdf.set_line_width(0.2)
+    pdf.rect(ax_x, ax_y, ax_w, ax_h)
+    pdf.set_y(y + h)
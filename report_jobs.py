@@ -0,0 +1,19 @@
+# report_jobs.py
+import contextvars
+from concurrent.futures import ThreadPoolExecutor
+
+from pdf_generation import generar_pdf
+
+# Hilos compartidos por todas las sesiones de Streamlit para armar los informes sin bloquear el script
+MAX_INFORMES_SIMULTANEOS = 2
+_executor = ThreadPoolExecutor(max_workers=MAX_INFORMES_SIMULTANEOS, thread_name_prefix="informe-pdf")
+
+def enviar_informe(datos_paciente_dict, df_resultados, **kwargs_pdf):
+    """
+    Genera el informe PDF en segundo plano y devuelve un Future con sus bytes.
+    Los argumentos son los de generar_pdf (los gráficos se pasan con graficos=, ver report_graphics).
+    No se escribe nada en disco, así que varias sesiones pueden generar informes a la vez.
+    """
+    # Con el contexto de quien lo pide, así la instrumentación atribuye el informe a su sesión
+    return _executor.submit(contextvars.copy_context().run, generar_pdf, datos_paciente_dict=datos_paciente_dict, df_resultados=df_resultados.copy(),
+                            **kwargs_pdf)
@@ -0,0 +1,120 @@
+# session_store.py
+import hashlib
+import sys
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future
+import numpy as np
+import pandas as pd
+
+from config import SESION_MAX_BYTES
+from data_ingestion import leer_bytes
+from window_results import ResultadosVentanas
+
+def tamaño_aproximado(valor):
+    """Bytes que ocupa un resultado: DataFrames, arreglos, ResultadosVentanas, bytes y Futures ya resueltos, recorriendo colecciones."""
+    if isinstance(valor, pd.DataFrame):
+        return int(valor.memory_usage(deep=True, index=True).sum())
+    if isinstance(valor, pd.Series):
+        return int(valor.memory_usage(deep=True, index=True))
+    if isinstance(valor, (np.ndarray, ResultadosVentanas)):
+        return valor.nbytes
+    if isinstance(valor, (bytes, bytearray, str)):
+        return len(valor)
+    if isinstance(valor, Future):
+        # Un informe que todavía se está generando no ocupa nada hasta que termina
+        return tamaño_aproximado(valor.result()) if valor.done() and valor.exception() is None else 0
+    if isinstance(valor, dict):
+        return sum(tamaño_aproximado(v) for v in valor.values())
+    if isinstance(valor, (list, tuple)):
+        return sum(tamaño_aproximado(v) for v in valor)
+    return sys.getsizeof(valor)
+
+# Hash del contenido de cada archivo subido, por id de subida: se calcula una sola vez por archivo
+# (compartido por las sesiones, por eso el lock)
+_huellas_subidas = OrderedDict()
+_huellas_lock = threading.Lock()
+MAX_HUELLAS_SUBIDAS = 256
+
+def identidad_archivo(archivo):
+    """
+    Identifica un archivo por su contenido (tamaño y hash), así volver a subir el mismo archivo, aunque
+    tenga otro nombre, encuentra el resultado ya calculado. El hash de un archivo subido se calcula
+    solo la primera vez.
+    """
+    if archivo is None:
+        return None
+    file_id = getattr(archivo, 'file_id', None)
+    with _huellas_lock:
+        huella = _huellas_subidas.get(file_id) if file_id is not None else None
+    if huella is None:
+        contenido = leer_bytes(archivo)
+        huella = (len(contenido), hashlib.sha1(contenido).hexdigest())
+        if file_id is not None:
+            with _huellas_lock:
+                _huellas_subidas[file_id] = huella
+                while len(_huellas_subidas) > MAX_HUELLAS_SUBIDAS:
+                    _huellas_subidas.popitem(last=False)
+    return huella
+
+def clave_resultado(modo, archivos, **parametros):
+    """Clave de un resultado: el modo, la identidad de cada archivo {test: archivo} y los parámetros."""
+    return (modo,
+            tuple((str(test), identidad_archivo(archivo)) for test, archivo in archivos.items()),
+            tuple(sorted(parametros.items())))
+
+
+class AlmacenResultados:
+    """
+    Resultados de una sesión de Streamlit (tablas, ventanas, imágenes de los gráficos, informes) que
+    sobreviven a las re-ejecuciones del script. Si el total supera max_bytes se descartan los usados
+    hace más tiempo; el último guardado se conserva aunque por sí solo supere el límite.
+    """
+
+    def __init__(self, max_bytes=SESION_MAX_BYTES):
+        self.max_bytes = max_bytes
+        self._entradas = OrderedDict()
+
+    def __contains__(self, clave):
+        return clave in self._entradas
+
+    def __len__(self):
+        return len(self._entradas)
+
+    def obtener(self, clave):
+        """Devuelve el resultado guardado con clave (y lo marca como usado) o None."""
+        if clave not in self._entradas:
+            return None
+        self._entradas.move_to_end(clave)
+        return self._entradas[clave]
+
+    def guardar(self, clave, resultado):
+        self._entradas[clave] = resultado
+        self._entradas.move_to_end(clave)
+        self._desalojar()
+        return resultado
+
+    def descartar(self, clave):
+        """Quita el resultado guardado con clave, si existe (por ejemplo, para volver a calcularlo)."""
+        self._entradas.pop(clave, None)
+
+    def bytes_usados(self):
+        return sum(tamaño_aproximado(resultado) for resultado in self._entradas.values())
+
+    def limpiar(self):
+        self._entradas.clear()
+
+    def _desalojar(self):
+        # Los tamaños se recalculan cada vez: los informes en segundo plano crecen al terminar
+        tamaños = {clave: tamaño_aproximado(resultado) for clave, resultado in self._entradas.items()}
+        total = sum(tamaños.values())
+        while total > self.max_bytes and len(self._entradas) > 1:
+            clave, _ = self._entradas.popitem(last=False)
+            total -= tamaños[clave]
+
+
+def almacen_sesion(estado, max_bytes=SESION_MAX_BYTES):
+    """El almacén de la sesión, guardado en estado (st.session_state); se crea la primera vez."""
+    if "almacen_resultados" not in estado:
+        estado["almacen_resultados"] = AlmacenResultados(max_bytes)
+    return estado["almacen_resultados"]
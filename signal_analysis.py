@@ -1,11 +1,21 @@
 # signal_analysis.py
+import hashlib
+import threading
+from collections import OrderedDict
 import pandas as pd
 import numpy as np
-from scipy.signal import butter, filtfilt, welch
-from ahrs.filters import Mahony
+from numpy.lib.stride_tricks import sliding_window_view
+# scipy.signal y ahrs se importan dentro de las funciones que los usan: tardan más de un segundo en
+# cargarse y la aplicación no los necesita hasta analizar el primer archivo (después quedan cargados)
 
 # Import the global configuration
-from config import VENTANA_DURACION_SEG
+from data_ingestion import COLUMNAS_IMU
+from config import VENTANA_DURACION_SEG, UMBRAL_FRECUENCIA_AMPLITUD_HZ, MAX_BYTES_CACHE_ETAPAS
+from pipeline_profiling import etapa, perfilar
+from window_results import ResultadosVentanas
+
+# Incrementar cuando cambie cualquier paso del análisis, para invalidar los resultados en caché
+VERSION_PIPELINE = "1"
 
 def q_to_matrix(q):
     w, x, y, z = q
@@ -15,98 +25,249 @@ def q_to_matrix(q):
         [2*(x*z - y*w),               2*(y*z + x*w),           1 - 2*(x**2 + y**2)]
     ])
 
+def q_to_matrix_batch(Q):
+    """Versión vectorizada de q_to_matrix: convierte un arreglo (N, 4) de cuaterniones en (N, 3, 3)."""
+    Q = np.asarray(Q, dtype=float)
+    w, x, y, z = Q[:, 0], Q[:, 1], Q[:, 2], Q[:, 3]
+    R = np.empty((len(Q), 3, 3))
+    R[:, 0, 0] = 1 - 2*(y**2 + z**2)
+    R[:, 0, 1] = 2*(x*y - z*w)
+    R[:, 0, 2] = 2*(x*z + y*w)
+    R[:, 1, 0] = 2*(x*y + z*w)
+    R[:, 1, 1] = 1 - 2*(x**2 + z**2)
+    R[:, 1, 2] = 2*(y*z - x*w)
+    R[:, 2, 0] = 2*(x*z - y*w)
+    R[:, 2, 1] = 2*(y*z + x*w)
+    R[:, 2, 2] = 1 - 2*(x**2 + y**2)
+    return R
+
+def magnitud_aceleracion_lineal(acc, Q, g_world_vector=(0.0, 0.0, 9.81)):
+    """
+    Resta la gravedad rotada por cada cuaternión de Q a la aceleración medida y devuelve
+    la magnitud de la aceleración lineal, procesando todas las muestras en una sola pasada.
+    """
+    n = min(len(acc), len(Q)) # Q puede ser más corto que acc según el manejo interno de AHRS
+    R_W_B = q_to_matrix_batch(Q[:n])
+    gravity_in_sensor_frame = R_W_B @ np.asarray(g_world_vector, dtype=float)
+    linear_acc_sensor_frame = acc[:n] - gravity_in_sensor_frame
+    return np.sqrt(np.einsum('ij,ij->i', linear_acc_sensor_frame, linear_acc_sensor_frame))
+
 def filtrar_temblor(signal, fs=100):
+    from scipy.signal import butter, filtfilt
     b, a = butter(N=4, Wn=[1, 15], btype='bandpass', fs=fs)
     return filtfilt(b, a, signal)
 
-def analizar_temblor_por_ventanas_resultante(df, fs=100, ventana_seg=VENTANA_DURACION_SEG):
-    required_cols = ['Acel_X', 'Acel_Y', 'Acel_Z', 'GiroX', 'GiroY', 'GiroZ']
-    # Ensure all required columns exist and drop NaNs only from these specific columns for AHRS
-    df_filtered = df[required_cols].dropna() 
+def filtrar_temblor_causal(signal, fs=100, zi=None):
+    """
+    Contraparte causal de filtrar_temblor para procesar la señal por bloques.
+    Devuelve la señal filtrada y el estado final del filtro, que se pasa como zi en el bloque siguiente.
+    Si zi es None, el filtro arranca en régimen estacionario respecto de la primera muestra.
+    """
+    from scipy.signal import butter, lfilter, lfilter_zi
+    b, a = butter(N=4, Wn=[1, 15], btype='bandpass', fs=fs)
+    if zi is None:
+        zi = lfilter_zi(b, a) * (signal[0] if len(signal) else 0.0)
+    return lfilter(b, a, signal, zi=zi)
+
+# Cantidad de ventanas procesadas por bloque; acota la memoria temporal cuando hay mucho solapamiento
+BLOQUE_VENTANAS = 1024
+
+def dividir_en_ventanas(señal, tamaño_ventana, salto=None):
+    """
+    Devuelve una vista (num_ventanas, tamaño_ventana) de la señal, sin copiar datos.
+    Con salto < tamaño_ventana las ventanas se solapan; por defecto son contiguas.
+    """
+    salto = tamaño_ventana if salto is None else salto
+    if len(señal) < tamaño_ventana:
+        return np.empty((0, tamaño_ventana), dtype=señal.dtype)
+    return sliding_window_view(señal, tamaño_ventana)[::salto]
+
+def calcular_metricas_ventanas(señal_filtrada, fs, tamaño_ventana, salto=None, umbral_freq_hz=UMBRAL_FRECUENCIA_AMPLITUD_HZ):
+    """
+    Calcula las métricas de temblor de todas las ventanas, por bloques de BLOQUE_VENTANAS.
+    La amplitud en cm solo se calcula en ventanas cuya frecuencia dominante supera umbral_freq_hz.
+    Devuelve un diccionario de columnas (arreglos) listo para construir el DataFrame por ventana.
+    """
+    from scipy.signal import welch
+    ventanas = dividir_en_ventanas(señal_filtrada, tamaño_ventana, salto)
+    num_ventanas = len(ventanas)
+
+    freq_dominante = np.empty(num_ventanas)
+    rms = np.empty(num_ventanas)
+    amp_g = np.empty(num_ventanas)
+
+    for inicio in range(0, num_ventanas, BLOQUE_VENTANAS):
+        bloque = slice(inicio, inicio + BLOQUE_VENTANAS)
+        segmentos = ventanas[bloque]
+        segmentos = segmentos - segmentos.mean(axis=1, keepdims=True) # Detrend segment
+
+        f, Pxx = welch(segmentos, fs=fs, nperseg=tamaño_ventana, axis=-1)
+        freq_dominante[bloque] = f[np.argmax(Pxx, axis=1)]
+
+        rms[bloque] = np.sqrt(np.mean(segmentos**2, axis=1))
+        amp_g[bloque] = (segmentos.max(axis=1) - segmentos.min(axis=1))/2
+
+    # Apply amplitude calculation only if dominant freq is meaningful
+    amp_cm = np.zeros_like(amp_g)
+    significativa = freq_dominante > umbral_freq_hz
+    amp_cm[significativa] = ((amp_g[significativa] * 100) / ((2 * np.pi * freq_dominante[significativa]) ** 2))*2
+
+    return {
+        'Ventana': np.arange(num_ventanas),
+        'Frecuencia Dominante (Hz)': freq_dominante,
+        'RMS (m/s2)': rms,
+        'Amplitud Temblor (g)': amp_g,
+        'Amplitud Temblor (cm)': amp_cm
+    }
+
+# ------------------ Etapas del análisis con memoización --------------------
+# Cada etapa guarda su resultado en memoria con una clave que encadena el hash de los datos
+# con los parámetros de las etapas anteriores; cambiar un parámetro solo recalcula desde su etapa.
+
+# {clave: (resultado, bytes)}, del usado hace más tiempo al más reciente. El total de bytes se lleva
+# al día para no recorrer la caché en cada etapa; el lock la protege entre sesiones de la aplicación.
+_cache_etapas = OrderedDict()
+_bytes_cache_etapas = 0
+_cache_etapas_lock = threading.Lock()
+
+def _memoizar(clave, calcular, muestras=None):
+    global _bytes_cache_etapas
+    # Cada etapa se registra en pipeline_profiling con el nombre de su clave, también si estaba memorizada
+    with etapa(clave[0], muestras) as registro:
+        with _cache_etapas_lock:
+            if clave in _cache_etapas:
+                registro.anotar(en_cache=True)
+                _cache_etapas.move_to_end(clave)
+                return _cache_etapas[clave][0]
+        resultado = calcular()
+    # Compartido entre llamadas (y con los ResultadosVentanas que lo envuelven): no debe modificarse
+    arreglos = [arreglo for arreglo in (resultado.values() if isinstance(resultado, dict) else [resultado])
+                if isinstance(arreglo, np.ndarray)]
+    for arreglo in arreglos:
+        arreglo.flags.writeable = False
+    tamaño = sum(arreglo.nbytes for arreglo in arreglos)
+    with _cache_etapas_lock:
+        if clave in _cache_etapas:
+            _bytes_cache_etapas -= _cache_etapas[clave][1]
+        _cache_etapas[clave] = (resultado, tamaño)
+        _cache_etapas.move_to_end(clave)
+        _bytes_cache_etapas += tamaño
+        # Se descartan los usados hace más tiempo; el último se conserva aunque por sí solo supere el límite
+        while _bytes_cache_etapas > MAX_BYTES_CACHE_ETAPAS and len(_cache_etapas) > 1:
+            _, (_, tamaño_descartado) = _cache_etapas.popitem(last=False)
+            _bytes_cache_etapas -= tamaño_descartado
+    return resultado
+
+def limpiar_cache_etapas():
+    """Vacía la memoización de etapas."""
+    global _bytes_cache_etapas
+    with _cache_etapas_lock:
+        _cache_etapas.clear()
+        _bytes_cache_etapas = 0
+
+def bytes_cache_etapas():
+    """Bytes que ocupan los resultados memorizados en este proceso."""
+    return _bytes_cache_etapas
+
+def huella_datos(*arreglos):
+    """Hash de las muestras del IMU, base de las claves de todas las etapas."""
+    h = hashlib.sha1()
+    for arreglo in arreglos:
+        h.update(str(arreglo.dtype).encode())
+        h.update(np.ascontiguousarray(arreglo).view(np.uint8))
+    return h.hexdigest()
 
-    if df_filtered.empty:
-        return pd.DataFrame(), pd.DataFrame() # Return empty if no valid data after dropping NaNs
+def etapa_orientacion(acc, gyr, fs, huella):
+    """Cuaterniones de Mahony para cada muestra."""
+    from ahrs.filters import Mahony
+    return _memoizar(('orientacion', huella, fs), lambda: Mahony(gyr=gyr, acc=acc, frequency=fs).Q, len(acc))
 
-    acc = df_filtered[['Acel_X', 'Acel_Y', 'Acel_Z']].to_numpy()
-    gyr = np.radians(df_filtered[['GiroX', 'GiroY', 'GiroZ']].to_numpy())
+def etapa_movimiento_lineal(acc, Q, fs, huella):
+    """Magnitud de la aceleración lineal (sin gravedad)."""
+    return _memoizar(('movimiento_lineal', huella, fs), lambda: magnitud_aceleracion_lineal(acc, Q), len(acc))
+
+def etapa_filtrado(movimiento_lineal, fs, huella):
+    """Señal filtrada en la banda de temblor."""
+    return _memoizar(('filtrado', huella, fs), lambda: filtrar_temblor(movimiento_lineal, fs), len(movimiento_lineal))
+
+def etapa_ventanas(señal_filtrada, fs, tamaño_ventana, salto, umbral_freq_hz, huella):
+    """Métricas por ventana (diccionario de columnas)."""
+    return _memoizar(('ventanas', huella, fs, tamaño_ventana, salto, umbral_freq_hz),
+                     lambda: calcular_metricas_ventanas(señal_filtrada, fs, tamaño_ventana, salto, umbral_freq_hz),
+                     len(señal_filtrada))
+
+@perfilar("analisis")
+def analizar_temblor_por_ventanas_resultante(df, fs=100, ventana_seg=VENTANA_DURACION_SEG, salto_seg=None,
+                                             umbral_freq_hz=UMBRAL_FRECUENCIA_AMPLITUD_HZ, compacto=False):
+    """
+    Analiza el temblor de una medición por ventanas de ventana_seg segundos.
+    df puede ser el DataFrame del CSV o un arreglo (N, 6) con las columnas de COLUMNAS_IMU.
+    salto_seg fija cada cuántos segundos comienza una ventana (por defecto ventana_seg, sin solapamiento);
+    la ventana i comienza en el segundo i * salto_seg.
+    Las etapas (orientación, movimiento lineal, filtrado, ventanas) se memorizan, así que repetir el
+    análisis cambiando solo ventana_seg, salto_seg o umbral_freq_hz no repite Mahony ni el filtrado.
+    Con compacto=True devuelve ResultadosVentanas (ver window_results) en lugar de DataFrames: el
+    promedio y las ventanas comparten los arreglos memorizados y no se arma ningún DataFrame.
+    """
+    vacio = (ResultadosVentanas(), ResultadosVentanas()) if compacto else (pd.DataFrame(), pd.DataFrame())
+
+    if isinstance(df, pd.DataFrame):
+        required_cols = ['Acel_X', 'Acel_Y', 'Acel_Z', 'GiroX', 'GiroY', 'GiroZ']
+        # Ensure all required columns exist and drop NaNs only from these specific columns for AHRS
+        df_filtered = df[required_cols].dropna() 
+
+        if df_filtered.empty:
+            return vacio # Return empty if no valid data after dropping NaNs
+
+        acc = df_filtered[['Acel_X', 'Acel_Y', 'Acel_Z']].to_numpy()
+        gyr = np.radians(df_filtered[['GiroX', 'GiroY', 'GiroZ']].to_numpy())
+        huella = huella_datos(acc, gyr)
+    else:
+        # Arreglo (N, 6) con las columnas de COLUMNAS_IMU, por ejemplo el mapeo en memoria de
+        # binary_recording.leer_binario; solo se copian las filas si hay NaN
+        datos = np.asarray(df)
+        validas = ~np.isnan(datos).any(axis=1)
+        if not validas.all():
+            datos = datos[validas]
+
+        if len(datos) == 0:
+            return vacio
+
+        # Mahony exige float64: con datos float64 acc sigue siendo una vista, con float32 se convierte
+        acc = np.asarray(datos[:, :3], dtype=np.float64)
+        gyr = np.radians(datos[:, 3:], dtype=np.float64)
+        huella = huella_datos(datos)
     
     # Mahony filter requires at least 2 data points for quaternion calculation in some cases
     if len(acc) < 2: 
-        return pd.DataFrame(), pd.DataFrame()
+        return vacio
 
-    mahony = Mahony(gyr=gyr, acc=acc, frequency=fs)
-    Q = mahony.Q
+    Q = etapa_orientacion(acc, gyr, fs, huella)
     
-    linear_accelerations_magnitude = []
-    g_world_vector = np.array([0.0, 0.0, 9.81])
-
-    for i in range(len(acc)):
-        if i >= len(Q): # Safety check if Q is shorter than acc due to internal AHRS handling
-            break
-        q = Q[i]
-        acc_measured = acc[i]
-        R_W_B = q_to_matrix(q)
-        gravity_in_sensor_frame = R_W_B @ g_world_vector
-        linear_acc_sensor_frame = acc_measured - gravity_in_sensor_frame
-        linear_accelerations_magnitude.append(np.linalg.norm(linear_acc_sensor_frame))
-
-    movimiento_lineal = np.array(linear_accelerations_magnitude)
+    movimiento_lineal = etapa_movimiento_lineal(acc, Q, fs, huella)
     
     if len(movimiento_lineal) < 1: # Ensure there's enough data after gravity removal
-        return pd.DataFrame(), pd.DataFrame()
+        return vacio
 
-    señal_filtrada = filtrar_temblor(movimiento_lineal, fs)
+    señal_filtrada = etapa_filtrado(movimiento_lineal, fs, huella)
 
-    resultados_por_ventana = []
     tamaño_ventana = int(fs * ventana_seg)
     
     if len(señal_filtrada) < tamaño_ventana:
         # Not enough data for even one full window, return empty
-        return pd.DataFrame(), pd.DataFrame()
+        return vacio
 
-    num_ventanas = len(señal_filtrada) // tamaño_ventana
+    salto = max(1, int(round(fs * (ventana_seg if salto_seg is None else salto_seg))))
+    columnas_ventanas = etapa_ventanas(señal_filtrada, fs, tamaño_ventana, salto, umbral_freq_hz, huella)
 
-    for i in range(num_ventanas):
-        segmento = señal_filtrada[i*tamaño_ventana:(i+1)*tamaño_ventana]
-        segmento = segmento - np.mean(segmento) # Detrend segment
+    if compacto:
+        ventanas = ResultadosVentanas(columnas_ventanas)
+        if ventanas.empty:
+            return vacio
+        promedio = ventanas.promedio(['Frecuencia Dominante (Hz)', 'RMS (m/s2)', 'Amplitud Temblor (cm)'])
+        return ResultadosVentanas({col: [valor] for col, valor in promedio.items()}), ventanas
 
-        # Avoid Welch calculation on empty or too short segments
-        if len(segmento) < 1:
-            continue
-
-        # nperseg must be less than or equal to the segment length
-        nperseg_val = min(tamaño_ventana, len(segmento))
-        if nperseg_val == 0:
-            freq_dominante = 0.0
-            Pxx_max = 0.0
-        else:
-            f, Pxx = welch(segmento, fs=fs, nperseg=nperseg_val)
-            if len(Pxx) > 0:
-                freq_dominante = f[np.argmax(Pxx)]
-                Pxx_max = np.max(Pxx)
-            else:
-                freq_dominante = 0.0
-                Pxx_max = 0.0
-
-
-        varianza = np.var(segmento)
-        rms = np.sqrt(np.mean(segmento**2))
-        amp_g = (np.max(segmento) - np.min(segmento))/2
-
-        if freq_dominante > 1.5: # Apply amplitude calculation only if dominant freq is meaningful
-            amp_cm = ((amp_g * 100) / ((2 * np.pi * freq_dominante) ** 2))*2
-        else:
-            amp_cm = 0.0
-
-        resultados_por_ventana.append({
-           'Ventana': i,
-           'Frecuencia Dominante (Hz)': freq_dominante,
-           'RMS (m/s2)': rms,
-           'Amplitud Temblor (g)': amp_g,
-           'Amplitud Temblor (cm)': amp_cm
-         })
-
-    df_por_ventana = pd.DataFrame(resultados_por_ventana)
+    df_por_ventana = pd.DataFrame(columnas_ventanas)
 
     if not df_por_ventana.empty:
         # Ensure 'Ventana' is not included in numeric_only mean for the average calculation if it's not a numeric metric
@@ -122,3 +283,191 @@ def analizar_temblor_por_ventanas_resultante(df, fs=100, ventana_seg=VENTANA_DUR
         df_promedio = pd.DataFrame()
 
     return df_promedio, df_por_ventana
+
+
+class _OrientacionIncremental:
+    """Orientación de Mahony calculada por bloques, conservando el cuaternión y el sesgo del giróscopo."""
+
+    def __init__(self, fs):
+        from ahrs.filters import Mahony
+        self._mahony = Mahony(frequency=fs)
+        self._q = None
+
+    def actualizar(self, acc, gyr):
+        from ahrs.common.orientation import acc2q
+        Q = np.empty((len(acc), 4))
+        q = self._q
+        for i in range(len(acc)):
+            # Igual que Mahony: la primera muestra inicializa la orientación a partir del acelerómetro
+            q = acc2q(acc[i]) if q is None else self._mahony.updateIMU(q, gyr[i], acc[i])
+            Q[i] = q
+        self._q = q
+        return Q
+
+
+class _EmisorVentanas:
+    """
+    Recibe la señal filtrada por partes y calcula cada ventana en cuanto se completa.
+    Solo guarda las últimas tamaño_ventana muestras y las sumas de las métricas para el promedio.
+    """
+
+    def __init__(self, fs, tamaño_ventana, salto, umbral_freq_hz=UMBRAL_FRECUENCIA_AMPLITUD_HZ):
+        self.fs = fs
+        self.tamaño_ventana = tamaño_ventana
+        self.salto = salto
+        self.umbral_freq_hz = umbral_freq_hz
+        # Buffer circular con las últimas tamaño_ventana muestras filtradas
+        self._buffer = np.zeros(tamaño_ventana)
+        self._muestras_totales = 0
+        self.ventanas_emitidas = 0
+        self._sumas = {'Frecuencia Dominante (Hz)': 0.0, 'RMS (m/s2)': 0.0, 'Amplitud Temblor (cm)': 0.0}
+
+    def agregar(self, señal_filtrada):
+        """Agrega muestras filtradas y devuelve un DataFrame con las ventanas completadas (puede estar vacío)."""
+        # Señal disponible: cola del buffer (muestras previas) seguida de las muestras nuevas
+        previas = min(self._muestras_totales, self.tamaño_ventana)
+        inicio_disponible = self._muestras_totales - previas
+        disponible = np.concatenate([self._buffer[self.tamaño_ventana - previas:], señal_filtrada])
+        self._muestras_totales += len(señal_filtrada)
+
+        ultima = (self._muestras_totales - self.tamaño_ventana) // self.salto
+        nuevas = ultima - self.ventanas_emitidas + 1 if self._muestras_totales >= self.tamaño_ventana else 0
+
+        cola = disponible[-self.tamaño_ventana:]
+        self._buffer[self.tamaño_ventana - len(cola):] = cola
+
+        if nuevas <= 0:
+            return pd.DataFrame()
+
+        desde = self.ventanas_emitidas * self.salto - inicio_disponible
+        hasta = desde + (nuevas - 1) * self.salto + self.tamaño_ventana
+        metricas = calcular_metricas_ventanas(disponible[desde:hasta], self.fs, self.tamaño_ventana, self.salto,
+                                              self.umbral_freq_hz)
+        metricas['Ventana'] = metricas['Ventana'] + self.ventanas_emitidas
+        self.ventanas_emitidas += nuevas
+
+        for col in self._sumas:
+            self._sumas[col] += float(np.sum(metricas[col]))
+        return pd.DataFrame(metricas)
+
+    def promedio(self):
+        if self.ventanas_emitidas == 0:
+            return pd.DataFrame()
+        return pd.DataFrame([{col: suma / self.ventanas_emitidas for col, suma in self._sumas.items()}])
+
+
+def _preparar_bloque_imu(datos):
+    """Convierte un bloque (DataFrame del CSV o arreglo (N, 6)) en acc y gyr (rad/s), sin filas con NaN."""
+    if isinstance(datos, pd.DataFrame):
+        datos = datos[COLUMNAS_IMU].to_numpy(dtype=float)
+    datos = np.asarray(datos, dtype=float)
+    datos = datos[~np.isnan(datos).any(axis=1)]
+    return datos[:, :3], np.radians(datos[:, 3:])
+
+
+class AnalizadorTemblorStreaming:
+    """
+    Analizador de temblor con estado para datos en vivo del IMU.
+    Recibe las muestras por bloques (procesar_bloque), conserva la orientación de Mahony y el estado
+    del filtro pasabanda entre bloques y devuelve las métricas de cada ventana apenas se completa.
+    La memoria queda acotada: solo se guardan las últimas muestras filtradas de una ventana.
+    """
+
+    COLUMNAS = COLUMNAS_IMU
+
+    def __init__(self, fs=100, ventana_seg=VENTANA_DURACION_SEG, salto_seg=None):
+        self.fs = fs
+        tamaño_ventana = int(fs * ventana_seg)
+        salto = max(1, int(round(fs * (ventana_seg if salto_seg is None else salto_seg))))
+        self._orientacion = _OrientacionIncremental(fs)
+        self._ventanas = _EmisorVentanas(fs, tamaño_ventana, salto)
+        self._zi = None
+
+    def procesar_bloque(self, datos):
+        """
+        Procesa un bloque de muestras. datos es un DataFrame con las columnas del CSV
+        (giroscopio en grados/s) o un arreglo (N, 6) en ese mismo orden.
+        Devuelve un DataFrame con las ventanas completadas en este bloque (puede estar vacío).
+        """
+        acc, gyr = _preparar_bloque_imu(datos)
+        if len(acc) == 0:
+            return pd.DataFrame()
+
+        Q = self._orientacion.actualizar(acc, gyr)
+        movimiento_lineal = magnitud_aceleracion_lineal(acc, Q)
+        señal_filtrada, self._zi = filtrar_temblor_causal(movimiento_lineal, self.fs, self._zi)
+        return self._ventanas.agregar(señal_filtrada)
+
+    def promedio(self):
+        """Devuelve el promedio de las ventanas emitidas hasta el momento, con el formato de df_promedio."""
+        return self._ventanas.promedio()
+
+
+# Margen (en segundos) que se agrega a cada lado de un bloque al aplicar filtfilt por partes.
+# Con 10 s el transitorio del pasabanda 1-15 Hz ya se extinguió: la diferencia con filtrar la señal
+# completa queda por debajo de 1e-9 veces la amplitud de la señal.
+MARGEN_FILTRADO_SEG = 10
+
+@perfilar("analisis_por_bloques")
+def analizar_temblor_csv_por_bloques(archivo, fs=100, ventana_seg=VENTANA_DURACION_SEG, salto_seg=None,
+                                     salida_ventanas=None, muestras_por_bloque=100_000,
+                                     umbral_freq_hz=UMBRAL_FRECUENCIA_AMPLITUD_HZ):
+    """
+    Versión fuera de memoria de analizar_temblor_por_ventanas_resultante para registros de varias horas.
+    Lee solo las columnas del IMU del CSV en bloques de muestras_por_bloque filas, calcula la orientación
+    de forma continua y aplica el filtrado de fase cero por bloques solapados (ver MARGEN_FILTRADO_SEG).
+    La memoria máxima depende de muestras_por_bloque, no del largo del registro.
+
+    Si se indica salida_ventanas (ruta o archivo), los resultados por ventana se escriben allí en formato
+    CSV a medida que se calculan y se devuelve un DataFrame vacío en su lugar.
+    Devuelve (df_promedio, df_por_ventana) como la versión en memoria.
+    analysis_cache.analizar_archivo_con_cache la usa para los CSV de más de ANALISIS_POR_BLOQUES_DESDE_BYTES.
+    """
+    tamaño_ventana = int(fs * ventana_seg)
+    salto = max(1, int(round(fs * (ventana_seg if salto_seg is None else salto_seg))))
+    margen = int(fs * MARGEN_FILTRADO_SEG)
+
+    orientacion = _OrientacionIncremental(fs)
+    ventanas = _EmisorVentanas(fs, tamaño_ventana, salto, umbral_freq_hz)
+    resultados = []
+    encabezado_escrito = False
+
+    def _emitir(señal_filtrada):
+        nonlocal encabezado_escrito
+        df_nuevas = ventanas.agregar(señal_filtrada)
+        if df_nuevas.empty:
+            return
+        if salida_ventanas is None:
+            resultados.append(df_nuevas)
+        else:
+            df_nuevas.to_csv(salida_ventanas, mode='a' if encabezado_escrito else 'w',
+                             header=not encabezado_escrito, index=False)
+            encabezado_escrito = True
+
+    # crudo guarda la magnitud sin filtrar: contexto izquierdo ya emitido + muestras pendientes
+    crudo = np.empty(0)
+    contexto_izquierdo = 0
+
+    lector = pd.read_csv(archivo, encoding='latin1', usecols=COLUMNAS_IMU, dtype={col: np.float64 for col in COLUMNAS_IMU},
+                         chunksize=muestras_por_bloque)
+    for bloque in lector:
+        acc, gyr = _preparar_bloque_imu(bloque)
+        if len(acc) == 0:
+            continue
+        Q = orientacion.actualizar(acc, gyr)
+        crudo = np.concatenate([crudo, magnitud_aceleracion_lineal(acc, Q)])
+
+        # Se emite todo lo que tenga al menos `margen` muestras de contexto a la derecha
+        emitibles = len(crudo) - contexto_izquierdo - margen
+        if emitibles > 0:
+            filtrada = filtrar_temblor(crudo, fs)
+            _emitir(filtrada[contexto_izquierdo:contexto_izquierdo + emitibles])
+            crudo = crudo[-2 * margen:].copy()
+            contexto_izquierdo = len(crudo) - margen
+
+    if len(crudo) > contexto_izquierdo:
+        _emitir(filtrar_temblor(crudo, fs)[contexto_izquierdo:])
+
+    df_promedio = ventanas.promedio()
+    df_por_ventana = pd.concat(resultados, ignore_index=True) if resultados else pd.DataFrame()
+    return df_promedio, df_por_ventana
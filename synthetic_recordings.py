@@ -0,0 +1,78 @@
+# synthetic_recordings.py
+import numpy as np
+import pandas as pd
+from scipy.spatial.transform import Rotation
+
+from data_ingestion import COLUMNAS_IMU
+
+# Metadatos de la primera fila, con las columnas que lee extraer_datos_paciente
+METADATOS_POR_DEFECTO = {
+    "Nombre": "Paciente", "Apellido": "Sintetico", "Edad": "65", "Sexo": "Masculino",
+    "Mano": "Derecha", "Dedo": "Indice", "Diagnostico": "PK", "Tipo": "Reposo",
+    "Antecedente": "", "Medicacion": "", "ECP": "", "GPI": "", "NST": "", "Polaridad": "",
+    "Duracion": "", "Pulso": "", "Corriente": "", "Voltaje": "", "Frecuencia": "",
+}
+GRAVEDAD = 9.81
+
+def _deriva_orientacion(t, rng, deriva_grados):
+    """Ángulos (N, 3) en grados: suma de oscilaciones lentas (0.01-0.2 Hz) con fase aleatoria por eje."""
+    angulos = np.zeros((len(t), 3))
+    for eje in range(3):
+        for _ in range(3):
+            frecuencia = rng.uniform(0.01, 0.2)
+            angulos[:, eje] += rng.uniform(0.3, 1.0) * np.sin(2 * np.pi * frecuencia * t + rng.uniform(0, 2 * np.pi))
+    return angulos * deriva_grados / 3
+
+def generar_arreglo_sintetico(duracion_seg=60, fs=100, componentes=((5.0, 0.5),), deriva_grados=10.0,
+                              temblor_rotacion_grados=1.0, ruido_acc=0.02, ruido_giro=0.5, semilla=0):
+    """
+    Registro sintético determinístico (misma semilla, mismos datos) como arreglo (N, 6) con las
+    columnas de COLUMNAS_IMU: aceleración en m/s2 y velocidad angular en grados/s, en el marco del sensor.
+    componentes es una lista de (frecuencia en Hz, amplitud de desplazamiento en cm) del temblor;
+    la orientación deriva lentamente (hasta deriva_grados) y además oscila con el temblor.
+    """
+    rng = np.random.default_rng(semilla)
+    n = int(round(duracion_seg * fs))
+    t = np.arange(n) / fs
+
+    angulos = _deriva_orientacion(t, rng, deriva_grados)
+    aceleracion_mundo = np.zeros((n, 3))
+    aceleracion_mundo[:, 2] = GRAVEDAD # El acelerómetro en reposo mide +g en el eje vertical
+    for frecuencia, amplitud_cm in componentes:
+        fase = rng.uniform(0, 2 * np.pi)
+        oscilacion = np.sin(2 * np.pi * frecuencia * t + fase)
+        direccion = rng.normal(size=3)
+        direccion /= np.linalg.norm(direccion)
+        # Desplazamiento A*sin(wt) -> aceleración A*w^2*sin(wt) (el signo no cambia la amplitud)
+        aceleracion_mundo += np.outer(oscilacion * (amplitud_cm / 100) * (2 * np.pi * frecuencia) ** 2, direccion)
+        angulos += np.outer(oscilacion * temblor_rotacion_grados, rng.normal(size=3) / np.sqrt(3))
+
+    rotaciones = Rotation.from_euler("xyz", angulos, degrees=True) # Sensor -> mundo
+    acc = rotaciones.inv().apply(aceleracion_mundo) + rng.normal(0, ruido_acc, (n, 3))
+
+    # Velocidad angular en el marco del sensor a partir de la rotación entre muestras consecutivas
+    relativas = rotaciones[:-1].inv() * rotaciones[1:]
+    giro = np.degrees(relativas.as_rotvec()) * fs
+    giro = np.vstack([giro, giro[-1:]]) if n > 1 else np.zeros((n, 3))
+    giro += rng.normal(0, ruido_giro, (n, 3)) + rng.normal(0, 0.2, 3) # Ruido y sesgo del giróscopo
+
+    return np.hstack([acc, giro])
+
+def generar_registro_sintetico(duracion_seg=60, fs=100, metadatos=None, **kwargs):
+    """
+    Igual que generar_arreglo_sintetico pero como DataFrame con el formato de los CSV de medición:
+    las columnas del IMU y, solo en la primera fila, las columnas de metadatos del paciente.
+    """
+    datos = generar_arreglo_sintetico(duracion_seg, fs, **kwargs)
+    df = pd.DataFrame(datos, columns=COLUMNAS_IMU)
+    for columna, valor in (METADATOS_POR_DEFECTO if metadatos is None else metadatos).items():
+        columna_metadatos = pd.Series([None] * len(df), dtype=object)
+        if len(df):
+            columna_metadatos.iloc[0] = valor if valor != "" else None
+        df[columna] = columna_metadatos
+    return df
+
+def escribir_csv_sintetico(ruta, duracion_seg=60, fs=100, metadatos=None, **kwargs):
+    """Escribe un CSV de medición sintético en ruta y devuelve la ruta."""
+    generar_registro_sintetico(duracion_seg, fs, metadatos, **kwargs).to_csv(ruta, index=False)
+    return ruta
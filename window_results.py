@@ -0,0 +1,154 @@
+# window_results.py
+import numpy as np
+import pandas as pd
+
+
+class ResultadosVentanas:
+    """
+    Resultados por ventana (o por test) guardados como un arreglo NumPy por métrica.
+
+    Se organizan en bloques, cada uno con sus columnas y sus etiquetas (por ejemplo Test='Reposo' o
+    Measurement=1), que valen para todas sus filas. Etiquetar, filtrar y concatenar solo arma nuevas
+    listas de bloques que comparten los mismos arreglos, sin copiar datos; por eso los arreglos no
+    deben modificarse. El DataFrame se construye recién cuando se pide (a_dataframe), con las etiquetas
+    como primeras columnas, y queda guardado.
+    """
+    __slots__ = ('_bloques', '_df')
+
+    def __init__(self, columnas=None, **etiquetas):
+        self._bloques = []
+        self._df = None
+        if columnas:
+            columnas = {nombre: np.asarray(valores) for nombre, valores in columnas.items()}
+            self._bloques.append((columnas, etiquetas))
+
+    @classmethod
+    def _desde_bloques(cls, bloques):
+        resultado = cls()
+        resultado._bloques = [(columnas, etiquetas) for columnas, etiquetas in bloques if _largo(columnas)]
+        return resultado
+
+    @classmethod
+    def concatenar(cls, resultados):
+        """Une varios resultados (por ejemplo los tests de una medición, o dos mediciones) sin copiar."""
+        return cls._desde_bloques([bloque for resultado in resultados for bloque in resultado._bloques])
+
+    @classmethod
+    def desde_dataframe(cls, df, **etiquetas):
+        """Resultados con las columnas de un DataFrame (las columnas numéricas no se copian)."""
+        return cls({col: df[col].to_numpy() for col in df.columns}, **etiquetas)
+
+    def __len__(self):
+        return sum(_largo(columnas) for columnas, _ in self._bloques)
+
+    @property
+    def empty(self):
+        return len(self) == 0
+
+    @property
+    def nbytes(self):
+        return sum(arreglo.nbytes for columnas, _ in self._bloques for arreglo in columnas.values())
+
+    @property
+    def etiquetas(self):
+        """Nombres de las etiquetas, en el orden en que aparecen."""
+        return list(dict.fromkeys(nombre for _, etiquetas in self._bloques for nombre in etiquetas))
+
+    @property
+    def metricas(self):
+        """Nombres de las columnas de métricas, en el orden en que aparecen."""
+        return list(dict.fromkeys(nombre for columnas, _ in self._bloques for nombre in columnas))
+
+    @property
+    def columns(self):
+        """Todas las columnas (etiquetas y métricas), con el mismo orden que a_dataframe."""
+        return self.etiquetas + [nombre for nombre in self.metricas if nombre not in self.etiquetas]
+
+    def columna(self, nombre):
+        """
+        Arreglo con los valores de una métrica o etiqueta para todas las filas. Con un solo bloque es el
+        mismo arreglo guardado (sin copiar); con varios se concatenan.
+        """
+        if nombre not in self.columns:
+            raise KeyError(nombre)
+        partes = [_columna_bloque(columnas, etiquetas, nombre) for columnas, etiquetas in self._bloques]
+        if not partes:
+            return np.array([])
+        return partes[0] if len(partes) == 1 else np.concatenate(partes)
+
+    __getitem__ = columna
+
+    def fila(self, i):
+        """La fila i como diccionario {columna: valor}."""
+        for columnas, etiquetas in self._bloques:
+            largo = _largo(columnas)
+            if i < largo:
+                return {nombre: etiquetas[nombre] if nombre in etiquetas else
+                                columnas[nombre][i] if nombre in columnas else np.nan
+                        for nombre in self.columns}
+            i -= largo
+        raise IndexError("fila fuera de rango")
+
+    def con_etiquetas(self, **etiquetas):
+        """Los mismos resultados con etiquetas agregadas (o reemplazadas) en todos los bloques, sin copiar."""
+        return self._desde_bloques([(columnas, {**propias, **etiquetas}) for columnas, propias in self._bloques])
+
+    def filtrar(self, **etiquetas):
+        """Solo los bloques cuyas etiquetas coinciden con las indicadas."""
+        return self._desde_bloques([(columnas, propias) for columnas, propias in self._bloques
+                                    if all(propias.get(nombre) == valor for nombre, valor in etiquetas.items())])
+
+    def agrupar(self, etiqueta):
+        """Diccionario {valor de la etiqueta: resultados}, en el orden en que aparecen los bloques."""
+        grupos = {}
+        for columnas, etiquetas in self._bloques:
+            grupos.setdefault(etiquetas.get(etiqueta), []).append((columnas, etiquetas))
+        return {valor: self._desde_bloques(bloques) for valor, bloques in grupos.items()}
+
+    def primeras(self, n):
+        """Las primeras n filas de cada bloque (vistas de los mismos arreglos)."""
+        return self._desde_bloques([({nombre: arreglo[:n] for nombre, arreglo in columnas.items()}, etiquetas)
+                                    for columnas, etiquetas in self._bloques])
+
+    def promedio(self, columnas=None):
+        """
+        Promedio de cada métrica sobre todas las filas, ignorando NaN y las columnas que no son
+        numéricas, como DataFrame.mean(numeric_only=True).
+        """
+        promedios = {}
+        for nombre in (self.metricas if columnas is None else columnas):
+            partes = [columnas_bloque[nombre] for columnas_bloque, _ in self._bloques if nombre in columnas_bloque]
+            if not all(np.issubdtype(valores.dtype, np.number) for valores in partes):
+                continue
+            suma = 0.0
+            cantidad = 0
+            for valores in partes:
+                validos = ~np.isnan(valores)
+                suma += float(np.sum(valores, where=validos))
+                cantidad += int(np.count_nonzero(validos))
+            promedios[nombre] = suma / cantidad if cantidad else np.nan
+        return promedios
+
+    def copy(self):
+        """Otro contenedor con los mismos bloques; los arreglos se comparten."""
+        return self._desde_bloques(self._bloques)
+
+    def a_dataframe(self):
+        """DataFrame con una fila por ventana; se arma la primera vez que se pide."""
+        if self._df is None:
+            self._df = pd.DataFrame({nombre: self.columna(nombre) for nombre in self.columns})
+        return self._df
+
+    def __repr__(self):
+        return f"ResultadosVentanas({len(self)} filas, {len(self._bloques)} bloques, columnas={self.columns})"
+
+
+def _largo(columnas):
+    return len(next(iter(columnas.values()))) if columnas else 0
+
+def _columna_bloque(columnas, etiquetas, nombre):
+    if nombre in etiquetas:
+        return np.repeat(np.asarray(etiquetas[nombre]), _largo(columnas))
+    if nombre in columnas:
+        return columnas[nombre]
+    return np.full(_largo(columnas), np.nan)